@@ -1,7 +1,8 @@
 from django.contrib import admin
 from .models import (
     Client, ClientNote, Contact, ContactNote, Lead, LeadNote, Property, PropertyNote, PropertyPhoto,
-    Transaction, TransactionNote, TransactionParty, TransactionMilestone, TransactionTask,
+    Transaction, TransactionDocument, TransactionNote, TransactionParty, TransactionMilestone, TransactionTask,
+    EmailTemplate, ExportJob, NewsletterSyncState, OutboundEmail, OutboundEmailAttachment, SyncJob, SyncJobError,
     UserProfile,
 )
 
@@ -135,6 +136,13 @@ class TransactionNoteInline(admin.TabularInline):
     ordering = ['-created_at']
 
 
+class TransactionDocumentInline(admin.TabularInline):
+    model = TransactionDocument
+    extra = 0
+    fields = ('filename', 'content_type', 'size', 'uploaded_at')
+    readonly_fields = fields
+
+
 def _transaction_gci(obj):
     if obj.gci is None:
         return "—"
@@ -170,6 +178,11 @@ class UserProfileAdmin(admin.ModelAdmin):
     has_constant_contact.short_description = 'Constant Contact'
     has_constant_contact.boolean = True
 
+    def save_model(self, request, obj, form, change):
+        if {'email_signature', 'signature_image'} & set(form.changed_data):
+            obj.signature_version = (obj.signature_version or 0) + 1  # new rendered-signature cache key
+        super().save_model(request, obj, form, change)
+
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
@@ -178,10 +191,81 @@ class TransactionAdmin(admin.ModelAdmin):
     search_fields = ('property__title', 'property__address', 'file_number')
     raw_id_fields = ('property',)
     ordering = ('-created_at',)
-    inlines = [TransactionPartyInline, TransactionMilestoneInline, TransactionTaskInline, TransactionNoteInline]
+    inlines = [TransactionPartyInline, TransactionMilestoneInline, TransactionTaskInline, TransactionNoteInline, TransactionDocumentInline]
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         if request.user.is_superuser:
             return qs
         return qs.filter(property__user=request.user)
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('model_key', 'format', 'status', 'row_count', 'user', 'created_at', 'finished_at')
+    list_filter = ('status', 'model_key', 'format')
+    readonly_fields = ('fingerprint', 'created_at', 'started_at', 'finished_at')
+    ordering = ('-created_at',)
+
+    def get_queryset(self, request):
+        return _admin_queryset_user_scoped(super().get_queryset(request), request)
+
+
+class OutboundEmailAttachmentInline(admin.TabularInline):
+    model = OutboundEmailAttachment
+    extra = 0
+    readonly_fields = ('filename', 'content_type', 'size', 'document')
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'user', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'to')
+    readonly_fields = ('attempts', 'next_attempt_at', 'last_error', 'created_at', 'sent_at')
+    inlines = [OutboundEmailAttachmentInline]
+    ordering = ('-created_at',)
+
+    def get_queryset(self, request):
+        return _admin_queryset_user_scoped(super().get_queryset(request), request)
+
+
+@admin.register(EmailTemplate)
+class EmailTemplateAdmin(admin.ModelAdmin):
+    list_display = ('name', 'subject', 'user', 'updated_at')
+    search_fields = ('name', 'subject')
+    ordering = ('name',)
+
+    def get_queryset(self, request):
+        return _admin_queryset_user_scoped(super().get_queryset(request), request)
+
+
+@admin.register(NewsletterSyncState)
+class NewsletterSyncStateAdmin(admin.ModelAdmin):
+    list_display = ('email', 'provider', 'list_id', 'subscribed', 'synced_at', 'user')
+    list_filter = ('provider', 'subscribed')
+    search_fields = ('email',)
+    readonly_fields = ('fingerprint', 'synced_at')
+    ordering = ('email',)
+
+    def get_queryset(self, request):
+        return _admin_queryset_user_scoped(super().get_queryset(request), request)
+
+
+class SyncJobErrorInline(admin.TabularInline):
+    model = SyncJobError
+    extra = 0
+    readonly_fields = ('email', 'error', 'created_at')
+    can_delete = False
+
+
+@admin.register(SyncJob)
+class SyncJobAdmin(admin.ModelAdmin):
+    list_display = ('provider', 'status', 'processed', 'total', 'synced', 'unsubscribed', 'error_count', 'user', 'created_at')
+    list_filter = ('status', 'provider')
+    readonly_fields = ('phase', 'cursor', 'created_at', 'started_at', 'checkpoint_at', 'finished_at')
+    ordering = ('-created_at',)
+    inlines = [SyncJobErrorInline]
+
+    def get_queryset(self, request):
+        return _admin_queryset_user_scoped(super().get_queryset(request), request)
@@ -0,0 +1,191 @@
+"""
+Incremental change feed for reporting/warehouse sync.
+GET /api/changes/<model>/?cursor=...&limit=... returns one user's Clients, Leads, Contacts, Properties
+or Transactions changed since an opaque cursor, oldest first, plus tombstones for deleted records.
+Paged by (updated_at, id) keyset on an indexed column set, so a sync reads only what changed.
+Auth: logged-in session, or HTTP Basic (username/password) for scripts.
+"""
+import base64
+import binascii
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth import authenticate, get_user_model
+from django.core import signing
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Client, Contact, DeletedRecord, Lead, Property, Transaction
+
+CHANGE_FEED_MODELS = {
+    'client': Client,
+    'lead': Lead,
+    'contact': Contact,
+    'property': Property,
+    'transaction': Transaction,
+}
+
+# Owner lookup per model (transactions are owned through their property).
+CHANGE_FEED_USER_FIELDS = {'transaction': 'property__user'}
+
+CHANGE_FEED_PAGE_SIZE = 500
+CHANGE_FEED_MAX_PAGE_SIZE = 2000
+
+# Only changes at least this old are served: a row saved by a transaction that commits late still
+# carries its earlier updated_at, and would otherwise fall behind a cursor that has moved past it.
+CHANGE_FEED_SETTLE = timedelta(seconds=30)
+
+_CURSOR_SALT = 'crm.change_feed'
+
+_pending_deletions = threading.local()
+
+
+def _feed_fields(model_class):
+    """Every stored column except the owner (FKs as <name>_id)."""
+    return [f.attname for f in model_class._meta.concrete_fields if f.name != 'user']
+
+
+def _encode_cursor(user, model_key, position):
+    return signing.dumps({'u': user.pk, 'm': model_key, **position}, salt=_CURSOR_SALT, compress=True)
+
+
+def _decode_cursor(cursor, user, model_key):
+    """Position dict from a cursor this feed issued for the same user and model; ValueError otherwise."""
+    try:
+        data = signing.loads(cursor, salt=_CURSOR_SALT)
+    except signing.BadSignature:
+        raise ValueError('Invalid cursor.')
+    if data.get('u') != user.pk or data.get('m') != model_key:
+        raise ValueError('Cursor belongs to a different feed.')
+    return data
+
+
+def _after(qs, time_field, position_time, position_id):
+    """Rows strictly after (time, id) in (time_field, id) order."""
+    if not position_time:
+        return qs
+    ts = parse_datetime(position_time)
+    return qs.filter(Q(**{f'{time_field}__gt': ts}) | Q(**{time_field: ts, 'id__gt': position_id}))
+
+
+def change_feed_page(user, model_key, cursor=None, limit=CHANGE_FEED_PAGE_SIZE):
+    """
+    One page of changes for user's model_key records after cursor (None: from the beginning).
+    Returns dict: model, changes (row dicts), deleted ([{id, deleted_at}]), cursor (pass back for the
+    next page; store it once has_more is false), has_more. Raises ValueError for a bad cursor.
+    """
+    model_class = CHANGE_FEED_MODELS[model_key]
+    position = _decode_cursor(cursor, user, model_key) if cursor else {}
+    horizon = timezone.now() - CHANGE_FEED_SETTLE
+
+    user_field = CHANGE_FEED_USER_FIELDS.get(model_key, 'user')
+    qs = model_class.objects.filter(**{user_field: user}, updated_at__lte=horizon)
+    qs = _after(qs, 'updated_at', position.get('t'), position.get('i'))
+    changes = list(qs.order_by('updated_at', 'id').values(*_feed_fields(model_class))[:limit + 1])
+
+    tombstones = DeletedRecord.objects.filter(user=user, model_key=model_key, deleted_at__lte=horizon)
+    tombstones = _after(tombstones, 'deleted_at', position.get('dt'), position.get('di'))
+    deleted = list(tombstones.order_by('deleted_at', 'id').values('id', 'object_id', 'deleted_at')[:limit + 1])
+
+    has_more = len(changes) > limit or len(deleted) > limit
+    changes, deleted = changes[:limit], deleted[:limit]
+    if changes:
+        position['t'], position['i'] = changes[-1]['updated_at'].isoformat(), changes[-1]['id']
+    if deleted:
+        position['dt'], position['di'] = deleted[-1]['deleted_at'].isoformat(), deleted[-1]['id']
+    position.pop('u', None)
+    position.pop('m', None)
+    return {
+        'model': model_key,
+        'changes': changes,
+        'deleted': [{'id': d['object_id'], 'deleted_at': d['deleted_at']} for d in deleted],
+        'cursor': _encode_cursor(user, model_key, position),
+        'has_more': has_more,
+    }
+
+
+# --- Tombstones ---
+
+_MODEL_KEYS = {model_class: model_key for model_key, model_class in CHANGE_FEED_MODELS.items()}
+
+
+def _record_deletion(sender, instance, origin=None, **kwargs):
+    """post_delete: write a tombstone (or queue it inside recording_deletions())."""
+    if isinstance(origin, get_user_model()):
+        return  # the owner is being deleted; nobody is left to sync
+    model_key = _MODEL_KEYS[sender]
+    if model_key == 'transaction':
+        user_id = Property.objects.filter(pk=instance.property_id).values_list('user_id', flat=True).first()
+    else:
+        user_id = instance.user_id
+    if user_id is None:
+        return
+    record = DeletedRecord(user_id=user_id, model_key=model_key, object_id=instance.pk)
+    pending = getattr(_pending_deletions, 'records', None)
+    if pending is not None:
+        pending.append(record)
+    else:
+        record.save()
+
+
+for _model_class in CHANGE_FEED_MODELS.values():
+    post_delete.connect(_record_deletion, sender=_model_class, dispatch_uid=f'change_feed_{_model_class.__name__}')
+
+
+@contextmanager
+def recording_deletions():
+    """
+    Atomic block whose deletes write their tombstones with one bulk insert at the end (e.g. bulk delete
+    of many selected rows) instead of one insert per row.
+    """
+    with transaction.atomic():
+        _pending_deletions.records = []
+        try:
+            yield
+            DeletedRecord.objects.bulk_create(_pending_deletions.records)
+        finally:
+            _pending_deletions.records = None
+
+
+# --- API view ---
+
+def _api_user(request):
+    """Session user, or the user from valid HTTP Basic credentials; None if neither."""
+    if request.user.is_authenticated:
+        return request.user
+    auth = request.META.get('HTTP_AUTHORIZATION', '')
+    if not auth.lower().startswith('basic '):
+        return None
+    try:
+        username, _, password = base64.b64decode(auth[6:].strip()).decode('utf-8').partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        return None
+    user = authenticate(request, username=username, password=password)
+    return user if user is not None and user.is_active else None
+
+
+def change_feed(request, model_key):
+    """GET: one page of the change feed as JSON (see change_feed_page)."""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Use GET.'}, status=405)
+    user = _api_user(request)
+    if user is None:
+        response = JsonResponse({'error': 'Authentication required.'}, status=401)
+        response['WWW-Authenticate'] = 'Basic realm="CRM change feed"'
+        return response
+    if model_key not in CHANGE_FEED_MODELS:
+        return JsonResponse({'error': f'Unknown model "{model_key}".'}, status=404)
+    try:
+        limit = min(max(int(request.GET.get('limit') or CHANGE_FEED_PAGE_SIZE), 1), CHANGE_FEED_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'limit must be a number.'}, status=400)
+    try:
+        page = change_feed_page(user, model_key, request.GET.get('cursor') or None, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(page)
@@ -0,0 +1,71 @@
+"""
+Transaction document library. Files are stored once per content (named by their SHA-256 in default storage),
+listed per transaction, and attached to outbox emails by reference, so sending the same disclosure to another
+party uploads nothing and the worker reads the one stored blob.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction as db_transaction
+
+from .models import OutboundEmail, TransactionDocument
+
+DOCUMENT_DIR = 'transaction_documents'
+
+
+def content_sha256(f):
+    """Hex SHA-256 of an uploaded file, read in chunks (the upload stays on disk if Django spooled it there)."""
+    digest = hashlib.sha256()
+    for chunk in f.chunks():
+        digest.update(chunk)
+    f.seek(0)
+    return digest.hexdigest()
+
+
+def document_storage_name(sha256, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return f'{DOCUMENT_DIR}/{sha256[:2]}/{sha256}{ext}'
+
+
+def add_transaction_document(transaction, f):
+    """
+    Add an uploaded file to the transaction's library. Returns (document, created); an identical file already
+    in the library is returned as is, and content already in storage (any transaction) is not uploaded again.
+    """
+    sha256 = content_sha256(f)
+    existing = transaction.documents.filter(sha256=sha256).first()
+    if existing:
+        return existing, False
+    filename = os.path.basename(f.name)
+    name = document_storage_name(sha256, filename)
+    if not default_storage.exists(name):
+        name = default_storage.save(name, f)
+    try:
+        with db_transaction.atomic():
+            document = TransactionDocument.objects.create(
+                transaction=transaction,
+                file=name,
+                filename=filename,
+                content_type=getattr(f, 'content_type', None) or 'application/octet-stream',
+                size=f.size,
+                sha256=sha256,
+            )
+    except IntegrityError:  # the same file added concurrently
+        return transaction.documents.get(sha256=sha256), False
+    return document, True
+
+
+def document_in_use(document):
+    """True if a queued (not yet sent) email still attaches this document."""
+    return document.email_attachments.filter(
+        email__status__in=[OutboundEmail.STATUS_PENDING, OutboundEmail.STATUS_SENDING],
+    ).exists()
+
+
+def delete_transaction_document(document):
+    """Remove a document from its library; the stored blob is deleted once no library references it."""
+    name = document.file.name
+    document.delete()
+    if not TransactionDocument.objects.filter(file=name).exists():
+        default_storage.delete(name)
@@ -4,14 +4,37 @@ Uses credentials from the requesting user's profile.
 """
 import hashlib
 import logging
+import re
+import time
+from itertools import chain, islice
+from typing import NamedTuple
 
 import requests
+from django.conf import settings
+from django.db import connection
+from django.db.models import Value
+from django.db.models.functions import Lower, Trim
+
+from .sync_transport import SyncTransport
 
 logger = logging.getLogger(__name__)
 
+MAILCHIMP_BATCH_SIZE = 500  # members per batch subscribe request (Mailchimp's maximum)
+CONSTANT_CONTACT_API_URL = 'https://api.cc.email/v3'
+CONSTANT_CONTACT_BATCH_SIZE = 500  # contacts per bulk activity
+# Lists of at least this many contacts go through the JSON import activity instead of one sign_up_form per contact.
+CONSTANT_CONTACT_IMPORT_THRESHOLD = 100
+CONSTANT_CONTACT_IMPORT_CHUNK_SIZE = 5000  # contacts per import activity (API limit: 40,000 and 4 MB)
+CONSTANT_CONTACT_IMPORT_POLL = 2.0  # seconds before the first activity status check; doubled up to 30
+# Seconds to wait for one import activity to finish. Kept well under sync_jobs.SYNC_JOB_STALE_AFTER (10 minutes), so a
+# job waiting on an import is not taken for dead and claimed by another worker.
+CONSTANT_CONTACT_IMPORT_TIMEOUT = 300
+CONSTANT_CONTACT_ACTIVITY_FINAL_STATES = {'completed', 'cancelled', 'failed', 'timed_out'}
+
 
 def _record_payload(record):
-    """Build a dict with email, first_name, last_name, phone, address, city, state, zip_code."""
+    """Build a dict with email, first_name, last_name, phone, address, city, state, zip_code
+    from a record dict or OptedInRecord."""
     return {
         'email': (record.get('email') or '').strip().lower(),
         'first_name': (record.get('first_name') or '')[:50],
@@ -29,67 +52,262 @@ def _mailchimp_subscriber_hash(email):
     return hashlib.md5(email.lower().encode('utf-8')).hexdigest()
 
 
-def sync_to_mailchimp(profile, records):
+def _mailchimp_base_url(api_key):
+    """API root for the key's data center (key format: xxxxx-us21), or settings.MAILCHIMP_API_URL if set."""
+    override = getattr(settings, 'MAILCHIMP_API_URL', '')
+    if override:
+        return override
+    parts = api_key.split('-')
+    dc = parts[-1] if len(parts) > 1 else 'us1'
+    return f'https://{dc}.api.mailchimp.com/3.0'
+
+
+def _mailchimp_member(payload):
+    """Batch-subscribe member body for one _record_payload."""
+    member = {
+        'email_address': payload['email'],
+        'status': 'subscribed',
+        'merge_fields': {
+            'FNAME': payload['first_name'] or '',
+            'LNAME': payload['last_name'] or '',
+        },
+    }
+    if payload['phone']:
+        member['merge_fields']['PHONE'] = payload['phone']
+    return member
+
+
+def _mailchimp_batch_upsert(transport, url, members):
     """
-    Add or update members in Mailchimp. Uses profile.mailchimp_api_key and profile.mailchimp_audience_id.
-    records: list of dicts with email, first_name, last_name, phone, address, city, state, zip_code.
-    Returns: (synced_count, errors_list).
+    Subscribe or update up to MAILCHIMP_BATCH_SIZE members with one POST /lists/{id}.
+    Returns (synced_count, errors_list); errors come from the response's per-member errors array.
     """
+    try:
+        resp = transport.request('POST', url, json={'members': members, 'update_existing': True})
+    except requests.RequestException as e:
+        logger.exception('Mailchimp batch request failed (%s members)', len(members))
+        return 0, [{'email': m['email_address'], 'error': str(e)[:200]} for m in members]
+    if resp.status_code != 200:
+        error = resp.text[:200] or f'HTTP {resp.status_code}'
+        logger.warning('Mailchimp batch sync failed (%s members): %s', len(members), error)
+        return 0, [{'email': m['email_address'], 'error': error} for m in members]
+    try:
+        member_errors = resp.json().get('errors') or []
+    except ValueError:
+        member_errors = []
+    errors = []
+    for err in member_errors:
+        email = (err.get('email_address') or '').lower() or None
+        errors.append({'email': email, 'error': (err.get('error') or err.get('error_code') or 'Rejected')[:200]})
+        logger.warning('Mailchimp sync failed for %s: %s', email, err.get('error'))
+    return len(members) - len(errors), errors
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _mailchimp_sync_members(profile, members, concurrency=None):
+    """Send member bodies to the profile's audience, MAILCHIMP_BATCH_SIZE per request. Returns (synced, errors)."""
     if not profile.has_mailchimp_connected():
         return 0, [{'email': None, 'error': 'Mailchimp not configured for this user.'}]
     api_key = profile.mailchimp_api_key
     audience_id = (profile.mailchimp_audience_id or '').strip()
     if not audience_id:
         return 0, [{'email': None, 'error': 'Mailchimp Audience ID is required.'}]
-    # API key format: key-dc (e.g. xxxxx-us21)
-    parts = api_key.split('-')
-    dc = parts[-1] if len(parts) > 1 else 'us1'
-    base_url = f'https://{dc}.api.mailchimp.com/3.0'
-    auth = ('anystring', api_key)
+    url = f'{_mailchimp_base_url(api_key)}/lists/{audience_id}'
     synced = 0
     errors = []
-    for r in records:
-        payload = _record_payload(r)
-        email = payload['email']
-        if not email:
-            continue
-        subscriber_hash = _mailchimp_subscriber_hash(email)
-        url = f'{base_url}/lists/{audience_id}/members/{subscriber_hash}'
-        body = {
-            'email_address': email,
-            'status': 'subscribed',
-            'merge_fields': {
-                'FNAME': payload['first_name'] or '',
-                'LNAME': payload['last_name'] or '',
-            },
-        }
-        if payload['phone']:
-            body['merge_fields']['PHONE'] = payload['phone']
-        try:
-            resp = requests.put(url, json=body, auth=auth, timeout=15)
-            if resp.status_code in (200, 201):
-                synced += 1
-            else:
-                errors.append({
-                    'email': email,
-                    'error': resp.text[:200] or f'HTTP {resp.status_code}',
-                })
-                logger.warning('Mailchimp sync failed for %s: %s', email, resp.text[:200])
-        except requests.RequestException as e:
-            errors.append({'email': email, 'error': str(e)[:200]})
-            logger.exception('Mailchimp request failed for %s', email)
+    with SyncTransport('mailchimp', concurrency=concurrency, auth=('anystring', api_key)) as transport:
+        results = transport.map(
+            lambda batch: _mailchimp_batch_upsert(transport, url, batch),
+            _batches(members, MAILCHIMP_BATCH_SIZE),
+        )
+        for batch_synced, batch_errors in results:
+            synced += batch_synced
+            errors.extend(batch_errors)
     return synced, errors
 
 
-def sync_to_constant_contact(profile, records):
+def sync_to_mailchimp(profile, records, concurrency=None):
+    """
+    Add or update members in Mailchimp. Uses profile.mailchimp_api_key and profile.mailchimp_audience_id.
+    records: iterable of dicts with email, first_name, last_name, phone, address, city, state, zip_code.
+    Members are sent MAILCHIMP_BATCH_SIZE at a time with the batch subscribe endpoint (POST /lists/{id}),
+    several batches at once over a shared SyncTransport (concurrency: settings.NEWSLETTER_SYNC_CONCURRENCY).
+    Returns: (synced_count, errors_list), errors in input order.
+    """
+    members = (
+        _mailchimp_member(payload)
+        for payload in (_record_payload(r) for r in records)
+        if payload['email']
+    )
+    return _mailchimp_sync_members(profile, members, concurrency)
+
+
+def unsubscribe_from_mailchimp(profile, emails, concurrency=None):
+    """Set members' status to unsubscribed (batch endpoint, as for sync). Returns (unsubscribed_count, errors)."""
+    members = ({'email_address': email, 'status': 'unsubscribed'} for email in emails)
+    return _mailchimp_sync_members(profile, members, concurrency)
+
+
+def _constant_contact_base_url():
+    """V3 API root, or settings.CONSTANT_CONTACT_API_URL if set."""
+    return getattr(settings, 'CONSTANT_CONTACT_API_URL', '') or CONSTANT_CONTACT_API_URL
+
+
+def _constant_contact_body(payload, list_id):
+    """V3 sign_up_form body: email_address, list_memberships (required); name, phone and address optional."""
+    body = {
+        'email_address': payload['email'],
+        'first_name': (payload['first_name'] or '')[:50],
+        'last_name': (payload['last_name'] or '')[:50],
+        'list_memberships': [list_id],
+        'create_source': 'Account',  # Contact added from CRM/account
+    }
+    if payload['phone']:
+        body['phone_number'] = (payload['phone'] or '')[:50]
+    if payload['address'] or payload['city'] or payload['state'] or payload['zip_code']:
+        body['street_address'] = {
+            'kind': 'home',
+            'street': (payload['address'] or '')[:50],
+            'city': (payload['city'] or '')[:50],
+            'state': (payload['state'] or '')[:50],
+            'postal_code': (payload['zip_code'] or '')[:20],
+            'country': 'United States',
+        }
+    return body
+
+
+def _constant_contact_sign_up(transport, url, body):
+    """POST one contact; returns None on success or an error dict."""
+    email = body['email_address']
+    try:
+        resp = transport.request('POST', url, json=body)
+    except requests.RequestException as e:
+        logger.exception('Constant Contact request failed for %s', email)
+        return {'email': email, 'error': str(e)[:200]}
+    if resp.status_code in (200, 201):
+        return None
+    logger.warning('Constant Contact sync failed for %s: %s', email, resp.text[:200])
+    return {'email': email, 'error': resp.text[:200] or f'HTTP {resp.status_code}'}
+
+
+def _constant_contact_import_contact(payload):
+    """contacts_json_import row for one _record_payload (same limits as the sign_up_form body)."""
+    contact = {
+        'email': payload['email'],
+        'first_name': (payload['first_name'] or '')[:50],
+        'last_name': (payload['last_name'] or '')[:50],
+    }
+    if payload['phone']:
+        contact['phone'] = (payload['phone'] or '')[:50]
+    if payload['address'] or payload['city'] or payload['state'] or payload['zip_code']:
+        contact.update({
+            'street': (payload['address'] or '')[:50],
+            'city': (payload['city'] or '')[:50],
+            'state': (payload['state'] or '')[:50],
+            'zip': (payload['zip_code'] or '')[:20],
+            'country': 'United States',
+        })
+    return contact
+
+
+_IMPORT_ERROR_EMAIL_RE = re.compile(r'[\w.+\'-]+@[\w-]+(?:\.[\w-]+)+')
+_IMPORT_ERROR_LINE_RE = re.compile(r'\b(?:line|row)\s*#?\s*(\d+)', re.IGNORECASE)
+
+
+def _constant_contact_import_errors(activity, emails):
+    """
+    Per-contact errors from an import activity's activity_errors, in input order. A message is matched to a
+    contact by the email address it quotes, else by its line number (1-based, in import_data order);
+    messages matching neither are only logged.
+    """
+    positions = {email: i for i, email in enumerate(emails)}
+    errors = {}
+    for err in activity.get('activity_errors') or []:
+        message = (err.get('message') if isinstance(err, dict) else str(err)) or 'Rejected'
+        email = None
+        match = _IMPORT_ERROR_EMAIL_RE.search(message)
+        if match and match.group(0).lower() in positions:
+            email = match.group(0).lower()
+        else:
+            match = _IMPORT_ERROR_LINE_RE.search(message)
+            if match and 1 <= int(match.group(1)) <= len(emails):
+                email = emails[int(match.group(1)) - 1]
+        if email is None:
+            logger.warning('Constant Contact import %s: %s', activity.get('activity_id'), message[:200])
+            continue
+        errors.setdefault(email, message[:200])
+    return [{'email': email, 'error': errors[email]} for email in sorted(errors, key=positions.get)]
+
+
+def _constant_contact_import(transport, base_url, list_id, contacts):
+    """
+    Import up to CONSTANT_CONTACT_IMPORT_CHUNK_SIZE contacts with one contacts_json_import activity, polling
+    its status until it finishes. Returns (synced_count, errors); a failed activity fails every contact in it.
     """
-    Add or update contacts in Constant Contact using the V3 API sign_up_form endpoint.
-    See: https://developer.constantcontact.com/api_guide/v3_technical_overview.html
-    and https://v3.developer.constantcontact.com/api_guide/contacts_create_or_update.html
+    emails = [c['email'] for c in contacts]
+
+    def fail_all(error):
+        logger.warning('Constant Contact import failed (%s contacts): %s', len(emails), error)
+        return 0, [{'email': email, 'error': error} for email in emails]
+
+    try:
+        resp = transport.request(
+            'POST', f'{base_url}/activities/contacts_json_import',
+            json={'import_data': contacts, 'list_ids': [list_id]},
+        )
+        if resp.status_code not in (200, 201, 202):
+            return fail_all(resp.text[:200] or f'HTTP {resp.status_code}')
+        activity = resp.json()
+        activity_id = activity['activity_id']
+        deadline = time.monotonic() + CONSTANT_CONTACT_IMPORT_TIMEOUT
+        delay = CONSTANT_CONTACT_IMPORT_POLL
+        while activity.get('state') not in CONSTANT_CONTACT_ACTIVITY_FINAL_STATES:
+            if time.monotonic() >= deadline:
+                return fail_all(f'Import {activity_id} did not finish within {CONSTANT_CONTACT_IMPORT_TIMEOUT}s.')
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+            resp = transport.request('GET', f'{base_url}/activities/{activity_id}')
+            if resp.status_code != 200:
+                return fail_all(resp.text[:200] or f'HTTP {resp.status_code}')
+            activity = resp.json()
+    except (requests.RequestException, ValueError, KeyError) as e:
+        logger.exception('Constant Contact import request failed (%s contacts)', len(emails))
+        return fail_all(str(e)[:200])
+    if activity['state'] != 'completed':
+        messages = [
+            (err.get('message') if isinstance(err, dict) else str(err))
+            for err in activity.get('activity_errors') or []
+        ]
+        detail = '; '.join(m for m in messages if m)
+        return fail_all(f"Import {activity['state']}: {detail}"[:200])
+    errors = _constant_contact_import_errors(activity, emails)
+    return len(emails) - len(errors), errors
+
+
+def sync_to_constant_contact(profile, records, concurrency=None, bulk=None):
+    """
+    Add or update contacts in Constant Contact (V3 API).
+    See: https://developer.constantcontact.com/api_guide/v3_technical_overview.html,
+    https://v3.developer.constantcontact.com/api_guide/contacts_create_or_update.html
+    and https://v3.developer.constantcontact.com/api_guide/import_contacts.html
 
     Uses profile tokens and profile.constant_contact_list_id.
-    records: list of dicts with email, first_name, last_name, phone, address, city, state, zip_code.
-    Returns: (synced_count, errors_list).
+    records: iterable of dicts with email, first_name, last_name, phone, address, city, state, zip_code.
+    Fewer than CONSTANT_CONTACT_IMPORT_THRESHOLD contacts are posted one at a time to sign_up_form; larger lists
+    are imported CONSTANT_CONTACT_IMPORT_CHUNK_SIZE at a time with the contacts_json_import activity, whose
+    per-contact failures are mapped back to emails. bulk=True/False forces a mode. Requests go concurrently over
+    a shared SyncTransport, within Constant Contact's 4 requests/second.
+    Returns: (synced_count, errors_list), errors in input order.
     """
     if not profile.has_constant_contact_connected():
         return 0, [{'email': None, 'error': 'Constant Contact not configured or List ID missing.'}]
@@ -98,164 +316,195 @@ def sync_to_constant_contact(profile, records):
     if not access_token or not list_id:
         return 0, [{'email': None, 'error': 'Constant Contact access token and List ID are required.'}]
     # V3 API: https://api.cc.email/v3 (JSON only, Bearer token, Accept/Content-Type application/json)
-    base_url = 'https://api.cc.email/v3/contacts/sign_up_form'
+    base_url = _constant_contact_base_url()
     headers = {
         'Authorization': f'Bearer {access_token}',
         'Content-Type': 'application/json',
         'Accept': 'application/json',
     }
+    payloads = (payload for payload in (_record_payload(r) for r in records) if payload['email'])
+    if bulk is None:
+        # Look ahead just far enough to choose a mode; the rest of records is still streamed.
+        head = list(islice(payloads, CONSTANT_CONTACT_IMPORT_THRESHOLD))
+        bulk = len(head) >= CONSTANT_CONTACT_IMPORT_THRESHOLD
+        payloads = chain(head, payloads)
     synced = 0
     errors = []
-    for r in records:
-        payload = _record_payload(r)
-        email = payload['email']
-        if not email:
-            continue
-        # V3 sign_up_form: email_address, list_memberships (required); first_name, last_name, phone_number, street_address optional
-        body = {
-            'email_address': email,
-            'first_name': (payload['first_name'] or '')[:50],
-            'last_name': (payload['last_name'] or '')[:50],
-            'list_memberships': [list_id],
-            'create_source': 'Account',  # Contact added from CRM/account
-        }
-        if payload['phone']:
-            body['phone_number'] = (payload['phone'] or '')[:50]
-        if payload['address'] or payload['city'] or payload['state'] or payload['zip_code']:
-            body['street_address'] = {
-                'kind': 'home',
-                'street': (payload['address'] or '')[:50],
-                'city': (payload['city'] or '')[:50],
-                'state': (payload['state'] or '')[:50],
-                'postal_code': (payload['zip_code'] or '')[:20],
-                'country': 'United States',
-            }
+    with SyncTransport('constant_contact', concurrency=concurrency, headers=headers) as transport:
+        if bulk:
+            chunks = _batches(
+                (_constant_contact_import_contact(payload) for payload in payloads), CONSTANT_CONTACT_IMPORT_CHUNK_SIZE,
+            )
+            for chunk_synced, chunk_errors in transport.map(
+                lambda chunk: _constant_contact_import(transport, base_url, list_id, chunk), chunks,
+            ):
+                synced += chunk_synced
+                errors.extend(chunk_errors)
+        else:
+            url = f'{base_url}/contacts/sign_up_form'
+            bodies = (_constant_contact_body(payload, list_id) for payload in payloads)
+            for error in transport.map(lambda body: _constant_contact_sign_up(transport, url, body), bodies):
+                if error is None:
+                    synced += 1
+                else:
+                    errors.append(error)
+    return synced, errors
+
+
+def _constant_contact_contact_id(transport, base_url, email):
+    """The contact_id for an email, or None if Constant Contact has no such contact."""
+    resp = transport.request('GET', f'{base_url}/contacts', params={'email': email, 'status': 'all'})
+    if resp.status_code != 200:
+        raise requests.HTTPError(resp.text[:200] or f'HTTP {resp.status_code}', response=resp)
+    contacts = resp.json().get('contacts') or []
+    return contacts[0]['contact_id'] if contacts else None
+
+
+def remove_from_constant_contact(profile, emails, concurrency=None):
+    """
+    Remove contacts from the profile's list (V3 remove_list_memberships activity, CONSTANT_CONTACT_BATCH_SIZE
+    contacts per activity). Emails Constant Contact does not know count as removed.
+    Returns (removed_count, errors).
+    """
+    if not profile.has_constant_contact_connected():
+        return 0, [{'email': None, 'error': 'Constant Contact not configured or List ID missing.'}]
+    access_token = (profile.constant_contact_access_token or '').strip()
+    list_id = (profile.constant_contact_list_id or '').strip()
+    base_url = _constant_contact_base_url()
+    headers = {'Authorization': f'Bearer {access_token}', 'Accept': 'application/json'}
+    removed = 0
+    errors = []
+
+    def lookup(email):
         try:
-            resp = requests.post(base_url, json=body, headers=headers, timeout=15)
-            if resp.status_code in (200, 201):
-                synced += 1
+            return email, _constant_contact_contact_id(transport, base_url, email), None
+        except (requests.RequestException, ValueError, KeyError) as e:
+            return email, None, str(e)[:200]
+
+    with SyncTransport('constant_contact', concurrency=concurrency, headers=headers) as transport:
+        found = []
+        for email, contact_id, error in transport.map(lookup, emails):
+            if error:
+                errors.append({'email': email, 'error': error})
+            elif contact_id:
+                found.append((email, contact_id))
             else:
-                errors.append({
-                    'email': email,
-                    'error': resp.text[:200] or f'HTTP {resp.status_code}',
-                })
-                logger.warning('Constant Contact sync failed for %s: %s', email, resp.text[:200])
-        except requests.RequestException as e:
-            errors.append({'email': email, 'error': str(e)[:200]})
-            logger.exception('Constant Contact request failed for %s', email)
-    return synced, errors
+                removed += 1
+        for batch in _batches(found, CONSTANT_CONTACT_BATCH_SIZE):
+            body = {'source': {'contact_ids': [contact_id for _, contact_id in batch]}, 'list_ids': [list_id]}
+            try:
+                resp = transport.request('POST', f'{base_url}/activities/remove_list_memberships', json=body)
+            except requests.RequestException as e:
+                errors.extend({'email': email, 'error': str(e)[:200]} for email, _ in batch)
+                continue
+            if resp.status_code in (200, 201, 202):
+                removed += len(batch)
+            else:
+                logger.warning('Constant Contact list removal failed: %s', resp.text[:200])
+                errors.extend({'email': email, 'error': resp.text[:200] or f'HTTP {resp.status_code}'} for email, _ in batch)
+    return removed, errors
 
 
-def get_opted_in_records(user, include_clients=True, include_leads=True, include_contacts=True):
+class OptedInRecord(NamedTuple):
+    """One opted-in recipient, as synced (email normalized). get() lets it stand in for a record dict."""
+    email: str
+    first_name: str
+    last_name: str
+    phone: str
+    address: str
+    city: str
+    state: str
+    zip_code: str
+    record_type: str  # 'Client' | 'Lead' | 'Contact'
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+OPTED_IN_FETCH_SIZE = 500
+
+
+def _opted_in_union(user, include_clients=True, include_leads=True, include_contacts=True):
     """
-    Return a list of record dicts (email, first_name, last_name, phone, address, city, state, zip_code)
-    for Client, Lead, and Contact with newsletter_opt_in=True and non-empty email, scoped to the given user.
+    UNION ALL of the user's opted-in Clients, Leads and Contacts with a non-blank email, as (email lowercased and trimmed,
+    first_name, last_name, phone, address, city, state, zip_code, record_type, kind, id) rows; None if no models.
+    kind orders the models for dedup (Client, then Lead, then Contact).
     """
     from .models import Client, Lead, Contact
-    if user is None:
-        return []
-    records = []
-    if include_clients:
-        for c in Client.objects.filter(user=user, newsletter_opt_in=True).exclude(email='').exclude(email__isnull=True):
-            records.append({
-                'email': c.email,
-                'first_name': c.first_name or '',
-                'last_name': c.last_name or '',
-                'phone': c.phone or '',
-                'address': c.address or '',
-                'city': c.city or '',
-                'state': c.state or '',
-                'zip_code': c.zip_code or '',
-            })
-    if include_leads:
-        for c in Lead.objects.filter(user=user, newsletter_opt_in=True).exclude(email='').exclude(email__isnull=True):
-            records.append({
-                'email': c.email,
-                'first_name': c.first_name or '',
-                'last_name': c.last_name or '',
-                'phone': c.phone or '',
-                'address': c.address or '',
-                'city': c.city or '',
-                'state': c.state or '',
-                'zip_code': c.zip_code or '',
-            })
-    if include_contacts:
-        for c in Contact.objects.filter(user=user, newsletter_opt_in=True).exclude(email='').exclude(email__isnull=True):
-            records.append({
-                'email': c.email,
-                'first_name': c.first_name or '',
-                'last_name': c.last_name or '',
-                'phone': c.phone or '',
-                'address': c.address or '',
-                'city': c.city or '',
-                'state': c.state or '',
-                'zip_code': c.zip_code or '',
-            })
-    # Dedupe by email (keep first)
-    seen = set()
-    unique = []
-    for r in records:
-        e = (r.get('email') or '').strip().lower()
-        if e and e not in seen:
-            seen.add(e)
-            unique.append(r)
-    return unique
-
-
-def get_opted_in_records_with_type(user, include_clients=True, include_leads=True, include_contacts=True):
+    parts = []
+    for include, model_class, kind in (
+        (include_clients, Client, 0), (include_leads, Lead, 1), (include_contacts, Contact, 2),
+    ):
+        if not include:
+            continue
+        parts.append(
+            model_class.objects.filter(user=user, newsletter_opt_in=True, email__isnull=False)
+            .annotate(
+                norm_email=Lower(Trim('email')),
+                record_type=Value(model_class.__name__),
+                kind=Value(kind),
+            )
+            .exclude(norm_email='')  # after trimming, so whitespace-only emails are left out too
+            .values_list(
+                'norm_email', 'first_name', 'last_name', 'phone', 'address', 'city', 'state', 'zip_code',
+                'record_type', 'kind', 'id',
+            )
+            .order_by()
+        )
+    if not parts:
+        return None
+    return parts[0].union(*parts[1:], all=True) if len(parts) > 1 else parts[0]
+
+
+def get_opted_in_records(user, include_clients=True, include_leads=True, include_contacts=True):
     """
-    Like get_opted_in_records but each dict includes 'record_type': 'Client' | 'Lead' | 'Contact'.
-    Used for the sync preview page so you can review who will be synced.
+    Lazily yield an OptedInRecord for each distinct email among the user's Clients, Leads and Contacts with
+    newsletter_opt_in=True. One query: the three tables are UNIONed, emails lowercased and trimmed, and
+    duplicates dropped in SQL keeping the first by (Client, Lead, Contact; last name, first name, id).
+    Rows are fetched OPTED_IN_FETCH_SIZE at a time (with a server-side cursor unless DISABLE_SERVER_SIDE_CURSORS
+    is set). Used by the sync and the sync preview.
     """
-    from .models import Client, Lead, Contact
     if user is None:
-        return []
-    records = []
-    if include_clients:
-        for c in Client.objects.filter(user=user, newsletter_opt_in=True).exclude(email='').exclude(email__isnull=True):
-            records.append({
-                'email': c.email,
-                'first_name': c.first_name or '',
-                'last_name': c.last_name or '',
-                'phone': c.phone or '',
-                'address': c.address or '',
-                'city': c.city or '',
-                'state': c.state or '',
-                'zip_code': c.zip_code or '',
-                'record_type': 'Client',
-            })
-    if include_leads:
-        for c in Lead.objects.filter(user=user, newsletter_opt_in=True).exclude(email='').exclude(email__isnull=True):
-            records.append({
-                'email': c.email,
-                'first_name': c.first_name or '',
-                'last_name': c.last_name or '',
-                'phone': c.phone or '',
-                'address': c.address or '',
-                'city': c.city or '',
-                'state': c.state or '',
-                'zip_code': c.zip_code or '',
-                'record_type': 'Lead',
-            })
-    if include_contacts:
-        for c in Contact.objects.filter(user=user, newsletter_opt_in=True).exclude(email='').exclude(email__isnull=True):
-            records.append({
-                'email': c.email,
-                'first_name': c.first_name or '',
-                'last_name': c.last_name or '',
-                'phone': c.phone or '',
-                'address': c.address or '',
-                'city': c.city or '',
-                'state': c.state or '',
-                'zip_code': c.zip_code or '',
-                'record_type': 'Contact',
-            })
-    # Dedupe by email (keep first)
-    seen = set()
-    unique = []
-    for r in records:
-        e = (r.get('email') or '').strip().lower()
-        if e and e not in seen:
-            seen.add(e)
-            unique.append(r)
-    return unique
+        return
+    union = _opted_in_union(user, include_clients, include_leads, include_contacts)
+    if union is None:
+        return
+    sql, params = union.query.sql_with_params()
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(c) for c in (
+        'norm_email', 'first_name', 'last_name', 'phone', 'address', 'city', 'state', 'zip_code', 'record_type',
+    ))
+    order = ', '.join(qn(c) for c in ('kind', 'last_name', 'first_name', 'id'))
+    query = (
+        f'SELECT {columns} FROM ('
+        f'SELECT u.*, ROW_NUMBER() OVER (PARTITION BY {qn("norm_email")} ORDER BY {order}) AS {qn("rn")} '
+        f'FROM ({sql}) u'
+        f') r WHERE {qn("rn")} = 1 ORDER BY {order}'
+    )
+    # A named server-side cursor cannot be used behind a transaction-pooling proxy (pgbouncer); there the
+    # client-side cursor holds the result and fetchmany only batches the conversion to records.
+    if connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        cursor = connection.cursor()
+    else:
+        cursor = connection.chunked_cursor()
+    with cursor:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(OPTED_IN_FETCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                yield OptedInRecord(*row)
+
+
+def count_opted_in_records(user):
+    """Number of distinct opted-in emails (what get_opted_in_records yields), counted in SQL."""
+    union = _opted_in_union(user) if user is not None else None
+    if union is None:
+        return 0
+    sql, params = union.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COUNT(DISTINCT {connection.ops.quote_name("norm_email")}) FROM ({sql}) u', params,
+        )
+        return cursor.fetchone()[0]
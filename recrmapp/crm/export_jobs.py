@@ -0,0 +1,161 @@
+"""
+Background exports: queue an ExportJob, write the file to default storage (S3 in production,
+MEDIA_ROOT locally) from the process_export_jobs command, and reuse a finished file when the
+same export is requested again and the rows have not changed.
+"""
+import hashlib
+import json
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Value, When
+from django.utils import timezone
+
+from .import_export import (
+    EXPORT_SPOOL_MAX_SIZE,
+    IMPORT_MODELS,
+    export_columns,
+    iter_csv_chunks,
+    write_queryset_parquet,
+    write_queryset_xlsx,
+)
+from .list_filters import LIST_FILTERS
+from .models import ExportJob, Transaction
+
+# Exports with more rows than this are queued instead of generated inside the request.
+EXPORT_INLINE_MAX_ROWS = 5000
+
+# Transaction.gci in SQL: commission % of final sales price, closed transactions only.
+GCI_EXPRESSION = Case(
+    When(
+        status='closed',
+        commission_percentage__isnull=False,
+        final_sales_price__isnull=False,
+        then=F('commission_percentage') * F('final_sales_price') / Value(Decimal('100')),
+    ),
+    default=None,
+    output_field=DecimalField(max_digits=17, decimal_places=2),
+)
+
+# A job still "running" after this long is assumed to belong to a dead worker and is picked up again.
+EXPORT_JOB_STALE_AFTER = timedelta(minutes=30)
+
+
+def export_queryset(model_key, user, filters=None):
+    """The rows an export of model_key contains for user: the list's rows for filters, in list order."""
+    if model_key == 'transaction':
+        qs = LIST_FILTERS['transaction'](Transaction.objects.filter(property__user=user), filters or {})
+        return qs.annotate(gci=GCI_EXPRESSION).order_by(*Transaction._meta.ordering)
+    model_class = IMPORT_MODELS.get(model_key)
+    if model_class is None:
+        raise ValueError(f'Unknown export model: {model_key}')
+    qs = LIST_FILTERS[model_key](model_class.objects.filter(user=user), filters or {})
+    return qs.order_by(*model_class._meta.ordering)
+
+
+def export_fingerprint(queryset, model_key, fmt, filters=None):
+    """
+    One aggregate query. Returns (fingerprint, row_count): a hash of row count and latest updated_at,
+    with the format, filters and column list. Any create, edit or delete in the exported rows changes it;
+    for transactions, so does an edit to a property they export (title, address, city, MLS number).
+    """
+    aggregates = {'count': Count('pk'), 'latest': Max('updated_at')}
+    if model_key == 'transaction':
+        aggregates['latest_property'] = Max('property__updated_at')
+    stats = queryset.order_by().aggregate(**aggregates)
+    columns = ','.join(field_name for field_name, _ in export_columns(model_key))
+    latest = '|'.join(
+        stats[name].isoformat() if stats[name] else '' for name in ('latest', 'latest_property') if name in stats
+    )
+    key = f"{model_key}|{fmt}|{columns}|{json.dumps(filters or {}, sort_keys=True)}|{stats['count']}|{latest}"
+    return hashlib.sha256(key.encode('utf-8')).hexdigest(), stats['count']
+
+
+def request_export_job(user, model_key, fmt, filters=None):
+    """
+    Return (job, reused). Reuses the user's queued, running or finished job for the same export when
+    its fingerprint still matches; otherwise queues a new job.
+    """
+    filters = filters or {}
+    fingerprint, _ = export_fingerprint(export_queryset(model_key, user, filters), model_key, fmt, filters)
+    job = (
+        ExportJob.objects.filter(
+            user=user,
+            model_key=model_key,
+            format=fmt,
+            fingerprint=fingerprint,
+            status__in=[ExportJob.STATUS_PENDING, ExportJob.STATUS_RUNNING, ExportJob.STATUS_DONE],
+        )
+        .order_by('-created_at')
+        .first()
+    )
+    if job is not None:
+        return job, True
+    job = ExportJob.objects.create(user=user, model_key=model_key, format=fmt, filters=filters, fingerprint=fingerprint)
+    return job, False
+
+
+def claim_next_export_job():
+    """Mark the oldest queued (or stale running) job as running and return it; None if there is nothing to do."""
+    stale = timezone.now() - EXPORT_JOB_STALE_AFTER
+    with transaction.atomic():
+        job = (
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ExportJob.STATUS_PENDING)
+            .order_by('created_at')
+            .first()
+        ) or (
+            ExportJob.objects.select_for_update(skip_locked=True)
+            .filter(status=ExportJob.STATUS_RUNNING, started_at__lt=stale)
+            .order_by('started_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = ExportJob.STATUS_RUNNING
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+def run_export_job(job):
+    """Write the job's file to default storage and mark it done (or failed, with the error)."""
+    try:
+        queryset = export_queryset(job.model_key, job.user, job.filters)
+        columns = export_columns(job.model_key)
+        # Fingerprint the rows actually written; they may have changed since the job was queued.
+        fingerprint, row_count = export_fingerprint(queryset, job.model_key, job.format, job.filters)
+        with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE) as spool:
+            if job.format == 'csv':
+                for chunk in iter_csv_chunks(queryset, columns):
+                    spool.write(chunk.encode('utf-8'))
+            elif job.format == 'parquet':
+                write_queryset_parquet(queryset, columns, spool)
+            else:
+                write_queryset_xlsx(queryset, columns, spool)
+            spool.seek(0)
+            job.file.save(job.filename, File(spool), save=False)
+        job.row_count = row_count
+        job.fingerprint = fingerprint
+        job.status = ExportJob.STATUS_DONE
+        job.error = ''
+    except Exception as e:
+        job.status = ExportJob.STATUS_FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def purge_export_jobs(older_than):
+    """Delete jobs finished before older_than, and their files. Returns the number deleted."""
+    deleted = 0
+    for job in ExportJob.objects.filter(finished_at__lt=older_than).iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return deleted
@@ -1,13 +1,16 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 
 from .models import (
-    AppSettings, ChoiceList, UserProfile,
+    AppSettings, ChoiceList, EmailTemplate, UserProfile,
     Client, ClientNote, Contact, ContactNote, Lead, LeadNote, Property, PropertyNote,
-    Transaction, TransactionNote, TransactionParty, TransactionMilestone, TransactionTask,
+    Transaction, TransactionDocument, TransactionNote, TransactionParty, TransactionMilestone, TransactionTask,
 )
 from .choice_utils import get_choices_for_list
+from .mail_merge import SEGMENT_CHOICES, SEGMENT_CLIENTS
+from .signature_images import prepare_signature_image
 
 
 class SignupForm(UserCreationForm):
@@ -54,6 +57,51 @@ class SendEmailForm(forms.Form):
     )
 
 
+class EmailTemplateForm(forms.ModelForm):
+    class Meta:
+        model = EmailTemplate
+        fields = ['name', 'subject', 'body']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'e.g. Spring market update'}),
+            'subject': forms.TextInput(attrs={'class': 'form-control'}),
+            'body': forms.Textarea(attrs={'class': 'form-control', 'rows': 10}),
+        }
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+
+    def clean_name(self):
+        name = self.cleaned_data['name'].strip()
+        others = EmailTemplate.objects.filter(user=self.user, name__iexact=name).exclude(pk=self.instance.pk)
+        if self.user is not None and others.exists():
+            raise forms.ValidationError('You already have a template with this name.')
+        return name
+
+
+class EmailTemplateSendForm(forms.Form):
+    """Pick a segment for a saved template: opted-in clients (optionally of one status) or leads by referral."""
+    segment = forms.ChoiceField(
+        choices=SEGMENT_CHOICES,
+        initial=SEGMENT_CLIENTS,
+        widget=forms.RadioSelect(attrs={'class': 'form-check-input'}),
+    )
+    client_status = forms.ChoiceField(required=False, widget=forms.Select(attrs={'class': 'form-select'}))
+    lead_referral = forms.ChoiceField(required=False, widget=forms.Select(attrs={'class': 'form-select'}))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['client_status'].choices = [('', 'Any status')] + get_choices_for_list('client_status')
+        self.fields['lead_referral'].choices = [('', 'Any referral source')] + get_choices_for_list('lead_referral')
+
+    @property
+    def segment_value(self):
+        """The status or referral filter for the chosen segment."""
+        if self.cleaned_data['segment'] == SEGMENT_CLIENTS:
+            return self.cleaned_data.get('client_status', '')
+        return self.cleaned_data.get('lead_referral', '')
+
+
 class SendTransactionEmailForm(forms.Form):
     """Send email to one or more transaction parties and/or additional addresses. Multiple attachments supported."""
     recipients = forms.MultipleChoiceField(
@@ -75,10 +123,16 @@ class SendTransactionEmailForm(forms.Form):
     body = forms.CharField(
         widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 4, 'placeholder': 'Message…'}),
     )
+    documents = forms.ModelMultipleChoiceField(
+        queryset=TransactionDocument.objects.none(),
+        required=False,
+        widget=forms.CheckboxSelectMultiple(attrs={'class': 'form-check-input'}),
+    )
 
     def __init__(self, *args, transaction=None, **kwargs):
         super().__init__(*args, **kwargs)
         if transaction:
+            self.fields['documents'].queryset = transaction.documents.all()
             parties_with_email = [
                 p for p in transaction.parties.all()
                 if getattr(p, 'display_email', None) and p.display_email != '—'
@@ -369,6 +423,18 @@ class ImportForm(forms.Form):
         widget=forms.RadioSelect(attrs={'class': 'form-check-input'}),
         initial='csv',
     )
+    update_existing = forms.BooleanField(
+        label='Update existing records that match by email (MLS number for properties)',
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+    )
+
+
+class TransactionImportForm(forms.Form):
+    file = forms.FileField(
+        label='Workbook',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.xlsx'}),
+    )
 
 
 # --- User profile forms ---
@@ -417,10 +483,20 @@ class UserProfileForm(forms.ModelForm):
             'constant_contact_list_id': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'List ID (required for sync)'}),
         }
 
+    def clean_signature_image(self):
+        """A new upload is downscaled and re-encoded before it is stored (see signature_images)."""
+        image = self.cleaned_data.get('signature_image')
+        if isinstance(image, UploadedFile):
+            image = prepare_signature_image(image)
+        return image
+
     def save(self, commit=True):
         obj = super().save(commit=False)
         if self.cleaned_data.get('clear_signature_image'):
             obj.signature_image = None
+        if (self.cleaned_data.get('clear_signature_image')
+                or {'email_signature', 'signature_image'} & set(self.changed_data)):
+            obj.signature_version = (obj.signature_version or 0) + 1
         # Don't overwrite secret fields with empty when user left them blank (password-style fields)
         if obj.pk:
             for field_name in ('mailchimp_api_key', 'constant_contact_api_secret',
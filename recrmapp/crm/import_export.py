@@ -1,19 +1,75 @@
 """
 CSV and Excel import/export for Lead, Client, Contact, Property.
-Export: download as CSV or .xlsx.
+Export: download as CSV (streamed), .xlsx or Parquet.
 Import: upload CSV or .xlsx, validate, create records (optional update by matching email/name).
+Dry run: validate the whole file through the same pipeline and report what would happen.
 """
 import csv
 import io
+import tempfile
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from decimal import Decimal, InvalidOperation
+from itertools import islice
 
-from django.http import HttpResponse
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, connections, transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
 
+from .choice_utils import get_choices_for_list
 from .models import Lead, Client, Contact, Property
 
 # Max upload size for import files (DoS prevention)
 MAX_IMPORT_FILE_SIZE = 15 * 1024 * 1024  # 15 MB
 
+IMPORT_MODELS = {'lead': Lead, 'client': Client, 'contact': Contact, 'property': Property}
+
+# With "update existing", an imported row updates the user's record with the same value in this field.
+IMPORT_MATCH_FIELDS = {
+    'lead': 'email',
+    'client': 'email',
+    'contact': 'email',
+    'property': 'mls_number',
+}
+
+# Dry-run preview: parsed rows shown on the page, and max rows kept for the downloadable error report.
+IMPORT_PREVIEW_SAMPLE_SIZE = 10
+MAX_IMPORT_ERROR_REPORT_ROWS = 10000
+# The full report is written to default storage under this prefix; the session only keeps its name.
+IMPORT_ERROR_REPORT_DIR = 'import_errors'
+
+# Valid rows are written in one transaction per batch (bulk_create for new rows); with workers, each process validates a chunk.
+IMPORT_BATCH_SIZE = 500
+IMPORT_CHUNK_SIZE = 5000
+
+# Export: rows fetched per database round trip and written per streamed response chunk.
+EXPORT_CHUNK_SIZE = 2000
+# Excel/Parquet export: finished files up to this size stay in memory before spilling to disk; streamed in blocks.
+EXPORT_SPOOL_MAX_SIZE = 5 * 1024 * 1024
+EXPORT_STREAM_BLOCK_SIZE = 64 * 1024
+
+# Accepted date formats for imported date columns (.xlsx date cells arrive as "YYYY-MM-DD HH:MM:SS").
+IMPORT_DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%Y-%m-%d %H:%M:%S')
+
+# Choice fields whose codes and labels are also editable in Application Admin: (model name, field) -> list_type.
+IMPORT_CHOICE_LISTS = {
+    ('client', 'client_type'): 'client_type',
+    ('client', 'status'): 'client_status',
+    ('lead', 'status'): 'lead_status',
+    ('lead', 'referral'): 'lead_referral',
+    ('contact', 'contact_type'): 'contact_type',
+    ('transaction', 'status'): 'transaction_status',
+    ('transaction', 'representation'): 'transaction_representation',
+}
+
+_INTEGER_FIELD_TYPES = (
+    'IntegerField', 'PositiveIntegerField', 'SmallIntegerField', 'PositiveSmallIntegerField', 'BigIntegerField',
+)
+
 
 # --- Export column definitions: (field_name, header_label) ---
 EXPORT_COLUMNS = {
@@ -85,67 +141,280 @@ EXPORT_COLUMNS = {
     ],
 }
 
+# Transactions export (not importable through this module); 'gci' is annotated by the export queryset.
+TRANSACTION_EXPORT_COLUMNS = [
+    ('file_number', 'File Number'),
+    ('property__title', 'Property'),
+    ('property__address', 'Address'),
+    ('property__city', 'City'),
+    ('property__mls_number', 'MLS Number'),
+    ('status', 'Status'),
+    ('representation', 'Representation'),
+    ('commission_percentage', 'Commission %'),
+    ('final_sales_price', 'Final Sales Price'),
+    ('gci', 'GCI'),
+    ('listing_date', 'Listing Date'),
+]
+
+EXPORT_FORMATS = ('csv', 'xlsx', 'parquet')
+
+
+def export_columns(model_key):
+    """(field_name, header_label) columns for an export of model_key ([] if it cannot be exported)."""
+    if model_key == 'transaction':
+        return TRANSACTION_EXPORT_COLUMNS
+    return EXPORT_COLUMNS.get(model_key, [])
+
+
+def _format_cell(val):
+    """Format one value as export text (dates ISO, booleans Yes/No, None blank)."""
+    if val is None:
+        return ''
+    if hasattr(val, 'isoformat'):  # date/datetime
+        return val.isoformat() if val else ''
+    if isinstance(val, (Decimal,)):
+        return str(val)
+    if isinstance(val, bool):
+        return 'Yes' if val else 'No'
+    return str(val)
+
 
 def _row_from_instance(instance, columns):
     """Build a list of cell values for one model instance."""
-    row = []
+    return [_format_cell(getattr(instance, field_name, None)) for field_name, _ in columns]
+
+
+def _format_text(val):
+    return '' if val is None else str(val)
+
+
+def _format_date(val):
+    return val.isoformat() if val else ''
+
+
+def _format_bool(val):
+    if val is None:
+        return ''
+    return 'Yes' if val else 'No'
+
+
+def _export_field(queryset, name):
+    """Model field (or annotation output field) behind an export column; follows lookups like property__title."""
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    model_class = queryset.model
+    *path, last = name.split('__')
+    for part in path:
+        model_class = model_class._meta.get_field(part).related_model
+    return model_class._meta.get_field(last)
+
+
+def _decimal_quantizer(field):
+    """Round to the field's decimal places (computed columns such as GCI can come back with more)."""
+    exp = Decimal(1).scaleb(-field.decimal_places)
+    return lambda val: None if val is None else val.quantize(exp)
+
+
+def _compile_formatters(queryset, columns):
+    """One formatter per column, picked once from the model field type (same output as _format_cell)."""
+    formatters = []
     for field_name, _ in columns:
-        val = getattr(instance, field_name, None)
-        if val is None:
-            row.append('')
-        elif hasattr(val, 'isoformat'):  # date/datetime
-            row.append(val.isoformat() if val else '')
-        elif isinstance(val, (Decimal,)):
-            row.append(str(val))
-        elif isinstance(val, bool):
-            row.append('Yes' if val else 'No')
+        field = _export_field(queryset, field_name)
+        internal_type = field.get_internal_type()
+        if internal_type == 'BooleanField':
+            formatters.append(_format_bool)
+        elif internal_type == 'DecimalField':
+            quantize = _decimal_quantizer(field)
+            formatters.append(lambda val, quantize=quantize: _format_text(quantize(val)))
+        elif internal_type in ('DateField', 'DateTimeField'):
+            formatters.append(_format_date)
         else:
-            row.append(str(val))
-    return row
+            formatters.append(_format_text)
+    return formatters
+
+
+def _iter_export_values(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield value tuples for fields in queryset order without loading the whole result.
+    Uses a server-side cursor (PostgreSQL) or chunked fetches (SQLite/MySQL) via iterator(). When
+    server-side cursors are disabled for a pooled PostgreSQL connection, a client-side cursor would
+    buffer every row, so fetch the ordered pks first and read the rows chunk_size at a time.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or not connection.settings_dict.get('DISABLE_SERVER_SIDE_CURSORS'):
+        yield from queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+        return
+    pks = list(queryset.values_list('pk', flat=True))
+    unordered = queryset.order_by()
+    for start in range(0, len(pks), chunk_size):
+        batch = pks[start:start + chunk_size]
+        rows = {row[0]: row[1:] for row in unordered.filter(pk__in=batch).values_list('pk', *fields)}
+        for pk in batch:
+            if pk in rows:  # deleted since the pk query
+                yield rows[pk]
+
+
+def iter_csv_chunks(queryset, columns):
+    """
+    Yield the CSV export of queryset as text chunks: BOM and header first, then EXPORT_CHUNK_SIZE rows
+    per chunk. Rows are read with values_list (no model instances).
+    """
+    fields = [field_name for field_name, _ in columns]
+    formatters = _compile_formatters(queryset, columns)
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write('\ufeff')  # BOM for Excel UTF-8
+    writer.writerow([label for _, label in columns])
+    yield buf.getvalue()
+    pending = 0
+    for values in _iter_export_values(queryset, fields):
+        if pending == 0:
+            buf.seek(0)
+            buf.truncate()
+        writer.writerow([fmt(val) for fmt, val in zip(formatters, values)])
+        pending += 1
+        if pending == EXPORT_CHUNK_SIZE:
+            yield buf.getvalue()
+            pending = 0
+    if pending:
+        yield buf.getvalue()
 
 
 def export_queryset_csv(queryset, columns, filename_base):
-    """Stream queryset as CSV; return HttpResponse."""
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    """
+    Stream queryset as CSV; return StreamingHttpResponse.
+    Memory stays flat and the download starts before the query finishes.
+    """
+    response = StreamingHttpResponse(iter_csv_chunks(queryset, columns), content_type='text/csv; charset=utf-8')
     response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
-    response.write('\ufeff')  # BOM for Excel UTF-8
-    writer = csv.writer(response)
-    headers = [label for _, label in columns]
-    writer.writerow(headers)
-    for obj in queryset:
-        writer.writerow(_row_from_instance(obj, columns))
     return response
 
 
+def _xlsx_text(val):
+    return '' if val is None else str(val)
+
+
+def _xlsx_native(val):
+    return val  # numbers and dates written as typed cells; None leaves the cell empty
+
+
+def _compile_xlsx_writers(queryset, columns):
+    """
+    One value writer per column, picked once from the model field type: integers and decimals become
+    number cells, dates date cells, booleans Yes/No (as in CSV), everything else text. Text stays text,
+    so zip codes and phone numbers keep their leading zeros.
+    """
+    writers = []
+    for field_name, _ in columns:
+        field = _export_field(queryset, field_name)
+        internal_type = field.get_internal_type()
+        if internal_type == 'DecimalField':
+            writers.append(_decimal_quantizer(field))
+        elif internal_type in _INTEGER_FIELD_TYPES or internal_type in ('FloatField', 'DateField'):
+            writers.append(_xlsx_native)  # openpyxl picks the number/date format
+        elif internal_type == 'BooleanField':
+            writers.append(_format_bool)
+        else:
+            writers.append(_xlsx_text)
+    return writers
+
+
+def write_queryset_xlsx(queryset, columns, fileobj):
+    """Write queryset as .xlsx to a binary file object through an openpyxl write-only workbook (requires openpyxl)."""
+    from openpyxl import Workbook
+    fields = [field_name for field_name, _ in columns]
+    writers = _compile_xlsx_writers(queryset, columns)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Data')
+    ws.append([label for _, label in columns])
+    for values in _iter_export_values(queryset, fields):
+        ws.append([write(val) for write, val in zip(writers, values)])
+    wb.save(fileobj)
+
+
 def export_queryset_xlsx(queryset, columns, filename_base):
-    """Stream queryset as Excel .xlsx; return HttpResponse."""
+    """
+    Stream queryset as Excel .xlsx; return FileResponse.
+    The workbook is written to a temporary file (kept in memory up to EXPORT_SPOOL_MAX_SIZE, then on
+    disk), which is streamed back EXPORT_STREAM_BLOCK_SIZE bytes at a time.
+    """
     try:
-        from openpyxl import Workbook
-        from openpyxl.utils import get_column_letter
+        import openpyxl  # noqa: F401
     except ImportError:
-        from django.http import HttpResponse
-        r = HttpResponse('Excel export requires openpyxl.', status=501)
-        return r
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Data'
-    headers = [label for _, label in columns]
-    for col, header in enumerate(headers, 1):
-        ws.cell(row=1, column=col, value=header)
-    for row_idx, obj in enumerate(queryset, 2):
-        row_vals = _row_from_instance(obj, columns)
-        for col_idx, val in enumerate(row_vals, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=val)
-            if isinstance(val, str) and val.isdigit():
-                try:
-                    cell.value = int(val)
-                except ValueError:
-                    pass
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        return HttpResponse('Excel export requires openpyxl.', status=501)
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+    write_queryset_xlsx(queryset, columns, spool)
+    spool.seek(0)
+    response = FileResponse(
+        spool,
+        as_attachment=True,
+        filename=f'{filename_base}.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+    response.block_size = EXPORT_STREAM_BLOCK_SIZE
+    return response
+
+
+def _parquet_column(pa, field):
+    """(arrow type, value converter or None) for one export column."""
+    internal_type = field.get_internal_type()
+    if internal_type in _INTEGER_FIELD_TYPES or internal_type in ('AutoField', 'BigAutoField'):
+        return pa.int64(), None
+    if internal_type == 'DecimalField':
+        return pa.decimal128(field.max_digits, field.decimal_places), _decimal_quantizer(field)
+    if internal_type == 'FloatField':
+        return pa.float64(), None
+    if internal_type == 'BooleanField':
+        return pa.bool_(), None
+    if internal_type == 'DateField':
+        return pa.date32(), None
+    if internal_type == 'DateTimeField':
+        return pa.timestamp('us', tz='UTC'), None
+    return pa.string(), None
+
+
+def write_queryset_parquet(queryset, columns, fileobj):
+    """
+    Write queryset as Parquet to a binary file object (requires pyarrow). Columns are named by field
+    (property__title -> property_title) and typed: decimals as decimal128, dates as date32, booleans
+    as bool. Rows are written EXPORT_CHUNK_SIZE at a time as record batches.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    fields = [field_name for field_name, _ in columns]
+    specs = [_parquet_column(pa, _export_field(queryset, field_name)) for field_name in fields]
+    schema = pa.schema([
+        (field_name.replace('__', '_'), arrow_type) for field_name, (arrow_type, _) in zip(fields, specs)
+    ])
+    rows = _iter_export_values(queryset, fields)
+    with pq.ParquetWriter(fileobj, schema, compression='snappy') as writer:
+        while True:
+            batch = list(islice(rows, EXPORT_CHUNK_SIZE))
+            if not batch:
+                break
+            arrays = [
+                pa.array([convert(v) for v in values] if convert else list(values), type=arrow_type)
+                for values, (arrow_type, convert) in zip(zip(*batch), specs)
+            ]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+
+
+def export_queryset_parquet(queryset, columns, filename_base):
+    """Stream queryset as Parquet; return FileResponse (spooled like the Excel export)."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return HttpResponse('Parquet export requires pyarrow (pip install pyarrow).', status=501)
+    spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_SIZE)
+    write_queryset_parquet(queryset, columns, spool)
+    spool.seek(0)
+    response = FileResponse(
+        spool,
+        as_attachment=True,
+        filename=f'{filename_base}.parquet',
+        content_type='application/vnd.apache.parquet',
     )
-    response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
-    wb.save(response)
+    response.block_size = EXPORT_STREAM_BLOCK_SIZE
     return response
 
 
@@ -156,49 +425,291 @@ def _normalize_header(s):
     return ' '.join(str(s).strip().lower().split())
 
 
-def _parse_import_row(row, columns):
-    """Convert a dict row (header -> value) into a dict of model field -> value. Match row keys to column labels."""
-    out = {}
+def _compile_header_map(headers, columns):
+    """Resolve each column to the first matching file header, once per file. Returns [(field_name, header), ...]."""
+    norm_headers = [(h, _normalize_header(h)) for h in headers]
+    header_map = []
     for field_name, label in columns:
         norm_label = _normalize_header(label)
         norm_field = _normalize_header(field_name.replace('_', ' '))
-        for h, val in row.items():
-            norm_h = _normalize_header(h)
+        for h, norm_h in norm_headers:
             if norm_h == norm_label or norm_h == norm_field:
-                out[field_name] = val
+                header_map.append((field_name, h))
                 break
-    return out
+    return header_map
 
 
-def _coerce_value(val, field_name, model_class):
-    """Coerce string value to the right type for the model field."""
-    if val is None or (isinstance(val, str) and not val.strip()):
-        return None
-    if isinstance(val, str):
-        val = val.strip()
+def _admin_choices(model_class):
+    """The Application Admin choices for model_class's choice fields: {field_name: [(code, label), ...]}."""
+    model_name = model_class._meta.model_name
+    return {
+        field_name: get_choices_for_list(list_type)
+        for (name, field_name), list_type in IMPORT_CHOICE_LISTS.items()
+        if name == model_name
+    }
+
+
+def _choice_lookup(field, model_class, admin_choices=None):
+    """
+    Map each choice code and label (normalized like headers) -> code, for the model's and the admin-edited
+    choices. admin_choices: _admin_choices(model_class), read in the parent so import workers need no database.
+    """
+    if admin_choices is None:
+        admin_choices = _admin_choices(model_class)
+    choices = list(field.flatchoices) + list(admin_choices.get(field.name, []))
+    lookup = {}
+    for code, label in choices:
+        lookup[_normalize_header(label)] = code
+    for code, _ in choices:
+        lookup[_normalize_header(str(code).replace('_', ' '))] = code
+        lookup[_normalize_header(code)] = code
+    return lookup
+
+
+def _compile_coercer(field_name, model_class, admin_choices=None):
+    """
+    Return a function that converts one raw cell into the value for this model field.
+    Field lookup, type dispatch, choice mapping and validators are resolved here, once per column, so
+    the per-row loop only calls the returned function. Raises ValueError with a user-facing message.
+    """
     try:
         field = model_class._meta.get_field(field_name)
-    except Exception:
+    except FieldDoesNotExist:
+        return lambda raw: raw.strip() if isinstance(raw, str) else raw
+    internal_type = field.get_internal_type()
+    label = str(field.verbose_name).capitalize()
+    # Blank cells: the field default (e.g. status), else '' for NOT NULL text columns (NULL would fail the insert).
+    if field.has_default():
+        empty = field.get_default()
+    else:
+        empty = '' if (field.empty_strings_allowed and not field.null) else None
+    validators = field.validators  # max length, email, URL, max digits
+
+    if field.choices:
+        # Accept the code or the display label in any case ("Closed", "closed"); store the code.
+        choice_codes = _choice_lookup(field, model_class, admin_choices)
+
+        def parse(s):
+            try:
+                return choice_codes[_normalize_header(s)]
+            except KeyError:
+                raise ValueError(f'{label}: "{s}" is not a valid choice.')
+    elif internal_type in _INTEGER_FIELD_TYPES:
+        def parse(s):
+            try:
+                return int(float(s.replace(',', '')))
+            except ValueError:
+                raise ValueError(f'{label}: "{s}" is not a number.')
+    elif internal_type == 'DecimalField':
+        quantum = Decimal(1).scaleb(-field.decimal_places)
+
+        def parse(s):
+            try:
+                val = Decimal(s.replace(',', '').replace('$', '').strip())
+            except InvalidOperation:
+                raise ValueError(f'{label}: "{s}" is not a number.')
+            if not val.is_finite():
+                raise ValueError(f'{label}: "{s}" is not a number.')
+            return val.quantize(quantum)
+    elif internal_type == 'BooleanField':
+        empty = False
+
+        def parse(s):
+            return s.lower() in ('1', 'true', 'yes', 'y', 'x')
+    elif internal_type == 'DateField':
+        def parse(s):
+            for fmt in IMPORT_DATE_FORMATS:
+                try:
+                    return datetime.strptime(s, fmt).date()
+                except ValueError:
+                    continue
+            raise ValueError(f'{label}: "{s}" is not a date.')
+    else:
+        def parse(s):
+            return s
+
+    def coerce(raw):
+        if raw is None:
+            return empty
+        s = str(raw).strip()
+        if not s:
+            return empty
+        val = parse(s)
+        for validator in validators:
+            try:
+                validator(val)
+            except ValidationError as e:
+                raise ValueError(f'{label}: {e.messages[0]}')
         return val
-    if field.get_internal_type() in ('IntegerField', 'PositiveIntegerField', 'SmallIntegerField'):
+
+    return coerce
+
+
+def _coerce_value(val, field_name, model_class):
+    """Coerce string value to the right type for the model field (None if it cannot be parsed)."""
+    try:
+        return _compile_coercer(field_name, model_class)(val)
+    except ValueError:
+        return None
+
+
+def _compile_import_plan(headers, model_key, model_class, admin_choices=None):
+    """Compile the file's headers into [(field_name, header, coerce), ...] for import_records."""
+    columns = EXPORT_COLUMNS.get(model_key, [])
+    if admin_choices is None:
+        admin_choices = _admin_choices(model_class)
+    return [
+        (field_name, header, _compile_coercer(field_name, model_class, admin_choices))
+        for field_name, header in _compile_header_map(headers, columns)
+    ]
+
+
+def _check_required(kwargs, model_key):
+    """Apply per-model required fields (and defaults). Returns an error message or None."""
+    if model_key == 'property':
+        if not kwargs.get('title'):
+            return 'Title required.'
+        if not kwargs.get('address'):
+            kwargs['address'] = kwargs.get('title', '')
+        return None
+    if not kwargs.get('first_name') and not kwargs.get('last_name'):
+        return 'First name or last name required.'
+    return None
+
+
+def _iter_validated_rows(row_iter, plan, model_key, start=2, check_required=_check_required, omit_blank=False):
+    """
+    Run every non-blank row through the compiled plan. start is the file row number of the first row
+    (2 = header is row 1); check_required(kwargs, model_key) returns an error message or None.
+    omit_blank: leave blank cells out of kwargs instead of filling in the field default, so an update keeps the
+    record's current value (and a create gets the model default).
+    Yields (row_num, kwargs, error): kwargs is the model field dict, or None with an error message
+    listing every problem found in that row.
+    """
+    for row_num, row in enumerate(row_iter, start):
+        values = [(field_name, coerce, row.get(header)) for field_name, header, coerce in plan]
+        # Skip empty rows
+        if all(raw is None or not str(raw).strip() for _, _, raw in values):
+            continue
+        kwargs = {}
+        problems = []
+        for field_name, coerce, raw in values:
+            if omit_blank and (raw is None or not str(raw).strip()):
+                continue
+            try:
+                kwargs[field_name] = coerce(raw)
+            except ValueError as e:
+                problems.append(str(e))
+        if not problems:
+            missing = check_required(kwargs, model_key)
+            if missing:
+                problems.append(missing)
+        if problems:
+            yield row_num, None, ' '.join(problems)
+        else:
+            yield row_num, kwargs, None
+
+
+def _init_import_worker():
+    """
+    Process-pool initializer: make Django usable in spawned workers (no-op when forked). Workers must not use
+    the database: a forked worker shares the parent's open connection, so everything they need from it (the
+    Application Admin choices) is read in the parent and sent with each task.
+    """
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _validate_chunk(task):
+    """Process-pool task: validate one row range. The plan holds closures, so each worker compiles its own."""
+    model_key, headers, start, rows, omit_blank, admin_choices = task
+    plan = _compile_import_plan(headers, model_key, IMPORT_MODELS[model_key], admin_choices)
+    return list(_iter_validated_rows(rows, plan, model_key, start=start, omit_blank=omit_blank))
+
+
+def _iter_validated_rows_parallel(headers, row_iter, model_key, workers, chunk_size=IMPORT_CHUNK_SIZE,
+                                  omit_blank=False):
+    """
+    Like _iter_validated_rows, but validates row ranges of chunk_size in a pool of worker processes.
+    Results are yielded in file order and keep their original row numbers.
+    """
+    admin_choices = _admin_choices(IMPORT_MODELS[model_key])  # plain data, so workers never query
+
+    def tasks():
+        start = 2  # header is row 1
+        chunk = list(islice(row_iter, chunk_size))
+        while chunk:
+            yield model_key, headers, start, chunk, omit_blank, admin_choices
+            start += len(chunk)
+            chunk = list(islice(row_iter, chunk_size))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_import_worker) as pool:
+        for results in pool.map(_validate_chunk, tasks()):
+            yield from results
+
+
+def _existing_match_keys(model_class, match_field, user):
+    """Map normalized match key (e.g. lowercased email) -> pk for the user's existing records. One query."""
+    qs = (
+        model_class.objects.filter(user=user)
+        .exclude(**{match_field: ''})
+        .order_by()
+        .values_list(match_field, 'pk')
+    )
+    return {str(key).strip().lower(): pk for key, pk in qs.iterator()}
+
+
+def _write_import_rows(model_class, user, creates, updates, existing, errors, now):
+    """Row-by-row fallback for _write_import_batch, so a database error is reported against its own row."""
+    created = 0
+    updated = 0
+    for row_num, key, kwargs in creates:
         try:
-            return int(float(str(val).replace(',', '')))
-        except (ValueError, TypeError):
-            return None
-    if field.get_internal_type() in ('DecimalField',):
+            with transaction.atomic():
+                obj = model_class.objects.create(user=user, **kwargs)
+        except DatabaseError as e:
+            errors.append({'row': row_num, 'message': str(e)})
+            continue
+        created += 1
+        if key:
+            existing[key] = obj.pk
+    for row_num, pk, kwargs in updates:
         try:
-            return Decimal(str(val).replace(',', '').replace('$', '').strip())
-        except (InvalidOperation, ValueError, TypeError):
-            return None
-    if field.get_internal_type() == 'BooleanField':
-        if isinstance(val, bool):
-            return val
-        s = str(val).strip().lower()
-        return s in ('1', 'true', 'yes', 'y', 'x')
-    if field.get_internal_type() == 'URLField':
-        s = str(val).strip()
-        return s if s else ''
-    return val
+            with transaction.atomic():
+                model_class.objects.filter(pk=pk).update(updated_at=now, **kwargs)
+        except DatabaseError as e:
+            errors.append({'row': row_num, 'message': str(e)})
+            continue
+        updated += 1
+    return created, updated
+
+
+def _write_import_batch(model_class, user, creates, updates, existing, errors):
+    """
+    Write one batch in one transaction: a single bulk_create for new rows plus the updates.
+    creates: [(row_num, match_key, kwargs)], updates: [(row_num, pk, kwargs)].
+    Records the pks of created rows in existing, so later rows with the same key update them.
+    Returns (created, updated).
+    """
+    if not creates and not updates:
+        return 0, 0
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            objs = model_class.objects.bulk_create(
+                [model_class(user=user, **kwargs) for _, _, kwargs in creates]
+            )
+            # One UPDATE per matched row: bulk_update's per-row CASE expressions cost far more to build.
+            for _, pk, kwargs in updates:
+                model_class.objects.filter(pk=pk).update(updated_at=now, **kwargs)
+    except DatabaseError:
+        return _write_import_rows(model_class, user, creates, updates, existing, errors, now)
+    for (_, key, _), obj in zip(creates, objs):
+        if key and obj.pk is not None:
+            existing[key] = obj.pk
+    return len(creates), len(updates)
 
 
 def _get_reader_for_file(uploaded_file, format_type):
@@ -220,82 +731,146 @@ def _get_reader_for_file(uploaded_file, format_type):
         except ImportError:
             raise ValueError('Excel import requires openpyxl.')
         wb = load_workbook(filename=uploaded_file, read_only=True, data_only=True)
-        ws = wb.active
-        rows = list(ws.iter_rows(values_only=True))
-        if not rows:
-            return [], iter([])
-        headers = [str(c) if c is not None else '' for c in rows[0]]
-        def row_iter():
-            for row in rows[1:]:
-                vals = [str(c).strip() if c is not None else '' for c in row]
-                vals = vals + [''] * (len(headers) - len(vals))
-                yield dict(zip(headers, vals))
-        return headers, row_iter()
+        return _get_reader_for_sheet(wb.active)
     raise ValueError(f'Unsupported format: {format_type}')
 
 
-def import_records(uploaded_file, model_key, format_type, user=None):
+def _get_reader_for_sheet(ws):
+    """Return (headers, row_iter) for an openpyxl worksheet; first row is headers, cells are stripped text."""
+    rows = list(ws.iter_rows(values_only=True))
+    if not rows:
+        return [], iter([])
+    headers = [str(c) if c is not None else '' for c in rows[0]]
+    def row_iter():
+        for row in rows[1:]:
+            vals = [str(c).strip() if c is not None else '' for c in row]
+            vals = vals + [''] * (len(headers) - len(vals))
+            yield dict(zip(headers, vals))
+    return headers, row_iter()
+
+
+def import_records(uploaded_file, model_key, format_type, user=None, dry_run=False, update_existing=False,
+                   workers=1):
     """
     Parse uploaded file and create records.
     model_key: 'lead' | 'client' | 'contact' | 'property'
     format_type: 'csv' | 'xlsx'
     user: required for multi-user; assigned as owner of created records.
-    Returns: dict with keys: created (int), errors (list of {row, message}).
+    update_existing: rows matching one of the user's records on IMPORT_MATCH_FIELDS update it instead; blank cells
+    keep the record's current value.
+    dry_run: validate the whole file through the same pipeline without writing anything.
+    workers: validate and coerce row chunks in this many processes (for very large files).
+    Valid rows are written in batches of IMPORT_BATCH_SIZE (one bulk_create per batch).
+    Returns: dict with keys: created, updated (int), errors (list of {row, message}).
+    With dry_run: would_create, would_update, invalid (int), columns (labels), sample (list of
+    {row, values}) and errors.
     """
     if user is None:
-        return {'created': 0, 'errors': [{'row': 0, 'message': 'User required for import.'}]}
-    model_map = {'lead': Lead, 'client': Client, 'contact': Contact, 'property': Property}
-    model_class = model_map.get(model_key)
+        return {'created': 0, 'updated': 0, 'errors': [{'row': 0, 'message': 'User required for import.'}]}
+    model_class = IMPORT_MODELS.get(model_key)
     if not model_class:
-        return {'created': 0, 'errors': [{'row': 0, 'message': 'Invalid model.'}]}
-    columns = EXPORT_COLUMNS.get(model_key, [])
+        return {'created': 0, 'updated': 0, 'errors': [{'row': 0, 'message': 'Invalid model.'}]}
 
     try:
         headers, row_iter = _get_reader_for_file(uploaded_file, format_type)
     except Exception as e:
-        return {'created': 0, 'errors': [{'row': 0, 'message': str(e)}]}
+        return {'created': 0, 'updated': 0, 'errors': [{'row': 0, 'message': str(e)}]}
+
+    columns = EXPORT_COLUMNS.get(model_key, [])
+    fields = [field_name for field_name, _ in _compile_header_map(headers, columns)]
+    match_field = IMPORT_MATCH_FIELDS.get(model_key) if update_existing else None
+    omit_blank = bool(match_field)
+    if workers and workers > 1:
+        rows = _iter_validated_rows_parallel(headers, row_iter, model_key, workers, omit_blank=omit_blank)
+    else:
+        plan = _compile_import_plan(headers, model_key, model_class)
+        rows = _iter_validated_rows(row_iter, plan, model_key, omit_blank=omit_blank)
+    existing = _existing_match_keys(model_class, match_field, user) if match_field else {}
 
     created = 0
+    updated = 0
     errors = []
-    for row_num, row in enumerate(row_iter, 2):  # 2 = header is row 1
-        if not isinstance(row, dict):
-            row = dict(zip(headers, row)) if headers else {}
-        data = _parse_import_row(row, columns)
-        # Skip empty rows
-        if all(not str(v).strip() for v in data.values() if v is not None):
+    sample = []
+    creates = []
+    updates = []
+    pending = {}  # match key -> kwargs of a row already queued in this batch
+    for row_num, kwargs, error in rows:
+        if error:
+            errors.append({'row': row_num, 'message': error})
             continue
-        try:
-            kwargs = {}
-            for field_name, _ in columns:
-                if field_name not in data:
-                    continue
-                raw = data.get(field_name)
-                val = _coerce_value(raw, field_name, model_class)
-                if model_key == 'property' and field_name == 'featured':
-                    val = bool(val) if val is not None else False
-                kwargs[field_name] = val
-            # Required fields for each model
-            if model_key == 'lead':
-                if not kwargs.get('first_name') and not kwargs.get('last_name'):
-                    errors.append({'row': row_num, 'message': 'First name or last name required.'})
-                    continue
-            if model_key == 'client':
-                if not kwargs.get('first_name') and not kwargs.get('last_name'):
-                    errors.append({'row': row_num, 'message': 'First name or last name required.'})
-                    continue
-            if model_key == 'contact':
-                if not kwargs.get('first_name') and not kwargs.get('last_name'):
-                    errors.append({'row': row_num, 'message': 'First name or last name required.'})
-                    continue
-            if model_key == 'property':
-                if not kwargs.get('title'):
-                    errors.append({'row': row_num, 'message': 'Title required.'})
-                    continue
-                if not kwargs.get('address'):
-                    kwargs['address'] = kwargs.get('title', '')
-            kwargs['user'] = user
-            model_class.objects.create(**kwargs)
-            created += 1
-        except Exception as e:
-            errors.append({'row': row_num, 'message': str(e)})
-    return {'created': created, 'errors': errors}
+        key = str(kwargs.get(match_field) or '').strip().lower() if match_field else ''
+        if dry_run:
+            if key and existing.get(key) is not None:
+                updated += 1
+            else:
+                created += 1
+                if key:
+                    existing[key] = True  # a later row with the same key would update this one
+            if len(sample) < IMPORT_PREVIEW_SAMPLE_SIZE:
+                sample.append({'row': row_num, 'values': [_format_cell(kwargs.get(f)) for f in fields]})
+            continue
+        if key in pending:
+            pending[key].update(kwargs)
+            updated += 1
+            continue
+        if key and existing.get(key) is not None:
+            updates.append((row_num, existing[key], kwargs))
+        else:
+            creates.append((row_num, key, kwargs))
+        if key:
+            pending[key] = kwargs
+        if len(creates) + len(updates) >= IMPORT_BATCH_SIZE:
+            c, u = _write_import_batch(model_class, user, creates, updates, existing, errors)
+            created += c
+            updated += u
+            creates, updates, pending = [], [], {}
+    if not dry_run:
+        c, u = _write_import_batch(model_class, user, creates, updates, existing, errors)
+        created += c
+        updated += u
+        errors.sort(key=lambda err: err['row'])
+
+    if dry_run:
+        labels = dict(columns)
+        return {
+            'dry_run': True,
+            'would_create': created,
+            'would_update': updated,
+            'invalid': len(errors),
+            'columns': [labels[f] for f in fields],
+            'sample': sample,
+            'errors': errors,
+        }
+    return {'created': created, 'updated': updated, 'errors': errors}
+
+
+def save_import_error_report(errors, user, replace=None):
+    """
+    Write a per-row import error report (Row, Error) as CSV to default storage and return its name.
+    errors: [(row, message), ...]. replace: name of the user's previous report, deleted first.
+    """
+    if replace and replace.startswith(f'{IMPORT_ERROR_REPORT_DIR}/{user.pk}/'):
+        default_storage.delete(replace)
+    buf = io.StringIO()
+    buf.write('\ufeff')  # BOM for Excel UTF-8
+    writer = csv.writer(buf)
+    writer.writerow(['Row', 'Error'])
+    writer.writerows(errors)
+    name = f'{IMPORT_ERROR_REPORT_DIR}/{user.pk}/{uuid.uuid4().hex}.csv'
+    return default_storage.save(name, ContentFile(buf.getvalue().encode('utf-8')))
+
+
+def import_errors_csv(report_name, filename_base):
+    """Return a saved import error report as a CSV download (just the header row if there is none)."""
+    if report_name and default_storage.exists(report_name):
+        return FileResponse(
+            default_storage.open(report_name, 'rb'),
+            as_attachment=True,
+            filename=f'{filename_base}.csv',
+            content_type='text/csv; charset=utf-8',
+        )
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
+    response.write('\ufeff')  # BOM for Excel UTF-8
+    csv.writer(response).writerow(['Row', 'Error'])
+    return response
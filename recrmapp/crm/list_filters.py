@@ -0,0 +1,120 @@
+"""
+Search and filter params for the Leads, Clients, Contacts, Properties and Transactions lists.
+Shared by the list views and by exports, so an export contains exactly the rows the list shows.
+"""
+from django.db.models import Q
+
+# Querystring params each list understands (also what a background export job stores).
+LIST_FILTER_PARAMS = {
+    'lead': ('show_all', 'q', 'status', 'referral'),
+    'client': ('q', 'client_type', 'status'),
+    'contact': ('q', 'contact_type'),
+    'property': ('q', 'property_type', 'status'),
+    'transaction': ('q', 'status', 'representation'),
+}
+
+
+def list_filter_params(model_key, params):
+    """The non-empty filter params for model_key's list from a QueryDict or dict (as a plain dict)."""
+    filters = {}
+    for name in LIST_FILTER_PARAMS[model_key]:
+        value = (params.get(name) or '').strip()
+        if value:
+            filters[name] = value
+    return filters
+
+
+def filter_clients(qs, params):
+    q = (params.get('q') or '').strip()
+    if q:
+        qs = qs.filter(
+            Q(first_name__icontains=q) | Q(last_name__icontains=q)
+            | Q(email__icontains=q) | Q(phone__icontains=q)
+            | Q(city__icontains=q) | Q(address__icontains=q)
+        )
+    client_type = params.get('client_type', '')
+    if client_type:
+        qs = qs.filter(client_type=client_type)
+    status = params.get('status', '')
+    if status:
+        qs = qs.filter(status=status)
+    return qs
+
+
+def filter_contacts(qs, params):
+    q = (params.get('q') or '').strip()
+    if q:
+        qs = qs.filter(
+            Q(first_name__icontains=q) | Q(last_name__icontains=q)
+            | Q(email__icontains=q) | Q(phone__icontains=q)
+            | Q(company__icontains=q) | Q(city__icontains=q)
+        )
+    contact_type = params.get('contact_type', '')
+    if contact_type:
+        qs = qs.filter(contact_type=contact_type)
+    return qs
+
+
+def filter_properties(qs, params):
+    q = (params.get('q') or '').strip()
+    if q:
+        qs = qs.filter(
+            Q(title__icontains=q) | Q(address__icontains=q)
+            | Q(city__icontains=q) | Q(state__icontains=q)
+            | Q(zip_code__icontains=q) | Q(mls_number__icontains=q)
+        )
+    property_type = params.get('property_type', '')
+    if property_type:
+        qs = qs.filter(property_type=property_type)
+    status = params.get('status', '')
+    if status:
+        qs = qs.filter(status=status)
+    return qs
+
+
+def filter_leads(qs, params):
+    """Converted leads are hidden unless show_all is set."""
+    if not params.get('show_all'):
+        qs = qs.filter(converted_to_client__isnull=True)
+    q = (params.get('q') or '').strip()
+    if q:
+        qs = qs.filter(
+            Q(first_name__icontains=q) | Q(last_name__icontains=q)
+            | Q(email__icontains=q) | Q(phone__icontains=q)
+            | Q(city__icontains=q)
+        )
+    status = params.get('status', '')
+    if status:
+        qs = qs.filter(status=status)
+    referral = params.get('referral', '')
+    if referral:
+        qs = qs.filter(referral=referral)
+    return qs
+
+
+def filter_transactions(qs, params):
+    q = (params.get('q') or '').strip()
+    if q:
+        qs = qs.filter(
+            Q(file_number__icontains=q)
+            | Q(property__title__icontains=q)
+            | Q(property__address__icontains=q)
+            | Q(property__city__icontains=q)
+            | Q(property__mls_number__icontains=q)
+        )
+    status = params.get('status', '')
+    if status:
+        qs = qs.filter(status=status)
+    representation = params.get('representation', '')
+    if representation:
+        qs = qs.filter(representation=representation)
+    return qs
+
+
+LIST_FILTERS = {
+    'lead': filter_leads,
+    'client': filter_clients,
+    'contact': filter_contacts,
+    'property': filter_properties,
+    'transaction': filter_transactions,
+}
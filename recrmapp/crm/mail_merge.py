@@ -0,0 +1,116 @@
+"""
+Mail merge: saved EmailTemplates with {{ first_name }}-style fields, sent to a segment (opted-in clients of a
+status, leads by referral source) as one OutboundEmail per recipient.
+A template is compiled once per send into format strings, and recipients are streamed from the database as
+(first_name, last_name, email) tuples in batches, so a send never loads model instances or re-parses the
+template per recipient.
+"""
+import re
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Client, Lead, OutboundEmail
+
+MERGE_FIELD_RE = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+MERGE_FIELDS = ('first_name', 'last_name', 'full_name', 'email')
+MAIL_MERGE_BATCH_SIZE = 500
+
+SEGMENT_CLIENTS = 'clients'
+SEGMENT_LEADS = 'leads'
+SEGMENT_CHOICES = [
+    (SEGMENT_CLIENTS, 'Opted-in clients (by status)'),
+    (SEGMENT_LEADS, 'Leads (by referral source)'),
+]
+
+
+def _escape_format(text):
+    return text.replace('{', '{{').replace('}', '}}')
+
+
+def compile_merge_text(text):
+    """
+    A str.format_map() string for text: known {{ field }} placeholders become {field}, everything else (including
+    unknown placeholders, left as typed) is escaped literal text.
+    """
+    parts = []
+    pos = 0
+    for match in MERGE_FIELD_RE.finditer(text):
+        parts.append(_escape_format(text[pos:match.start()]))
+        name = match.group(1)
+        parts.append('{%s}' % name if name in MERGE_FIELDS else _escape_format(match.group(0)))
+        pos = match.end()
+    parts.append(_escape_format(text[pos:]))
+    return ''.join(parts)
+
+
+class MergeTemplate:
+    """A subject and body compiled once; render() is a format_map per recipient."""
+
+    def __init__(self, subject, body):
+        self.subject = compile_merge_text(subject)
+        self.body = compile_merge_text(body)
+
+    def render(self, fields):
+        """(subject, body) for one recipient's merge fields."""
+        return self.subject.format_map(fields)[:255], self.body.format_map(fields)
+
+
+def merge_fields(first_name, last_name, email):
+    return {
+        'first_name': first_name,
+        'last_name': last_name,
+        'full_name': f'{first_name} {last_name}',
+        'email': email,
+    }
+
+
+def segment_queryset(user, segment, value=''):
+    """
+    Recipients with an email address for a segment: opted-in clients (of status value, if given) or unconverted
+    leads (with referral source value, if given). Served by the (user, newsletter_opt_in, status, id) and
+    (user, referral, id) indexes.
+    """
+    if segment == SEGMENT_CLIENTS:
+        qs = Client.objects.filter(user=user, newsletter_opt_in=True)
+        if value:
+            qs = qs.filter(status=value)
+    elif segment == SEGMENT_LEADS:
+        qs = Lead.objects.filter(user=user, converted_to_client__isnull=True)
+        if value:
+            qs = qs.filter(referral=value)
+    else:
+        raise ValueError(f'Unknown segment "{segment}".')
+    return qs.exclude(email='')
+
+
+def iter_recipient_batches(queryset, batch_size=MAIL_MERGE_BATCH_SIZE):
+    """Lists of up to batch_size (first_name, last_name, email) tuples, in id order, read with a streaming cursor."""
+    rows = queryset.order_by('id').values_list('first_name', 'last_name', 'email').iterator(chunk_size=batch_size)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def queue_template_emails(user, template, queryset, batch_size=MAIL_MERGE_BATCH_SIZE):
+    """
+    Queue one personalized OutboundEmail per recipient in queryset (Clients or Leads), rendered from template
+    (an EmailTemplate) and bulk-inserted a batch at a time. All or nothing. Returns the new emails' ids.
+    """
+    merge = MergeTemplate(template.subject, template.body)
+    now = timezone.now()
+    ids = []
+    with transaction.atomic():
+        for batch in iter_recipient_batches(queryset, batch_size):
+            emails = []
+            for first_name, last_name, email in batch:
+                email = email.strip()
+                if not email:
+                    continue
+                subject, body = merge.render(merge_fields(first_name, last_name, email))
+                emails.append(OutboundEmail(user=user, to=[email], subject=subject, body=body, next_attempt_at=now))
+            ids.extend(e.pk for e in OutboundEmail.objects.bulk_create(emails))
+    return ids
@@ -0,0 +1,291 @@
+"""
+Benchmark import_records, export_queryset_csv and export_queryset_xlsx on synthetic data.
+
+Generates CSV and .xlsx files for every EXPORT_COLUMNS model (messy headers, currency strings,
+blank rows), imports them for a throwaway user, exports the result, and reports rows/sec,
+peak RSS and query counts. All writes are rolled back. Use SQLite (DATABASE_URL unset) for
+comparable numbers, and --json to save results for comparing runs.
+
+Peak RSS is the process high-water mark, so it only grows from case to case. --trace-memory repeats
+each case under tracemalloc for the peak Python allocations of each phase on its own; that pass is
+not timed, so tracing does not slow down the rows/sec figures.
+"""
+import io
+import json
+import platform
+import random
+import resource
+import sys
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from crm.import_export import (
+    EXPORT_COLUMNS,
+    IMPORT_MODELS,
+    export_queryset_csv,
+    export_queryset_xlsx,
+    import_records,
+)
+
+User = get_user_model()
+
+BENCHMARK_USERNAME = '_benchmark_import_export'
+
+FIRST_NAMES = ['Sandra', 'Michael', 'Priya', 'James', 'Elena', 'David', 'Rachel', 'Carlos', 'Amy', 'Marcus']
+LAST_NAMES = ['Nguyen', 'Rodriguez', 'Sharma', 'Wu', 'Vasquez', 'Kim', 'Thompson', 'Mendoza', 'Liu', 'Johnson']
+CITIES = ['Vallejo', 'Benicia', 'Fairfield', 'Vacaville', 'Dixon', 'Suisun City', 'Rio Vista']
+
+
+class _Rollback(Exception):
+    """Raised to roll back the benchmark's writes."""
+
+
+def _messy_header(label, i):
+    """Vary header case and spacing the way hand-edited spreadsheets do."""
+    variants = [
+        label,
+        label.upper(),
+        f'  {label.lower()} ',
+        label.replace(' ', '  '),
+    ]
+    return variants[i % len(variants)]
+
+
+def _money(rng, low, high):
+    return f'${rng.randint(low, high):,}.00'
+
+
+def _synthetic_value(field_name, rng, i):
+    """Cell text for one field; mixes currency strings, thousands separators and blanks."""
+    if field_name == 'first_name':
+        return rng.choice(FIRST_NAMES)
+    if field_name in ('last_name', 'spouse_last_name'):
+        return rng.choice(LAST_NAMES)
+    if field_name == 'spouse_first_name':
+        return rng.choice(FIRST_NAMES) if i % 3 == 0 else ''
+    if field_name in ('email', 'spouse_email'):
+        return f'bench{i}@example.com' if field_name == 'email' else ''
+    if field_name in ('phone', 'spouse_phone'):
+        return f'707-555-{i % 10000:04d}'
+    if field_name == 'city':
+        return rng.choice(CITIES)
+    if field_name == 'state':
+        return 'CA'
+    if field_name == 'zip_code':
+        return f'{94500 + i % 100}'
+    if field_name == 'address':
+        return f'{100 + i % 9000} Main St'
+    if field_name in ('budget_min', 'budget_max'):
+        return _money(rng, 200000, 1500000)
+    if field_name == 'price':
+        return _money(rng, 300000, 2500000)
+    if field_name == 'bathrooms':
+        return rng.choice(['1', '1.5', '2', '2.5', '3'])
+    if field_name == 'bedrooms':
+        return str(rng.randint(1, 6))
+    if field_name == 'square_feet':
+        return f'{rng.randint(700, 4500):,}'
+    if field_name == 'lot_size':
+        return f'{rng.randint(2000, 20000):,}'
+    if field_name == 'year_built':
+        return str(rng.randint(1920, 2024))
+    if field_name == 'featured':
+        return rng.choice(['Yes', 'No', ''])
+    if field_name == 'mls_url':
+        return f'https://example.com/mls/{i}'
+    if field_name == 'mls_number':
+        return f'MLS{i:07d}'
+    if field_name == 'title':
+        return f'{rng.choice(CITIES)} home #{i}'
+    if field_name in ('status', 'client_type', 'contact_type', 'referral', 'property_type', 'mls_service'):
+        return ''  # model default
+    if field_name == 'company':
+        return f'{rng.choice(LAST_NAMES)} & Co.'
+    return f'Synthetic {field_name.replace("_", " ")} {i}'
+
+
+def _synthetic_rows(model_key, n, seed):
+    """Header row plus n data rows, with a blank row every 50 rows."""
+    rng = random.Random(seed)
+    columns = EXPORT_COLUMNS[model_key]
+    yield [_messy_header(label, i) for i, (_, label) in enumerate(columns)]
+    for i in range(n):
+        if i and i % 50 == 0:
+            yield [''] * len(columns)
+        yield [_synthetic_value(field_name, rng, i) for field_name, _ in columns]
+
+
+def build_csv(model_key, n, seed=0):
+    import csv
+    buf = io.StringIO()
+    csv.writer(buf).writerows(_synthetic_rows(model_key, n, seed))
+    return buf.getvalue().encode('utf-8')
+
+
+def build_xlsx(model_key, n, seed=0):
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Data')
+    for row in _synthetic_rows(model_key, n, seed):
+        ws.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _peak_rss_mb():
+    """Process high-water mark RSS in MB (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+class _Measure:
+    """
+    Context manager: wall time, query count and peak RSS; with trace_memory, instead the phase's own peak
+    Python allocations (tracemalloc, reset on entry). Allocations in --workers child processes are not traced.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.queries = 0
+        self.peak_alloc_mb = None
+
+    def _count(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        if self.trace_memory:
+            tracemalloc.start()
+        self._wrapper = connection.execute_wrapper(self._count)
+        self._wrapper.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self.start
+        self._wrapper.__exit__(*exc)
+        if self.trace_memory:
+            self.peak_alloc_mb = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+            tracemalloc.stop()
+        self.peak_rss_mb = _peak_rss_mb()
+        return False
+
+    def result(self, rows):
+        return {
+            'rows': rows,
+            'seconds': round(self.seconds, 3),
+            'rows_per_sec': round(rows / self.seconds, 1) if self.seconds else None,
+            'queries': self.queries,
+            'peak_rss_mb': self.peak_rss_mb,
+            'peak_alloc_mb': None,
+        }
+
+
+def _consume(response):
+    """Read an export response to the end (works for HttpResponse and StreamingHttpResponse)."""
+    size = 0
+    for chunk in response:
+        size += len(chunk)
+    return size
+
+
+class Command(BaseCommand):
+    help = "Benchmark import/export throughput on synthetic CSV and Excel files (writes are rolled back)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=[1000, 10000, 100000],
+            help="Row counts to generate (default: 1000 10000 100000).",
+        )
+        parser.add_argument(
+            "--models", nargs="+", choices=sorted(EXPORT_COLUMNS), default=sorted(EXPORT_COLUMNS),
+            help="Models to benchmark (default: all export models).",
+        )
+        parser.add_argument(
+            "--formats", nargs="+", choices=["csv", "xlsx"], default=["csv", "xlsx"],
+            help="File formats to benchmark (default: csv xlsx).",
+        )
+        parser.add_argument("--workers", type=int, default=1, help="Passed to import_records (default: 1).")
+        parser.add_argument(
+            "--trace-memory", action="store_true",
+            help="Run each case a second time under tracemalloc to report peak Python allocations per phase.",
+        )
+        parser.add_argument("--json", dest="json_path", help="Write results as JSON to this file ('-' for stdout).")
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+        vendor = connection.vendor
+        if vendor != 'sqlite':
+            self.stderr.write(self.style.WARNING(f"Running against {vendor}; numbers are not comparable to SQLite runs."))
+        results = []
+        for model_key in options["models"]:
+            for fmt in options["formats"]:
+                for n in options["sizes"]:
+                    results.append(self._run_case(model_key, fmt, n, options))
+        report = {
+            'python': platform.python_version(),
+            'database': vendor,
+            'workers': options["workers"],
+            'results': results,
+        }
+        json_path = options["json_path"]
+        if json_path == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self._print_table(results)
+        if json_path:
+            with open(json_path, 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {json_path}"))
+
+    def _run_case(self, model_key, fmt, n, options):
+        build = build_csv if fmt == 'csv' else build_xlsx
+        data = build(model_key, n)
+        case = {'model': model_key, 'format': fmt, 'size': n, 'file_bytes': len(data)}
+        imported, result, exported, case['export_bytes'] = self._run_phases(model_key, fmt, data, options)
+        case['import'] = imported.result(result['created'] + result['updated'])
+        case['import']['errors'] = len(result['errors'])
+        case['export'] = exported.result(result['created'])
+        if options["trace_memory"]:
+            imported, _, exported, _ = self._run_phases(model_key, fmt, data, options, trace_memory=True)
+            case['import']['peak_alloc_mb'] = imported.peak_alloc_mb
+            case['export']['peak_alloc_mb'] = exported.peak_alloc_mb
+        return case
+
+    def _run_phases(self, model_key, fmt, data, options, trace_memory=False):
+        """Import data for a throwaway user and export it again, rolled back. Returns the two measures,
+        the import result and the export size."""
+        model_class = IMPORT_MODELS[model_key]
+        export = export_queryset_csv if fmt == 'csv' else export_queryset_xlsx
+        try:
+            with transaction.atomic():
+                user = User.objects.create(username=BENCHMARK_USERNAME)
+                with _Measure(trace_memory) as imported:
+                    result = import_records(io.BytesIO(data), model_key, fmt, user=user, workers=options["workers"])
+                queryset = model_class.objects.filter(user=user)
+                with _Measure(trace_memory) as exported:
+                    export_bytes = _consume(export(queryset, EXPORT_COLUMNS[model_key], f'{model_key}s'))
+                raise _Rollback
+        except _Rollback:
+            pass
+        return imported, result, exported, export_bytes
+
+    def _print_table(self, results):
+        self.stdout.write(
+            f"{'model':<9} {'fmt':<5} {'rows':>7}  {'import r/s':>10} {'q':>6}  {'export r/s':>10} {'q':>4}"
+            f"  {'rss MB':>7} {'imp MB':>7} {'exp MB':>7}  errors"
+        )
+        for r in results:
+            imp, exp = r['import'], r['export']
+            self.stdout.write(
+                f"{r['model']:<9} {r['format']:<5} {r['size']:>7}  {imp['rows_per_sec'] or 0:>10.0f} {imp['queries']:>6}"
+                f"  {exp['rows_per_sec'] or 0:>10.0f} {exp['queries']:>4}"
+                f"  {exp['peak_rss_mb']:>7} {imp['peak_alloc_mb'] or '-':>7} {exp['peak_alloc_mb'] or '-':>7}"
+                f"  {imp['errors']}"
+            )
@@ -0,0 +1,276 @@
+"""
+Benchmark newsletter sync strategies against the in-process mock Mailchimp / Constant Contact server.
+
+For each strategy and size, syncs that many synthetic contacts through the real sync code (pointed at the
+mock with MAILCHIMP_API_URL / CONSTANT_CONTACT_API_URL) and reports contacts/sec, HTTP requests, 429s and
+rejected contacts. Nothing is written to the database and no real account is contacted.
+
+Strategies:
+  mailchimp_member_put     one PUT /lists/{id}/members/{hash} per contact (the pre-batch baseline)
+  mailchimp_batch          sync_to_mailchimp: POST /lists/{id}, 500 members per request
+  constant_contact_sign_up sync_to_constant_contact(bulk=False): one sign_up_form POST per contact
+  constant_contact_import  sync_to_constant_contact(bulk=True): contacts_json_import activities, polled
+
+The client holds to each provider's documented rate (Mailchimp 10, Constant Contact 4 requests/sec), so the
+per-contact strategies take minutes at 1k and much longer at 10k. --client-rate lifts that limit to measure
+the client itself.
+"""
+import json
+import logging
+import platform
+import random
+import time
+from contextlib import contextmanager
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from crm import sync_transport
+from crm.email_marketing import (
+    _mailchimp_base_url,
+    _mailchimp_member,
+    _mailchimp_subscriber_hash,
+    _record_payload,
+    sync_to_constant_contact,
+    sync_to_mailchimp,
+)
+from crm.mock_providers import MockProviderServer
+from crm.models import UserProfile
+from crm.sync_transport import SyncTransport
+
+FIRST_NAMES = ['Sandra', 'Michael', 'Priya', 'James', 'Elena', 'David', 'Rachel', 'Carlos', 'Amy', 'Marcus']
+LAST_NAMES = ['Nguyen', 'Rodriguez', 'Sharma', 'Wu', 'Vasquez', 'Kim', 'Thompson', 'Mendoza', 'Liu', 'Johnson']
+CITIES = ['Vallejo', 'Benicia', 'Fairfield', 'Vacaville', 'Dixon', 'Suisun City', 'Rio Vista']
+
+
+def _mailchimp_member_put(profile, records, concurrency=None):
+    """Baseline: upsert each member with its own PUT. Returns (synced_count, errors)."""
+    url = f'{_mailchimp_base_url(profile.mailchimp_api_key)}/lists/{profile.mailchimp_audience_id}/members'
+
+    def put(payload):
+        member = _mailchimp_member(payload)
+        member['status_if_new'] = member.pop('status')
+        try:
+            resp = transport.request('PUT', f'{url}/{_mailchimp_subscriber_hash(payload["email"])}', json=member)
+        except requests.RequestException as e:
+            return {'email': payload['email'], 'error': str(e)[:200]}
+        if resp.status_code == 200:
+            return None
+        return {'email': payload['email'], 'error': resp.text[:200]}
+
+    payloads = (p for p in (_record_payload(r) for r in records) if p['email'])
+    synced, errors = 0, []
+    with SyncTransport('mailchimp', concurrency=concurrency, auth=('anystring', profile.mailchimp_api_key)) as transport:
+        for error in transport.map(put, payloads):
+            if error is None:
+                synced += 1
+            else:
+                errors.append(error)
+    return synced, errors
+
+
+STRATEGIES = {
+    'mailchimp_member_put': ('mailchimp', _mailchimp_member_put),
+    'mailchimp_batch': ('mailchimp', sync_to_mailchimp),
+    'constant_contact_sign_up': (
+        'constant_contact', lambda profile, records, concurrency=None: sync_to_constant_contact(
+            profile, records, concurrency=concurrency, bulk=False,
+        ),
+    ),
+    'constant_contact_import': (
+        'constant_contact', lambda profile, records, concurrency=None: sync_to_constant_contact(
+            profile, records, concurrency=concurrency, bulk=True,
+        ),
+    ),
+}
+
+
+def synthetic_records(n, seed=0):
+    """n opted-in record dicts with unique emails, as get_opted_in_records yields them."""
+    rng = random.Random(seed)
+    return [
+        {
+            'email': f'bench{i}@example.com',
+            'first_name': rng.choice(FIRST_NAMES),
+            'last_name': rng.choice(LAST_NAMES),
+            'phone': f'707-555-{i % 10000:04d}',
+            'address': f'{100 + i % 9000} Main St',
+            'city': rng.choice(CITIES),
+            'state': 'CA',
+            'zip_code': f'{94500 + i % 100}',
+        }
+        for i in range(n)
+    ]
+
+
+def benchmark_profile():
+    """An unsaved profile with placeholder credentials for both providers."""
+    return UserProfile(
+        mailchimp_api_key='benchmark-us1',
+        mailchimp_audience_id='benchmark',
+        constant_contact_api_key='benchmark',
+        constant_contact_access_token='benchmark',
+        constant_contact_list_id='benchmark',
+    )
+
+
+@contextmanager
+def client_rate(rate):
+    """Temporarily replace every provider's client-side request rate (None: leave the documented limits)."""
+    if rate is None:
+        yield
+        return
+    saved = {provider: dict(limits) for provider, limits in sync_transport.PROVIDER_LIMITS.items()}
+    try:
+        for limits in sync_transport.PROVIDER_LIMITS.values():
+            limits['rate'] = rate
+        yield
+    finally:
+        for provider, limits in saved.items():
+            sync_transport.PROVIDER_LIMITS[provider].update(limits)
+
+
+@contextmanager
+def quiet_sync_logs(quiet):
+    """Keep per-contact warnings (rejected emails, retries) from flooding the output."""
+    loggers = [logging.getLogger(name) for name in ('crm.email_marketing', 'crm.sync_transport')]
+    levels = [logger.level for logger in loggers]
+    if quiet:
+        for logger in loggers:
+            logger.setLevel(logging.CRITICAL)
+    try:
+        yield
+    finally:
+        for logger, level in zip(loggers, levels):
+            logger.setLevel(level)
+
+
+class Command(BaseCommand):
+    help = "Benchmark newsletter sync strategies (contacts/sec) against a local mock Mailchimp / Constant Contact."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=[100, 1000, 10000],
+            help="Contact counts to sync (default: 100 1000 10000).",
+        )
+        parser.add_argument(
+            "--strategies", nargs="+", choices=sorted(STRATEGIES), default=sorted(STRATEGIES),
+            help="Strategies to benchmark (default: all).",
+        )
+        parser.add_argument(
+            "--latency", type=float, default=0.05,
+            help="Seconds the mock adds to every request, like a network round trip (default: 0.05).",
+        )
+        parser.add_argument(
+            "--server-rate", type=float, default=None,
+            help="Requests/sec per provider the mock allows before answering 429 (default: no limit).",
+        )
+        parser.add_argument(
+            "--client-rate", type=float, default=None,
+            help="Override the client's requests/sec per provider (default: the documented provider limits).",
+        )
+        parser.add_argument(
+            "--error-rate", type=float, default=0.01,
+            help="Fraction of contacts the mock rejects (default: 0.01).",
+        )
+        parser.add_argument(
+            "--server-error-rate", type=float, default=0.0,
+            help="Fraction of requests the mock answers with a transient 503 (default: 0).",
+        )
+        parser.add_argument(
+            "--import-seconds", type=float, default=1.0,
+            help="Seconds a Constant Contact import activity stays processing (default: 1).",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=None,
+            help="Requests in flight per sync (default: settings.NEWSLETTER_SYNC_CONCURRENCY).",
+        )
+        parser.add_argument("--json", dest="json_path", help="Write results as JSON to this file ('-' for stdout).")
+
+    def handle(self, *args, **options):
+        if any(n < 1 for n in options["sizes"]):
+            raise CommandError("--sizes must be positive.")
+        if not 0 <= options["error_rate"] <= 1 or not 0 <= options["server_error_rate"] < 1:
+            raise CommandError("--error-rate must be within 0-1 and --server-error-rate within 0-1 (exclusive).")
+        if options["latency"] < 0 or options["import_seconds"] < 0:
+            raise CommandError("--latency and --import-seconds must not be negative.")
+        for name in ("server_rate", "client_rate"):
+            if options[name] is not None and options[name] <= 0:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive.")
+        if options["concurrency"] is not None and options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+
+        server = MockProviderServer(
+            latency=options["latency"],
+            rate_limit=options["server_rate"],
+            error_rate=options["error_rate"],
+            server_error_rate=options["server_error_rate"],
+            import_seconds=options["import_seconds"],
+        )
+        results = []
+        with server, override_settings(
+            MAILCHIMP_API_URL=server.mailchimp_url, CONSTANT_CONTACT_API_URL=server.constant_contact_url,
+        ), client_rate(options["client_rate"]), quiet_sync_logs(options["verbosity"] < 2):
+            for strategy in options["strategies"]:
+                for n in options["sizes"]:
+                    results.append(self._run_case(server, strategy, n, options))
+                    if options["json_path"] != '-' and options["verbosity"] >= 1:
+                        self._print_row(results[-1], header=len(results) == 1)
+        report = {
+            'python': platform.python_version(),
+            'latency': options["latency"],
+            'server_rate': options["server_rate"],
+            'client_rate': options["client_rate"],
+            'error_rate': options["error_rate"],
+            'server_error_rate': options["server_error_rate"],
+            'concurrency': options["concurrency"],
+            'results': results,
+        }
+        json_path = options["json_path"]
+        if json_path == '-':
+            self.stdout.write(json.dumps(report, indent=2))
+        elif json_path:
+            with open(json_path, 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {json_path}"))
+
+    def _run_case(self, server, strategy, n, options):
+        provider, sync = STRATEGIES[strategy]
+        records = synthetic_records(n)
+        server.reset()
+        start = time.perf_counter()
+        synced, errors = sync(benchmark_profile(), records, concurrency=options["concurrency"])
+        seconds = time.perf_counter() - start
+        received = server.mailchimp_members if provider == 'mailchimp' else server.constant_contact_contacts
+        requests_served = {
+            key[2]: count for key, count in server.requests.items() if isinstance(key, tuple) and key[0] == provider
+        }
+        return {
+            'strategy': strategy,
+            'size': n,
+            'seconds': round(seconds, 3),
+            'contacts_per_sec': round(n / seconds, 1) if seconds else None,
+            'synced': synced,
+            'errors': len(errors),
+            'received': len(received),
+            'requests': sum(requests_served.values()),
+            'requests_by_route': requests_served,
+            'throttled': server.requests['throttled'],
+            'server_errors': server.requests['server_errors'],
+        }
+
+    def _print_row(self, r, header=False):
+        if header:
+            self.stdout.write(
+                f"{'strategy':<25} {'contacts':>8}  {'seconds':>8} {'contacts/s':>10}  {'requests':>8} {'429s':>5}"
+                f"  {'synced':>7} {'errors':>6}"
+            )
+        self.stdout.write(
+            f"{r['strategy']:<25} {r['size']:>8}  {r['seconds']:>8.2f} {r['contacts_per_sec'] or 0:>10.1f}"
+            f"  {r['requests']:>8} {r['throttled']:>5}  {r['synced']:>7} {r['errors']:>6}"
+        )
+        if r['synced'] != r['received']:
+            self.stdout.write(self.style.WARNING(
+                f"  {r['strategy']}: reported {r['synced']} synced but the mock received {r['received']}."
+            ))
@@ -0,0 +1,101 @@
+"""
+Import a CSV or Excel file of leads, clients, contacts, or properties for one user, or a
+transactions workbook (--model transaction). Same pipeline as the Import pages, without the upload
+size limit. Use --workers to validate very large files (e.g. brokerage migrations) in parallel processes.
+"""
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.import_export import IMPORT_MODELS, import_records
+from crm.transaction_import import import_transactions
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Import a CSV/.xlsx file of leads, clients, contacts, properties, or transactions for a user."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or .xlsx file to import.")
+        parser.add_argument(
+            "--model",
+            required=True,
+            choices=sorted(IMPORT_MODELS) + ["transaction"],
+            help="Record type to import (transaction: .xlsx workbook with Transactions/Parties/Milestones/Tasks).",
+        )
+        parser.add_argument("--user", required=True, help="Username of the agent who will own the records.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "xlsx"],
+            help="File format (default: from the file extension).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Validate row chunks in this many processes (default: 1).",
+        )
+        parser.add_argument(
+            "--update-existing",
+            action="store_true",
+            help="Update records that match by email (MLS number for properties) instead of creating duplicates.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate the whole file and report what would happen, without saving.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or os.path.splitext(path)[1].lower().lstrip(".")
+        if fmt not in ("csv", "xlsx"):
+            raise CommandError("Unknown file format; pass --format csv or --format xlsx.")
+        if options["workers"] < 1:
+            raise CommandError("--workers must be at least 1.")
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f'No user named "{options["user"]}".')
+
+        if options["model"] == "transaction":
+            with open(path, "rb") as f:
+                result = import_transactions(f, user=user, dry_run=options["dry_run"])
+            for err in result["errors"][:20]:
+                self.stdout.write(self.style.WARNING(f"{err['sheet']} row {err['row']}: {err['message']}"))
+            if len(result["errors"]) > 20:
+                self.stdout.write(self.style.WARNING(f"... and {len(result['errors']) - 20} more row errors."))
+            created = result["created"]
+            prefix = "Dry run: would create" if options["dry_run"] else "Created"
+            self.stdout.write(self.style.SUCCESS(
+                f"{prefix} {created['transactions']} transaction(s), {created['parties']} parties, "
+                f"{created['milestones']} milestones, {created['tasks']} tasks; {len(result['errors'])} row error(s)."
+            ))
+            return
+
+        with open(path, "rb") as f:
+            result = import_records(
+                f,
+                options["model"],
+                fmt,
+                user=user,
+                dry_run=options["dry_run"],
+                update_existing=options["update_existing"],
+                workers=options["workers"],
+            )
+
+        for err in result["errors"][:20]:
+            self.stdout.write(self.style.WARNING(f"Row {err['row']}: {err['message']}"))
+        if len(result["errors"]) > 20:
+            self.stdout.write(self.style.WARNING(f"... and {len(result['errors']) - 20} more row errors."))
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Dry run: {result['would_create']} would be created, {result['would_update']} updated, "
+                f"{result['invalid']} invalid."
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Created {result['created']}, updated {result['updated']}, {len(result['errors'])} row error(s)."
+            ))
@@ -0,0 +1,63 @@
+"""
+Process queued export jobs: write each CSV/Excel file to default storage (S3 in production).
+Run from cron (e.g. every minute) or keep running with --loop on a worker.
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from crm.export_jobs import claim_next_export_job, purge_export_jobs, run_export_job
+
+
+class Command(BaseCommand):
+    help = "Process queued CSV/Excel export jobs and store the files in default storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new jobs instead of exiting when the queue is empty.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls with --loop (default: 5).",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            type=int,
+            default=0,
+            help="Stop after this many jobs (default: 0, no limit).",
+        )
+        parser.add_argument(
+            "--purge-days",
+            type=int,
+            default=0,
+            help="Also delete jobs (and files) finished more than this many days ago (default: 0, keep all).",
+        )
+
+    def handle(self, *args, **options):
+        if options["sleep"] < 0 or options["max_jobs"] < 0 or options["purge_days"] < 0:
+            raise CommandError("--sleep, --max-jobs and --purge-days must not be negative.")
+        if options["purge_days"]:
+            deleted = purge_export_jobs(timezone.now() - timedelta(days=options["purge_days"]))
+            self.stdout.write(f"Purged {deleted} old export job(s).")
+
+        processed = 0
+        while not options["max_jobs"] or processed < options["max_jobs"]:
+            job = claim_next_export_job()
+            if job is None:
+                if not options["loop"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+            run_export_job(job)
+            processed += 1
+            if job.status == job.STATUS_DONE:
+                self.stdout.write(self.style.SUCCESS(f"Export {job.pk}: {job.row_count} row(s) -> {job.file.name}"))
+            else:
+                self.stdout.write(self.style.ERROR(f"Export {job.pk} failed: {job.error}"))
+        self.stdout.write(f"Processed {processed} export job(s).")
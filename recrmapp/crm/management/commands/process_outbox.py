@@ -0,0 +1,109 @@
+"""
+Deliver queued outbound emails. Failed sends are retried with exponential backoff, and an email is marked
+failed after its last attempt. Run from cron (e.g. every minute) or keep running with --loop on a worker.
+--trace-memory reports the peak memory each send allocates (attachments are held in memory while a message
+is built and sent) and the worker's peak RSS.
+"""
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from crm.outbox import claim_outbound_emails, purge_outbox, send_outbound_batch
+
+
+class Command(BaseCommand):
+    help = "Send queued outbound emails (retrying failures with backoff) and record their status."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for due emails instead of exiting when none are due.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls with --loop (default: 5).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Emails claimed and sent together over one connection (default: 50).",
+        )
+        parser.add_argument(
+            "--max-emails",
+            type=int,
+            default=0,
+            help="Stop after this many send attempts (default: 0, no limit).",
+        )
+        parser.add_argument(
+            "--trace-memory",
+            action="store_true",
+            help="Report peak Python allocations per email and the process peak RSS (tracemalloc; slows sending).",
+        )
+        parser.add_argument(
+            "--purge-days",
+            type=int,
+            default=0,
+            help="Also delete sent/failed emails (and attachments) older than this many days (default: 0, keep all).",
+        )
+
+    def handle(self, *args, **options):
+        if options["sleep"] < 0 or options["max_emails"] < 0 or options["purge_days"] < 0:
+            raise CommandError("--sleep, --max-emails and --purge-days must not be negative.")
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if options["purge_days"]:
+            deleted = purge_outbox(timezone.now() - timedelta(days=options["purge_days"]))
+            self.stdout.write(f"Purged {deleted} old email(s).")
+
+        # One backend connection for the run (SMTP session / HTTP keep-alive), reopened after a failure.
+        connection = get_connection()
+        processed = 0
+        if options["trace_memory"]:
+            tracemalloc.start()
+        try:
+            while not options["max_emails"] or processed < options["max_emails"]:
+                limit = options["batch_size"]
+                if options["max_emails"]:
+                    limit = min(limit, options["max_emails"] - processed)
+                emails = claim_outbound_emails(limit)
+                if not emails:
+                    if not options["loop"]:
+                        break
+                    time.sleep(options["sleep"])
+                    continue
+                send_outbound_batch(emails, connection)
+                processed += len(emails)
+                for outbound in emails:
+                    if options["trace_memory"]:
+                        attached = sum(a.size for a in outbound.attachments.all())
+                        self.stdout.write(
+                            f"Email {outbound.pk}: {attached / (1024 * 1024):.1f} MB attached, "
+                            f"peak {outbound.peak_alloc_bytes / (1024 * 1024):.1f} MB allocated"
+                        )
+                    if outbound.status == outbound.STATUS_SENT:
+                        self.stdout.write(self.style.SUCCESS(f"Email {outbound.pk} sent to {', '.join(outbound.to)}"))
+                    elif outbound.status == outbound.STATUS_FAILED:
+                        self.stdout.write(self.style.ERROR(f"Email {outbound.pk} failed: {outbound.last_error}"))
+                    else:
+                        self.stdout.write(self.style.WARNING(
+                            f"Email {outbound.pk} attempt {outbound.attempts} failed, retry at "
+                            f"{outbound.next_attempt_at:%H:%M:%S}: {outbound.last_error}"
+                        ))
+        finally:
+            connection.close()
+            if options["trace_memory"]:
+                tracemalloc.stop()
+        self.stdout.write(f"Processed {processed} email(s).")
+        if options["trace_memory"]:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB on Linux, bytes on macOS
+            self.stdout.write(f"Peak RSS: {peak / (1024 * 1024 if sys.platform == 'darwin' else 1024):.1f} MB")
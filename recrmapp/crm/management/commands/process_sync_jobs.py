@@ -0,0 +1,66 @@
+"""
+Process queued newsletter sync jobs (Mailchimp, Constant Contact), checkpointing after every batch.
+Run from cron (e.g. every minute) or keep running with --loop on a worker. A job interrupted mid-way
+(worker killed, deploy) is picked up again after SYNC_JOB_STALE_AFTER and resumes from its checkpoint.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.sync_jobs import claim_next_sync_job, run_sync_job
+
+
+class Command(BaseCommand):
+    help = "Process queued newsletter sync jobs, resuming interrupted ones from their last checkpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling for new jobs instead of exiting when the queue is empty.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=5,
+            help="Seconds to wait between polls with --loop (default: 5).",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            type=int,
+            default=0,
+            help="Stop after this many jobs (default: 0, no limit).",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="Requests in flight per sync (default: settings.NEWSLETTER_SYNC_CONCURRENCY).",
+        )
+
+    def handle(self, *args, **options):
+        if options["sleep"] < 0 or options["max_jobs"] < 0:
+            raise CommandError("--sleep and --max-jobs must not be negative.")
+        if options["concurrency"] is not None and options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+
+        processed = 0
+        while not options["max_jobs"] or processed < options["max_jobs"]:
+            job = claim_next_sync_job()
+            if job is None:
+                if not options["loop"]:
+                    break
+                time.sleep(options["sleep"])
+                continue
+            run_sync_job(job, concurrency=options["concurrency"])
+            processed += 1
+            if job.status == job.STATUS_DONE:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Sync {job.pk} ({job.get_provider_display()}): {job.synced} synced, "
+                    f"{job.unsubscribed} unsubscribed, {job.error_count} error(s)"
+                ))
+            elif job.status == job.STATUS_FAILED:
+                self.stdout.write(self.style.ERROR(f"Sync {job.pk} failed: {job.error}"))
+            else:
+                self.stdout.write(self.style.WARNING(f"Sync {job.pk} was claimed by another worker; left to it."))
+        self.stdout.write(f"Processed {processed} sync job(s).")
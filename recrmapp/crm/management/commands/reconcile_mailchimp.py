@@ -0,0 +1,88 @@
+"""
+Reconcile each agent's opted-in records with their Mailchimp audience in both directions, fixing drift the
+sync and the webhook missed. Run from cron (e.g. nightly); --dry-run reports the differences only.
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from crm.models import UserProfile
+from crm.reconciliation import reconcile_mailchimp
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Two-way reconcile CRM newsletter opt-ins with Mailchimp audiences and report what changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user", dest="usernames", action="append", default=[],
+            help="Only reconcile this user's audience (repeatable; default: every user with Mailchimp connected).",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Report the differences without changing the CRM or Mailchimp.",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=None,
+            help="Requests in flight (default: settings.NEWSLETTER_SYNC_CONCURRENCY).",
+        )
+        parser.add_argument("--json", dest="json_path", help="Write the reports as JSON to this file ('-' for stdout).")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] is not None and options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+        profiles = (
+            UserProfile.objects.select_related('user')
+            .filter(user__is_active=True)
+            .exclude(mailchimp_api_key='')
+            .exclude(mailchimp_audience_id='')
+            .order_by('user__username')
+        )
+        if options["usernames"]:
+            missing = set(options["usernames"]) - set(
+                User.objects.filter(username__in=options["usernames"]).values_list('username', flat=True)
+            )
+            if missing:
+                raise CommandError(f"Unknown user(s): {', '.join(sorted(missing))}")
+            profiles = profiles.filter(user__username__in=options["usernames"])
+
+        reports = {}
+        for profile in profiles:
+            report = reconcile_mailchimp(profile, dry_run=options["dry_run"], concurrency=options["concurrency"])
+            reports[profile.user.username] = report.as_dict()
+            if options["json_path"] != '-':
+                self._print_report(profile.user.username, report)
+        if options["json_path"] == '-':
+            self.stdout.write(json.dumps(reports, indent=2))
+        elif options["json_path"]:
+            with open(options["json_path"], 'w') as f:
+                json.dump(reports, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['json_path']}"))
+        elif not reports:
+            self.stdout.write("No users with Mailchimp connected.")
+
+    def _print_report(self, username, report):
+        verb = "would" if report.dry_run else "did"
+        self.stdout.write(
+            f"{username}: {report.remote_members} member(s) in Mailchimp ({report.remote_subscribed} subscribed), "
+            f"{report.crm_opted_in} opted in here, {report.in_sync} in sync."
+        )
+        for label, count, change in (
+            ("subscribe in Mailchimp", report.subscribed_remote, 'subscribed_remote'),
+            ("unsubscribe in Mailchimp", report.unsubscribed_remote, 'unsubscribed_remote'),
+            ("opt out in the CRM", report.opted_out_in_crm, 'opted_out_in_crm'),
+            ("opt in in the CRM", report.opted_in_in_crm, 'opted_in_in_crm'),
+            ("create leads", report.leads_created, 'leads_created'),
+        ):
+            if count:
+                examples = ', '.join(report.samples.get(change, [])[:5])
+                self.stdout.write(f"  {verb} {label}: {count} (e.g. {examples})")
+        if not report.changes:
+            self.stdout.write(self.style.SUCCESS("  Nothing to reconcile."))
+        for error in report.errors[:5]:
+            self.stdout.write(self.style.ERROR(f"  {error.get('email') or '—'}: {error.get('error', '')[:120]}"))
+        if report.error_count > 5:
+            self.stdout.write(self.style.ERROR(f"  … and {report.error_count - 5} more error(s)."))
@@ -0,0 +1,18 @@
+# List filters stored on background export jobs
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0028_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='filters',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
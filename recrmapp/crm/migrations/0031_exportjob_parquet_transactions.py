@@ -0,0 +1,23 @@
+# Parquet format and transaction exports for background export jobs
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0030_change_feed'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='model_key',
+            field=models.CharField(choices=[('lead', 'Leads'), ('client', 'Clients'), ('contact', 'Contacts'), ('property', 'Properties'), ('transaction', 'Transactions')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='exportjob',
+            name='format',
+            field=models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'Excel'), ('parquet', 'Parquet')], max_length=10),
+        ),
+    ]
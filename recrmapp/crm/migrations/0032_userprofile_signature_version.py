@@ -0,0 +1,18 @@
+# Version counter for the cached, rendered email signature
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0031_exportjob_parquet_transactions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='signature_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Transaction document library (content-addressed files) and outbox attachments by reference
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0033_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(max_length=255, upload_to='transaction_documents/')),
+                ('filename', models.CharField(max_length=255)),
+                ('content_type', models.CharField(default='application/octet-stream', max_length=100)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('sha256', models.CharField(db_index=True, max_length=64)),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='documents', to='crm.transaction')),
+            ],
+            options={
+                'ordering': ['filename', 'id'],
+                'constraints': [models.UniqueConstraint(fields=('transaction', 'sha256'), name='crm_txdoc_unique_content')],
+            },
+        ),
+        migrations.AlterField(
+            model_name='outboundemailattachment',
+            name='file',
+            field=models.FileField(blank=True, upload_to='outbox/%Y/%m/'),
+        ),
+        migrations.AddField(
+            model_name='outboundemailattachment',
+            name='document',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='email_attachments', to='crm.transactiondocument'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Incremental newsletter sync: per-email fingerprint of what was last pushed to each provider list
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('crm', '0035_emailtemplate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('provider', models.CharField(choices=[('mailchimp', 'Mailchimp'), ('constant_contact', 'Constant Contact')], max_length=20)),
+                ('list_id', models.CharField(max_length=100)),
+                ('email', models.EmailField(max_length=254)),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('subscribed', models.BooleanField(default=True)),
+                ('synced_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='newsletter_sync_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'provider', 'email'), name='crm_newsletter_sync_state_unique')],
+            },
+        ),
+    ]
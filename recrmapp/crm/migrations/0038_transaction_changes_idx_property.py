@@ -0,0 +1,21 @@
+# Change feed: scope the transaction index to the owning property, so one agent's feed reads only their rows
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm', '0037_syncjob'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='crm_transaction_changes_idx',
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['property', 'updated_at', 'id'], name='crm_transaction_changes_idx'),
+        ),
+    ]
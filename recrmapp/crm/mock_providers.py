@@ -0,0 +1,329 @@
+"""
+In-process stand-ins for the Mailchimp and Constant Contact APIs, for benchmarking and checking the newsletter
+sync without real accounts. One threaded HTTP server on a free local port answers both providers' sync
+endpoints, keeps what it receives in memory, and can add latency, enforce a rate limit (429 with Retry-After),
+reject chosen emails and fail requests with transient 503s. Point the sync at it with the settings overrides:
+
+    with MockProviderServer(latency=0.05, rate_limit=10) as server, \\
+            override_settings(MAILCHIMP_API_URL=server.mailchimp_url,
+                              CONSTANT_CONTACT_API_URL=server.constant_contact_url):
+        sync_to_mailchimp(profile, records)
+
+Mailchimp (under /mailchimp/3.0): PUT and GET /lists/{id}/members/{hash}, POST /lists/{id} (batch subscribe),
+GET /lists/{id}/members (paged). Constant Contact (under /constant-contact/v3): POST /contacts/sign_up_form,
+POST /activities/contacts_json_import, GET /activities/{id}, GET /contacts?email=,
+POST /activities/remove_list_memberships.
+"""
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+MAILCHIMP_PREFIX = '/mailchimp/3.0'
+CONSTANT_CONTACT_PREFIX = '/constant-contact/v3'
+
+
+def _rejected(email, error_rate):
+    """Deterministic: the same email is always accepted or always rejected for a given error_rate."""
+    if not error_rate:
+        return False
+    return int(hashlib.md5(email.encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF < error_rate
+
+
+class _RateLimit:
+    """Non-blocking token bucket: allow() is False when a request would exceed the rate."""
+
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.tokens = self.rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockProvider/1.0'
+    # Headers and body go out as separate writes; with Nagle on, the body waits for the client's delayed ACK
+    # (~40 ms per request on Linux) and the benchmark measures that instead of the client.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def _send(self, status, body=None, headers=None):
+        data = json.dumps(body if body is not None else {}).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _dispatch(self, method):
+        mock = self.server.mock
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        url = urlsplit(self.path)
+        if url.path.startswith(MAILCHIMP_PREFIX):
+            provider, path = 'mailchimp', url.path[len(MAILCHIMP_PREFIX):]
+        elif url.path.startswith(CONSTANT_CONTACT_PREFIX):
+            provider, path = 'constant_contact', url.path[len(CONSTANT_CONTACT_PREFIX):]
+        else:
+            return self._send(404, {'detail': 'Unknown API'})
+        if mock.latency:
+            time.sleep(mock.latency)
+        status, body, headers = mock.handle(provider, method, path, parse_qs(url.query), raw)
+        self._send(status, body, headers)
+
+
+class MockProviderServer:
+    """
+    latency: seconds added to every request. rate_limit: requests/second per provider before 429s (None: no limit).
+    error_rate: fraction of emails rejected (the same emails every run); reject_emails: emails always rejected.
+    server_error_rate: fraction of requests answered 503. import_seconds: how long an import activity
+    stays "processing". requests: Counter of (provider, method, route) served, with 'throttled' and
+    'server_errors' counts.
+    """
+
+    def __init__(self, latency=0.0, rate_limit=None, error_rate=0.0, reject_emails=(), server_error_rate=0.0,
+                 import_seconds=0.0, seed=0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.reject_emails = {e.lower() for e in reject_emails}
+        self.server_error_rate = server_error_rate
+        self.import_seconds = import_seconds
+        self.random = random.Random(seed)
+        self.limits = {p: _RateLimit(rate_limit) for p in ('mailchimp', 'constant_contact')} if rate_limit else {}
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.mailchimp_members = {}  # email -> {'id', 'email_address', 'status', 'merge_fields'}
+        self.constant_contact_contacts = {}  # email -> {'contact_id', 'email', 'list_memberships', ...}
+        self.activities = {}  # activity_id -> {'created', 'errors'}
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.mock = self
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def mailchimp_url(self):
+        return self.base_url + MAILCHIMP_PREFIX
+
+    @property
+    def constant_contact_url(self):
+        return self.base_url + CONSTANT_CONTACT_PREFIX
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='mock-provider', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset(self):
+        """Forget received contacts and request counts (between benchmark runs)."""
+        with self.lock:
+            self.requests.clear()
+            self.mailchimp_members.clear()
+            self.constant_contact_contacts.clear()
+            self.activities.clear()
+
+    def rejects(self, email):
+        return email.lower() in self.reject_emails or _rejected(email.lower(), self.error_rate)
+
+    def handle(self, provider, method, path, query, raw):
+        """(status, body, headers) for one request."""
+        limit = self.limits.get(provider)
+        if limit is not None and not limit.allow():
+            with self.lock:
+                self.requests['throttled'] += 1
+            return 429, {'title': 'Too Many Requests'}, {'Retry-After': '1'}
+        with self.lock:
+            fail = self.server_error_rate and self.random.random() < self.server_error_rate
+            if fail:
+                self.requests['server_errors'] += 1
+        if fail:
+            return 503, {'title': 'Service Unavailable'}, None
+        try:
+            payload = json.loads(raw) if raw else {}
+        except ValueError:
+            return 400, {'detail': 'Invalid JSON'}, None
+        parts = [p for p in path.split('/') if p]
+        if provider == 'mailchimp':
+            return self._mailchimp(method, parts, query, payload)
+        return self._constant_contact(method, parts, query, payload)
+
+    def _count(self, provider, method, route):
+        with self.lock:
+            self.requests[(provider, method, route)] += 1
+
+    # --- Mailchimp ---
+
+    def _mailchimp_upsert(self, member):
+        email = (member.get('email_address') or '').lower()
+        if not email or self.rejects(email):
+            return f'{email or "(blank)"} looks fake or invalid, please enter a real email address.'
+        with self.lock:
+            self.mailchimp_members[email] = {
+                'id': hashlib.md5(email.encode('utf-8')).hexdigest(),  # subscriber hash
+                'email_address': email,
+                'status': member.get('status') or member.get('status_if_new') or 'subscribed',
+                'merge_fields': member.get('merge_fields') or {},
+            }
+        return None
+
+    def _mailchimp(self, method, parts, query, payload):
+        # parts: ['lists', list_id] or ['lists', list_id, 'members'] or ['lists', list_id, 'members', hash]
+        if len(parts) < 2 or parts[0] != 'lists':
+            return 404, {'detail': 'Not found'}, None
+        if method == 'POST' and len(parts) == 2:
+            self._count('mailchimp', method, 'batch')
+            members = payload.get('members') or []
+            if len(members) > 500:
+                return 400, {'detail': 'Batch exceeds 500 members.'}, None
+            errors = []
+            for member in members:
+                error = self._mailchimp_upsert(member)
+                if error:
+                    errors.append({'email_address': member.get('email_address'), 'error': error, 'error_code': 'ERROR_GENERIC'})
+            return 200, {
+                'total_created': len(members) - len(errors),
+                'total_updated': 0,
+                'error_count': len(errors),
+                'errors': errors,
+            }, None
+        if method == 'PUT' and len(parts) == 4 and parts[2] == 'members':
+            self._count('mailchimp', method, 'member')
+            error = self._mailchimp_upsert(payload)
+            if error:
+                return 400, {'title': 'Invalid Resource', 'status': 400, 'detail': error}, None
+            return 200, self.mailchimp_members[payload['email_address'].lower()], None
+        if method == 'GET' and len(parts) == 4 and parts[2] == 'members':
+            self._count('mailchimp', method, 'member')
+            with self.lock:
+                member = next((m for m in self.mailchimp_members.values() if m['id'] == parts[3]), None)
+            if member is None:
+                return 404, {'title': 'Resource Not Found', 'status': 404}, None
+            return 200, member, None
+        if method == 'GET' and len(parts) == 3 and parts[2] == 'members':
+            self._count('mailchimp', method, 'members')
+            count = min(int((query.get('count') or ['10'])[0]), 1000)
+            offset = int((query.get('offset') or ['0'])[0])
+            status = (query.get('status') or [''])[0]
+            with self.lock:
+                members = [m for m in self.mailchimp_members.values() if not status or m['status'] == status]
+            members.sort(key=lambda m: m['email_address'])
+            return 200, {'members': members[offset:offset + count], 'total_items': len(members)}, None
+        return 404, {'detail': 'Not found'}, None
+
+    # --- Constant Contact ---
+
+    def _constant_contact_upsert(self, email, contact, list_ids):
+        with self.lock:
+            existing = self.constant_contact_contacts.get(email)
+            contact_id = existing['contact_id'] if existing else str(uuid.uuid4())
+            memberships = set(existing['list_memberships']) if existing else set()
+            self.constant_contact_contacts[email] = {
+                **contact, 'email': email, 'contact_id': contact_id, 'list_memberships': sorted(memberships | set(list_ids)),
+            }
+        return existing is None
+
+    def _constant_contact(self, method, parts, query, payload):
+        route = '/'.join(parts)
+        if method == 'POST' and route == 'contacts/sign_up_form':
+            self._count('constant_contact', method, 'sign_up_form')
+            email = (payload.get('email_address') or '').lower()
+            if not email or not payload.get('list_memberships'):
+                return 400, [{'error_key': 'contacts.api.validation.error', 'error_message': 'Missing field.'}], None
+            if self.rejects(email):
+                return 400, [{'error_key': 'contacts.api.validation.error',
+                              'error_message': f'Email address {email} is invalid.'}], None
+            created = self._constant_contact_upsert(email, payload, payload['list_memberships'])
+            contact_id = self.constant_contact_contacts[email]['contact_id']
+            return (201 if created else 200), {'contact_id': contact_id, 'action': 'created' if created else 'updated'}, None
+        if method == 'POST' and route == 'activities/contacts_json_import':
+            self._count('constant_contact', method, 'contacts_json_import')
+            rows = payload.get('import_data') or []
+            list_ids = payload.get('list_ids') or []
+            if not rows or not list_ids:
+                return 400, [{'error_key': 'activity.validation', 'error_message': 'import_data and list_ids are required.'}], None
+            if len(rows) > 40000:
+                return 400, [{'error_key': 'activity.validation', 'error_message': 'Too many contacts.'}], None
+            errors = []
+            for line, row in enumerate(rows, 1):
+                email = (row.get('email') or '').lower()
+                if not email or self.rejects(email):
+                    errors.append({'message': f'Line {line}: Email address {email or "(blank)"} is invalid.'})
+                else:
+                    self._constant_contact_upsert(email, row, list_ids)
+            activity_id = str(uuid.uuid4())
+            with self.lock:
+                self.activities[activity_id] = {'created': time.monotonic(), 'errors': errors, 'count': len(rows)}
+            return 201, {'activity_id': activity_id, 'state': 'initialized'}, None
+        if method == 'GET' and len(parts) == 2 and parts[0] == 'activities':
+            self._count('constant_contact', method, 'activity')
+            activity = self.activities.get(parts[1])
+            if activity is None:
+                return 404, [{'error_key': 'not.found', 'error_message': 'No such activity.'}], None
+            done = time.monotonic() - activity['created'] >= self.import_seconds
+            body = {
+                'activity_id': parts[1],
+                'state': 'completed' if done else 'processing',
+                'percent_done': 100 if done else 50,
+                'status': {'items_total_count': activity['count'], 'items_completed_count': activity['count'] if done else 0},
+            }
+            if done:
+                body['activity_errors'] = activity['errors']
+            return 200, body, None
+        if method == 'GET' and route == 'contacts':
+            self._count('constant_contact', method, 'contacts')
+            email = ((query.get('email') or [''])[0]).lower()
+            contact = self.constant_contact_contacts.get(email)
+            return 200, {'contacts': [contact] if contact else []}, None
+        if method == 'POST' and route == 'activities/remove_list_memberships':
+            self._count('constant_contact', method, 'remove_list_memberships')
+            contact_ids = set((payload.get('source') or {}).get('contact_ids') or [])
+            list_ids = set(payload.get('list_ids') or [])
+            with self.lock:
+                for contact in self.constant_contact_contacts.values():
+                    if contact['contact_id'] in contact_ids:
+                        contact['list_memberships'] = [l for l in contact['list_memberships'] if l not in list_ids]
+            return 201, {'activity_id': str(uuid.uuid4()), 'state': 'initialized'}, None
+        return 404, [{'error_key': 'not.found', 'error_message': 'Not found.'}], None
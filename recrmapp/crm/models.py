@@ -71,6 +71,12 @@ class Client(models.Model):
 
     class Meta:
         ordering = ['last_name', 'first_name']
+        # Change feed: one user's records changed since an (updated_at, id) keyset. Same on Lead, Contact, Property.
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='crm_client_user_changes_idx'),
+            # Mail merge segment: opted-in clients of a status, streamed in id order.
+            models.Index(fields=['user', 'newsletter_opt_in', 'status', 'id'], name='crm_client_optin_status_idx'),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -156,6 +162,10 @@ class Lead(models.Model):
 
     class Meta:
         ordering = ['last_name', 'first_name']
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='crm_lead_user_changes_idx'),
+            models.Index(fields=['user', 'referral', 'id'], name='crm_lead_referral_idx'),  # mail merge segment
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -250,6 +260,7 @@ class Contact(models.Model):
 
     class Meta:
         ordering = ['last_name', 'first_name']
+        indexes = [models.Index(fields=['user', 'updated_at', 'id'], name='crm_contact_user_changes_idx')]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -386,6 +397,7 @@ class Property(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = 'Properties'
+        indexes = [models.Index(fields=['user', 'updated_at', 'id'], name='crm_property_user_changes_idx')]
 
     def __str__(self):
         return f"{self.title} - {self.address}"
@@ -491,6 +503,10 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        # Change feed. Transactions are owned through property__user, so the feed is read per property of the
+        # agent: each probe is a range scan past the cursor in (updated_at, id) order, touching only that agent's
+        # changed rows, and only those are sorted. An (updated_at, id) index would walk every agent's changes.
+        indexes = [models.Index(fields=['property', 'updated_at', 'id'], name='crm_transaction_changes_idx')]
 
     def __str__(self):
         return f"{self.property.title} – {self.get_status_display()}"
@@ -650,6 +666,34 @@ class TransactionTask(models.Model):
         return self.description
 
 
+class TransactionDocument(models.Model):
+    """
+    A file in a transaction's document library (disclosures, inspections...), attached to emails by reference.
+    Stored content-addressed (transaction_documents/<sha256[:2]>/<sha256>.<ext>), so identical files share one blob.
+    """
+
+    transaction = models.ForeignKey(
+        Transaction,
+        on_delete=models.CASCADE,
+        related_name='documents',
+    )
+    file = models.FileField(upload_to='transaction_documents/', max_length=255)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, default='application/octet-stream')
+    size = models.PositiveIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    uploaded_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['filename', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['transaction', 'sha256'], name='crm_txdoc_unique_content'),
+        ]
+
+    def __str__(self):
+        return self.filename
+
+
 class TransactionNote(models.Model):
     """A date/time-stamped note for a transaction. Newest first."""
     transaction = models.ForeignKey(
@@ -686,6 +730,8 @@ class UserProfile(models.Model):
         null=True,
         help_text='Optional image (e.g. logo or photo) shown at the end of your email signature.',
     )
+    # Bumped whenever the signature or its image changes; keys the rendered-signature cache.
+    signature_version = models.PositiveIntegerField(default=0, editable=False)
     # Mailchimp (optional): API key + Audience (list) ID. Leave blank if you use Constant Contact or neither.
     mailchimp_api_key = models.CharField(
         max_length=100,
@@ -741,6 +787,280 @@ class UserProfile(models.Model):
         )
 
 
+# --- Background exports ---
+
+class ExportJob(models.Model):
+    """A queued CSV/Excel export, written to default storage by the process_export_jobs command."""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Ready'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    MODEL_CHOICES = [
+        ('lead', 'Leads'),
+        ('client', 'Clients'),
+        ('contact', 'Contacts'),
+        ('property', 'Properties'),
+        ('transaction', 'Transactions'),
+    ]
+    FORMAT_CHOICES = [('csv', 'CSV'), ('xlsx', 'Excel'), ('parquet', 'Parquet')]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='export_jobs',
+    )
+    model_key = models.CharField(max_length=20, choices=MODEL_CHOICES)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    # List search/filter params the export was requested with (e.g. {"q": "smith", "status": "new"}).
+    filters = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    # Hash of the exported rows' count and latest updated_at (plus columns/format); an identical request
+    # with the same fingerprint reuses this job's file.
+    fingerprint = models.CharField(max_length=64, blank=True, db_index=True)
+    file = models.FileField(upload_to='exports/%Y/%m/', blank=True, null=True)
+    row_count = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_model_key_display()} ({self.get_format_display()}) – {self.created_at:%Y-%m-%d %H:%M}"
+
+    @property
+    def filename(self):
+        return f"{self.model_key}s-{self.created_at:%Y%m%d-%H%M}.{self.format}"
+
+
+# --- Outbound email ---
+
+class OutboundEmail(models.Model):
+    """An email queued from the app, delivered (with retries) by the process_outbox command."""
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Queued'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='outbound_emails',
+    )
+    to = models.JSONField(default=list)  # list of addresses
+    subject = models.CharField(max_length=255)
+    # Plain-text body as written; the HTML part and the sender's signature are rendered when sent.
+    body = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='crm_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} → {', '.join(self.to)} ({self.get_status_display()})"
+
+
+class OutboundEmailAttachment(models.Model):
+    """A file attached to an OutboundEmail; uploaded files are kept in default storage until the email is purged."""
+    email = models.ForeignKey(OutboundEmail, on_delete=models.CASCADE, related_name='attachments')
+    # Either an uploaded file of its own, or a transaction document attached by reference (read from its blob).
+    file = models.FileField(upload_to='outbox/%Y/%m/', blank=True)
+    document = models.ForeignKey(
+        TransactionDocument,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='email_attachments',
+    )
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, default='application/octet-stream')
+    size = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return self.filename
+
+
+class EmailTemplate(models.Model):
+    """A saved subject and message with merge fields ({{ first_name }} etc.), sent to a segment (see mail_merge)."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='email_templates',
+    )
+    name = models.CharField(max_length=100)
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['name']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='crm_email_template_unique_name'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+# --- Newsletter sync ---
+
+class NewsletterSyncState(models.Model):
+    """
+    What was last pushed to a provider list for one email: a fingerprint of the synced fields, so the next sync
+    sends only new or changed records, and whether it is subscribed, so an opt-out can be sent as an unsubscribe.
+    """
+    PROVIDER_CHOICES = [
+        ('mailchimp', 'Mailchimp'),
+        ('constant_contact', 'Constant Contact'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='newsletter_sync_states',
+    )
+    provider = models.CharField(max_length=20, choices=PROVIDER_CHOICES)
+    list_id = models.CharField(max_length=100)  # audience / list the state applies to; another list starts over
+    email = models.EmailField()  # lowercased
+    fingerprint = models.CharField(max_length=40)  # sha1 of the synced fields
+    subscribed = models.BooleanField(default=True)
+    synced_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'provider', 'email'], name='crm_newsletter_sync_state_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.email} ({self.get_provider_display()})"
+
+
+class SyncJob(models.Model):
+    """
+    A newsletter sync run by the process_sync_jobs command. Progress is checkpointed after every batch
+    (phase + cursor, the last email handled), so a job whose worker died resumes where it stopped.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    PHASE_RECORDS = 'records'
+    PHASE_OPT_OUTS = 'opt_outs'
+    PHASE_CHOICES = [
+        (PHASE_RECORDS, 'Sending contacts'),
+        (PHASE_OPT_OUTS, 'Unsubscribing opt-outs'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='sync_jobs',
+    )
+    provider = models.CharField(max_length=20, choices=NewsletterSyncState.PROVIDER_CHOICES)
+    full = models.BooleanField(default=False)  # re-send every record, changed or not
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    phase = models.CharField(max_length=20, choices=PHASE_CHOICES, default=PHASE_RECORDS)
+    cursor = models.EmailField(blank=True)  # last email handled in the current phase (emails go in sorted order)
+    total = models.PositiveIntegerField(null=True, blank=True)  # records + opt-outs to send, set when planned
+    processed = models.PositiveIntegerField(default=0)
+    synced = models.PositiveIntegerField(default=0)
+    unsubscribed = models.PositiveIntegerField(default=0)
+    unchanged = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)  # why the job failed as a whole
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    checkpoint_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_provider_display()} sync – {self.created_at:%Y-%m-%d %H:%M}"
+
+    @property
+    def is_active(self):
+        return self.status in (self.STATUS_PENDING, self.STATUS_RUNNING)
+
+    @property
+    def percent(self):
+        if self.status == self.STATUS_DONE:
+            return 100
+        if not self.total:
+            return 0
+        return min(100, self.processed * 100 // self.total)
+
+
+class SyncJobError(models.Model):
+    """One email a SyncJob could not sync or unsubscribe, with the provider's error."""
+    job = models.ForeignKey(SyncJob, on_delete=models.CASCADE, related_name='errors')
+    email = models.EmailField(blank=True)
+    error = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.email or '—'}: {self.error[:50]}"
+
+
+# --- Change feed ---
+
+class DeletedRecord(models.Model):
+    """Tombstone for a deleted Client, Lead, Contact, Property or Transaction, served by the change feed."""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='deleted_records',
+    )
+    model_key = models.CharField(max_length=20)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['deleted_at', 'id']
+        indexes = [
+            models.Index(fields=['user', 'model_key', 'deleted_at', 'id'], name='crm_deleted_user_changes_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_key} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
 # --- Application admin (separate from Django admin) ---
 
 class AppSettings(models.Model):
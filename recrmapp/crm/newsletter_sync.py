@@ -0,0 +1,189 @@
+"""
+Incremental newsletter sync. NewsletterSyncState remembers, per provider and email, a fingerprint of the fields
+last pushed and whether the email is subscribed. A sync then sends only new or changed opted-in records and
+unsubscribes emails that are no longer opted in, so a daily sync of an unchanged 10k list costs no API calls.
+"""
+import hashlib
+from dataclasses import dataclass, field
+
+from django.utils import timezone
+
+from .email_marketing import (
+    _record_payload,
+    remove_from_constant_contact,
+    sync_to_constant_contact,
+    sync_to_mailchimp,
+    unsubscribe_from_mailchimp,
+)
+from .models import NewsletterSyncState
+
+PROVIDER_MAILCHIMP = 'mailchimp'
+PROVIDER_CONSTANT_CONTACT = 'constant_contact'
+PROVIDER_LABELS = dict(NewsletterSyncState.PROVIDER_CHOICES)
+
+# provider: (sync records, unsubscribe emails), both returning (count, errors)
+PROVIDER_SYNC = {
+    PROVIDER_MAILCHIMP: (sync_to_mailchimp, unsubscribe_from_mailchimp),
+    PROVIDER_CONSTANT_CONTACT: (sync_to_constant_contact, remove_from_constant_contact),
+}
+
+
+def provider_list_id(profile, provider):
+    if provider == PROVIDER_MAILCHIMP:
+        return (profile.mailchimp_audience_id or '').strip()
+    return (profile.constant_contact_list_id or '').strip()
+
+
+def provider_connected(profile, provider):
+    if provider == PROVIDER_MAILCHIMP:
+        return profile.has_mailchimp_connected()
+    return profile.has_constant_contact_connected()
+
+
+def record_fingerprint(payload):
+    """sha1 over the synced fields of a _record_payload, in a fixed order."""
+    return hashlib.sha1('\x1f'.join(payload[key] for key in sorted(payload)).encode('utf-8')).hexdigest()
+
+
+@dataclass
+class SyncPlan:
+    """What an incremental sync will send: records to upsert, emails to unsubscribe, and counts for the preview."""
+    provider: str
+    list_id: str
+    full: bool = False  # every record is sent, changed or not
+    records: list = field(default_factory=list)  # new or changed record dicts
+    fingerprints: dict = field(default_factory=dict)  # email -> fingerprint, for the records above
+    status: dict = field(default_factory=dict)  # email -> 'new' | 'changed', for the records above
+    opt_outs: list = field(default_factory=list)  # emails subscribed by an earlier sync and no longer opted in
+    new_count: int = 0
+    changed_count: int = 0
+    unchanged_count: int = 0
+
+    @property
+    def provider_label(self):
+        return PROVIDER_LABELS[self.provider]
+
+    @property
+    def has_work(self):
+        return bool(self.records or self.opt_outs)
+
+
+def plan_sync(user, provider, list_id, records, full=False):
+    """
+    Compare records (opted-in record dicts, deduped by email) with the stored states for user's provider list.
+    full: send every record regardless of fingerprints (opt-outs are still computed).
+    """
+    plan = SyncPlan(provider=provider, list_id=list_id, full=full)
+    states = {
+        email: (fingerprint, subscribed)
+        for email, fingerprint, subscribed in NewsletterSyncState.objects.filter(
+            user=user, provider=provider, list_id=list_id,
+        ).values_list('email', 'fingerprint', 'subscribed')
+    }
+    seen = set()
+    for record in records:
+        payload = _record_payload(record)
+        email = payload['email']
+        if not email or email in seen:
+            continue
+        seen.add(email)
+        fingerprint = record_fingerprint(payload)
+        state = states.get(email)
+        if state is None or not state[1]:
+            plan.new_count += 1
+            plan.status[email] = 'new'
+        elif state[0] != fingerprint:
+            plan.changed_count += 1
+            plan.status[email] = 'changed'
+        else:
+            plan.unchanged_count += 1
+            if not full:
+                continue
+        plan.records.append(record)
+        plan.fingerprints[email] = fingerprint
+    plan.opt_outs = [email for email, (_, subscribed) in states.items() if subscribed and email not in seen]
+    return plan
+
+
+def _failed_emails(errors):
+    """Emails that failed, or None if an error with no email (configuration, whole sync) means nothing went."""
+    failed = set()
+    for error in errors:
+        if not error.get('email'):
+            return None
+        failed.add(error['email'].lower())
+    return failed
+
+
+def record_synced(user, provider, list_id, fingerprints, subscribed=True):
+    """Upsert states for emails a sync delivered (fingerprints: email -> fingerprint)."""
+    now = timezone.now()
+    NewsletterSyncState.objects.bulk_create(
+        [
+            NewsletterSyncState(
+                user=user, provider=provider, list_id=list_id, email=email,
+                fingerprint=fingerprint, subscribed=subscribed, synced_at=now,
+            )
+            for email, fingerprint in fingerprints.items()
+        ],
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['user', 'provider', 'email'],
+        update_fields=['list_id', 'fingerprint', 'subscribed', 'synced_at'],
+    )
+
+
+def send_records(profile, plan, records, concurrency=None, bulk=None):
+    """
+    Sync records (some or all of plan.records) and store states for those delivered.
+    bulk: passed to sync_to_constant_contact, so a plan sent in batches uses one mode throughout
+    (None: chosen from the records given).
+    Returns (synced, errors).
+    """
+    sync_records, _ = PROVIDER_SYNC[plan.provider]
+    options = {} if bulk is None else {'bulk': bulk}
+    synced, errors = sync_records(profile, records, concurrency=concurrency, **options)
+    failed = _failed_emails(errors)
+    if failed is not None:
+        sent = {_record_payload(r)['email'] for r in records}
+        delivered = {e: fp for e, fp in plan.fingerprints.items() if e in sent and e not in failed}
+        record_synced(profile.user, plan.provider, plan.list_id, delivered)
+    return synced, errors
+
+
+def send_opt_outs(profile, plan, emails, concurrency=None):
+    """Unsubscribe emails (some or all of plan.opt_outs) and mark those done. Returns (unsubscribed, errors)."""
+    _, unsubscribe_emails = PROVIDER_SYNC[plan.provider]
+    unsubscribed, errors = unsubscribe_emails(profile, emails, concurrency=concurrency)
+    failed = _failed_emails(errors)
+    if failed is not None:
+        NewsletterSyncState.objects.filter(
+            user=profile.user, provider=plan.provider, email__in=[e for e in emails if e not in failed],
+        ).update(subscribed=False, synced_at=timezone.now())
+    return unsubscribed, errors
+
+
+def run_sync_plan(profile, plan, concurrency=None):
+    """
+    Send a plan's records and opt-outs, then store the new states for everything that went through.
+    Returns dict: synced, unsubscribed, unchanged, errors.
+    """
+    synced, errors = 0, []
+    if plan.records:
+        synced, errors = send_records(profile, plan, plan.records, concurrency=concurrency)
+    unsubscribed = 0
+    if plan.opt_outs:
+        unsubscribed, unsubscribe_errors = send_opt_outs(profile, plan, plan.opt_outs, concurrency=concurrency)
+        errors.extend(unsubscribe_errors)
+    return {
+        'synced': synced,
+        'unsubscribed': unsubscribed,
+        'unchanged': 0 if plan.full else plan.unchanged_count,  # skipped as unchanged
+        'errors': errors,
+    }
+
+
+def incremental_sync(profile, provider, records, full=False, concurrency=None):
+    """Plan and run an incremental sync of records (opted-in record dicts) for profile's provider list."""
+    plan = plan_sync(profile.user, provider, provider_list_id(profile, provider), records, full=full)
+    return run_sync_plan(profile, plan, concurrency=concurrency)
@@ -0,0 +1,422 @@
+"""
+Outbound email queue. Emails written in the app (Client, Lead, Contact and Transaction pages) are stored as
+OutboundEmail rows, with their attachments in default storage, and the request returns right away.
+The process_outbox command delivers them and retries provider errors with exponential backoff.
+"""
+import base64
+import html
+import mimetypes
+import os
+import random
+import tracemalloc
+from datetime import timedelta
+from email.mime.image import MIMEImage
+from functools import wraps
+
+from anymail.exceptions import AnymailInvalidAddress, AnymailRecipientsRefused
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile, StopUpload
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, prefetch_related_objects
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+from .mail_merge import MergeTemplate, merge_fields
+from .models import OutboundEmail, OutboundEmailAttachment, UserProfile
+
+# Email attachments: allowed extensions and size limits
+ALLOWED_ATTACHMENT_EXTENSIONS = {'.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp', '.tiff', '.tif'}
+MAX_ATTACHMENT_SIZE = 10 * 1024 * 1024   # 10 MB per file
+MAX_ATTACHMENTS_TOTAL = 25 * 1024 * 1024  # 25 MB total
+MAX_EMAIL_FORM_OVERHEAD = 1024 * 1024  # subject, body and multipart framing on top of the attachments
+
+# Rendered email signatures, keyed by user and UserProfile.signature_version (a new version is a new key)
+CACHE_KEY_EMAIL_SIGNATURE = 'crm_email_signature'
+EMAIL_SIGNATURE_CACHE_TIMEOUT = 24 * 60 * 60  # 1 day
+# Content-ID of the signature image when sent as an inline attachment (settings.EMAIL_SIGNATURE_INLINE_CID)
+EMAIL_SIGNATURE_CID = 'email-signature'
+
+# Delivery retries: 1, 2, 4, 8, 16 minutes ... (capped), then the email is marked failed.
+OUTBOX_MAX_ATTEMPTS = 6
+OUTBOX_RETRY_BASE = timedelta(minutes=1)
+OUTBOX_RETRY_MAX = timedelta(hours=1)
+# A claimed email not finished within this window (worker killed mid-send) is picked up again.
+OUTBOX_STALE_AFTER = timedelta(minutes=10)
+# settings.EMAIL_SEND_IN_REQUEST: at most this many emails are sent inside one request (one worker batch);
+# the rest of a large send is left queued for process_outbox so the request returns promptly.
+OUTBOX_SEND_IN_REQUEST_LIMIT = 50
+
+
+class UnsendableEmail(Exception):
+    """An outbound email can never be built: attachments over MAX_ATTACHMENTS_TOTAL, or a referenced file is gone."""
+
+
+# Errors that will fail the same way on every attempt; not retried.
+PERMANENT_SEND_ERRORS = (AnymailInvalidAddress, AnymailRecipientsRefused, UnsendableEmail)
+
+
+def get_email_signature_html_and_image(user):
+    """Build HTML for the email signature from the user's profile (optional image as base64, or referenced
+    by cid: when settings.EMAIL_SIGNATURE_INLINE_CID is on and the image is attached inline).
+    Returns (html_string, image_data) where image_data is (bytes, content_type) or None.
+    Cached per user and profile.signature_version, so repeat sends skip reading the image from storage."""
+    if not user or not getattr(user, 'is_authenticated', False):
+        return '', None
+    try:
+        profile = getattr(user, 'profile', None)
+    except UserProfile.DoesNotExist:
+        profile = None
+    if not profile:
+        return '', None
+    inline_cid = getattr(settings, 'EMAIL_SIGNATURE_INLINE_CID', False)
+    cache_key = f'{CACHE_KEY_EMAIL_SIGNATURE}_{user.pk}_{profile.signature_version}_{"cid" if inline_cid else "data"}'
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    parts = []
+    image_data = None
+    image_failed = False
+    if profile.email_signature and profile.email_signature.strip():
+        parts.append(profile.email_signature.strip())
+    if profile.signature_image:
+        try:
+            profile.signature_image.open('rb')
+            try:
+                raw = profile.signature_image.read()
+                content_type = (
+                    mimetypes.guess_type(profile.signature_image.name)[0]
+                    or 'image/png'
+                )
+                image_data = (raw, content_type)
+                if inline_cid:
+                    src = f'cid:{EMAIL_SIGNATURE_CID}'
+                else:
+                    b64 = base64.b64encode(raw).decode('ascii')
+                    src = f'data:{content_type};base64,{b64}'
+                parts.append(
+                    f'<p><img src="{html.escape(src)}" alt="Signature" style="max-width:100%; height:auto;"></p>'
+                )
+            finally:
+                profile.signature_image.close()
+        except (ValueError, AttributeError, OSError):
+            image_failed = True
+    if parts:
+        html_block = '<div class="email-signature" style="margin-top:1.5em; padding-top:1em; border-top:1px solid #eee;">' + ''.join(parts) + '</div>'
+        result = (html_block, image_data)
+    else:
+        result = ('', None)
+    if not image_failed:
+        # A failed storage read is retried on the next send rather than cached.
+        cache.set(cache_key, result, EMAIL_SIGNATURE_CACHE_TIMEOUT)
+    return result
+
+
+def _inline_signature_image(raw, content_type):
+    """The signature image as an inline MIME part referenced by cid:EMAIL_SIGNATURE_CID in the HTML."""
+    image = MIMEImage(raw, _subtype=content_type.partition('/')[2] or 'png')
+    image.add_header('Content-ID', f'<{EMAIL_SIGNATURE_CID}>')
+    image.add_header('Content-Disposition', 'inline', filename=f'signature{mimetypes.guess_extension(content_type) or ".png"}')
+    return image
+
+
+def validate_attachments(files):
+    """Raise ValueError if the uploaded files break the size or type limits."""
+    files = [f for f in files if f and getattr(f, 'name', None)]
+    total_size = sum(getattr(f, 'size', 0) for f in files)
+    if total_size > MAX_ATTACHMENTS_TOTAL:
+        raise ValueError(f'Total attachments too large (max {MAX_ATTACHMENTS_TOTAL // (1024*1024)} MB).')
+    for f in files:
+        if getattr(f, 'size', 0) > MAX_ATTACHMENT_SIZE:
+            raise ValueError(f'File "{f.name}" is too large (max {MAX_ATTACHMENT_SIZE // (1024*1024)} MB per file).')
+        ext = os.path.splitext(f.name)[1].lower()
+        if ext not in ALLOWED_ATTACHMENT_EXTENSIONS:
+            raise ValueError(f'File type "{ext}" not allowed. Use PDF or images (e.g. .pdf, .jpg, .png).')
+    return files
+
+
+class AttachmentUploadHandler(FileUploadHandler):
+    """
+    First upload handler on the email views (see limit_attachment_uploads). Checks the request's Content-Length
+    and each part's filename before its body is read, and drops a file as soon as it passes the size limits, so
+    an oversized or disallowed upload is never spooled. Accepted files go on to Django's own handlers (in memory
+    up to FILE_UPLOAD_MAX_MEMORY_SIZE, otherwise a temporary file on disk). The first problem is left on
+    request.attachment_upload_error.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.total = 0
+        self.file_bytes = 0
+
+    def _reject(self, error, stop=False):
+        if not getattr(self.request, 'attachment_upload_error', None):
+            self.request.attachment_upload_error = error
+        raise StopUpload(connection_reset=False) if stop else SkipFile()
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > MAX_ATTACHMENTS_TOTAL + MAX_EMAIL_FORM_OVERHEAD:
+            self.request.attachment_upload_error = (
+                f'Total attachments too large (max {MAX_ATTACHMENTS_TOTAL // (1024*1024)} MB).'
+            )
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        if getattr(self.request, 'attachment_upload_error', None):
+            self._reject(self.request.attachment_upload_error, stop=True)
+        ext = os.path.splitext(file_name or '')[1].lower()
+        if ext not in ALLOWED_ATTACHMENT_EXTENSIONS:
+            self._reject(f'File type "{ext}" not allowed. Use PDF or images (e.g. .pdf, .jpg, .png).')
+        self.file_bytes = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.file_bytes += len(raw_data)
+        self.total += len(raw_data)
+        if self.file_bytes > MAX_ATTACHMENT_SIZE:
+            self._reject(f'File "{self.file_name}" is too large (max {MAX_ATTACHMENT_SIZE // (1024*1024)} MB per file).')
+        if self.total > MAX_ATTACHMENTS_TOTAL:
+            self._reject(f'Total attachments too large (max {MAX_ATTACHMENTS_TOTAL // (1024*1024)} MB).', stop=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None  # the next handler builds the file
+
+
+def limit_attachment_uploads(view):
+    """View decorator: install AttachmentUploadHandler before the request body is parsed. The CSRF check, which
+    would otherwise parse the body first in middleware, runs inside the wrapper instead."""
+    protected = csrf_protect(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method == 'POST':
+            request.upload_handlers.insert(0, AttachmentUploadHandler(request))
+        return protected(request, *args, **kwargs)
+
+    return csrf_exempt(wrapper)
+
+
+def queue_email(user, to_list, subject, body, files=(), documents=()):
+    """Validate attachments and store the email for delivery; returns the OutboundEmail. Raises ValueError.
+    documents: TransactionDocuments attached by reference (nothing is copied; the worker reads the stored file)."""
+    files = validate_attachments(files)
+    documents = list(documents)
+    if sum(f.size for f in files) + sum(d.size for d in documents) > MAX_ATTACHMENTS_TOTAL:
+        raise ValueError(f'Total attachments too large (max {MAX_ATTACHMENTS_TOTAL // (1024*1024)} MB).')
+    with transaction.atomic():
+        outbound = OutboundEmail.objects.create(
+            user=user,
+            to=list(to_list),
+            subject=subject,
+            body=body,
+            next_attempt_at=timezone.now(),
+        )
+        for f in files:
+            attachment = OutboundEmailAttachment(
+                email=outbound,
+                filename=os.path.basename(f.name),
+                content_type=getattr(f, 'content_type', None) or 'application/octet-stream',
+                size=getattr(f, 'size', 0) or 0,
+            )
+            attachment.file.save(attachment.filename, f, save=True)
+        OutboundEmailAttachment.objects.bulk_create([
+            OutboundEmailAttachment(
+                email=outbound,
+                document=document,
+                filename=document.filename,
+                content_type=document.content_type,
+                size=document.size,
+            )
+            for document in documents
+        ])
+    return outbound
+
+
+def queue_bulk_email(user, records, subject, body):
+    """Queue one email per record (Client, Lead or Contact with an email), with {{ first_name }} etc. filled in
+    (see mail_merge). Rows are bulk-inserted; returns the OutboundEmails."""
+    merge = MergeTemplate(subject, body)
+    now = timezone.now()
+    emails = []
+    for record in records:
+        email = record.email.strip()
+        subject_text, body_text = merge.render(merge_fields(record.first_name, record.last_name, email))
+        emails.append(OutboundEmail(user=user, to=[email], subject=subject_text, body=body_text, next_attempt_at=now))
+    return OutboundEmail.objects.bulk_create(emails, batch_size=500)
+
+
+def build_message(outbound, connection=None, signature=None):
+    """The EmailMessage for an OutboundEmail: body, HTML part with the sender's signature, attachments.
+    Signature image is embedded as base64 in the HTML so it displays with Resend and other API backends, or attached
+    inline (Content-ID) when settings.EMAIL_SIGNATURE_INLINE_CID is on. signature: the sender's already-rendered
+    (html, image_data), so a batch renders it once."""
+    if signature is None:
+        signature = get_email_signature_html_and_image(outbound.user)
+    signature_html, signature_image_data = signature
+    body = outbound.body
+    if signature_html:
+        message = EmailMultiAlternatives(
+            subject=outbound.subject,
+            body=body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=outbound.to,
+            connection=connection,
+        )
+        body_html = '<p>' + html.escape(body).replace('\n', '</p><p>') + '</p>' + signature_html
+        message.attach_alternative(body_html, 'text/html')
+        if signature_image_data and getattr(settings, 'EMAIL_SIGNATURE_INLINE_CID', False):
+            message.attach(_inline_signature_image(*signature_image_data))
+    else:
+        message = EmailMessage(
+            subject=outbound.subject,
+            body=body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=outbound.to,
+            connection=connection,
+        )
+    attachments = outbound.attachments.all()
+    if sum(a.size for a in attachments) > MAX_ATTACHMENTS_TOTAL:
+        # The message is built in memory (MIME/API payloads need the whole body), so this caps a send's footprint.
+        raise UnsendableEmail(f'Attachments exceed {MAX_ATTACHMENTS_TOTAL // (1024*1024)} MB.')
+    for attachment in attachments:
+        stored = attachment.file or (attachment.document.file if attachment.document_id else None)
+        if not stored:
+            raise UnsendableEmail(f'Attachment "{attachment.filename}" was deleted before sending.')
+        with stored.open('rb') as f:
+            message.attach(attachment.filename, f.read(), attachment.content_type)
+    return message
+
+
+def retry_delay(attempts):
+    """Backoff before the next try after `attempts` failed ones, with jitter so a provider outage isn't
+    followed by every queued email retrying in the same second."""
+    delay = min(OUTBOX_RETRY_BASE * (2 ** (attempts - 1)), OUTBOX_RETRY_MAX)
+    return delay * random.uniform(1.0, 1.2)
+
+
+def _claim(queryset, limit):
+    """Lock up to limit emails from queryset, mark them sending (one more attempt) and return them.
+    While sending, next_attempt_at holds the time the claim goes stale."""
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            queryset.select_for_update(skip_locked=True).order_by('next_attempt_at')[:limit]
+        )
+        if not emails:
+            return []
+        stale_at = now + OUTBOX_STALE_AFTER
+        OutboundEmail.objects.filter(pk__in=[e.pk for e in emails]).update(
+            status=OutboundEmail.STATUS_SENDING,
+            attempts=F('attempts') + 1,
+            next_attempt_at=stale_at,
+        )
+    for outbound in emails:
+        outbound.status = OutboundEmail.STATUS_SENDING
+        outbound.attempts += 1
+        outbound.next_attempt_at = stale_at
+    return emails
+
+
+def claim_outbound_emails(limit=1):
+    """Claim up to limit due emails (queued, or claimed by a worker that died); [] if there is nothing to do."""
+    return _claim(
+        OutboundEmail.objects.filter(
+            status__in=[OutboundEmail.STATUS_PENDING, OutboundEmail.STATUS_SENDING],
+            next_attempt_at__lte=timezone.now(),
+        ),
+        limit,
+    )
+
+
+def send_outbound_email(outbound, connection=None, signature=None):
+    """Deliver a claimed email; on error schedule the next try (or mark it failed). Returns outbound.
+    A passed connection is opened here and left open for the caller's next email."""
+    try:
+        if connection is not None:
+            connection.open()
+        message = build_message(outbound, signature=signature)
+        (connection or message.get_connection()).send_messages([message])
+    except Exception as e:
+        outbound.last_error = f'{type(e).__name__}: {e}'
+        if isinstance(e, PERMANENT_SEND_ERRORS) or outbound.attempts >= OUTBOX_MAX_ATTEMPTS:
+            outbound.status = OutboundEmail.STATUS_FAILED
+            outbound.next_attempt_at = None
+        else:
+            outbound.status = OutboundEmail.STATUS_PENDING
+            outbound.next_attempt_at = timezone.now() + retry_delay(outbound.attempts)
+    else:
+        outbound.status = OutboundEmail.STATUS_SENT
+        outbound.sent_at = timezone.now()
+        outbound.next_attempt_at = None
+        outbound.last_error = ''
+    outbound.save(update_fields=['status', 'next_attempt_at', 'last_error', 'sent_at'])
+    return outbound
+
+
+def send_outbound_batch(emails, connection):
+    """
+    Deliver claimed emails over one open backend connection (one SMTP session / HTTP keep-alive session),
+    rendering each sender's signature once for the batch. Each message is handed to send_messages() on its
+    own, so a failure is recorded against the right email and already-sent ones are never resent.
+    """
+    users = get_user_model()._default_manager.select_related('profile').in_bulk({e.user_id for e in emails})
+    prefetch_related_objects(emails, 'attachments__document')
+    signatures = {}
+    for outbound in emails:
+        outbound.user = users[outbound.user_id]
+        if outbound.user_id not in signatures:
+            signatures[outbound.user_id] = get_email_signature_html_and_image(outbound.user)
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        send_outbound_email(outbound, connection=connection, signature=signatures[outbound.user_id])
+        if tracemalloc.is_tracing():
+            # Peak Python allocations while building and sending this one email (process_outbox --trace-memory).
+            outbound.peak_alloc_bytes = tracemalloc.get_traced_memory()[1]
+        if outbound.status != OutboundEmail.STATUS_SENT:
+            connection.close()  # reopened by the next send; a failed session may be unusable
+    return emails
+
+
+def send_now(emails):
+    """First delivery attempt inside the request (settings.EMAIL_SEND_IN_REQUEST) for up to
+    OUTBOX_SEND_IN_REQUEST_LIMIT of emails; the rest, and any failures, stay queued for the worker.
+    Returns the emails this request claimed (a worker may already have taken others)."""
+    emails = emails[:OUTBOX_SEND_IN_REQUEST_LIMIT]
+    queryset = OutboundEmail.objects.filter(
+        pk__in=[e.pk for e in emails], status=OutboundEmail.STATUS_PENDING,
+    )
+    claimed = _claim(queryset, len(emails))
+    if claimed:
+        connection = get_connection()
+        try:
+            send_outbound_batch(claimed, connection)
+        finally:
+            connection.close()
+    return claimed
+
+
+def retry_outbound_email(outbound):
+    """Queue a failed email again with a fresh set of attempts."""
+    outbound.status = OutboundEmail.STATUS_PENDING
+    outbound.attempts = 0
+    outbound.next_attempt_at = timezone.now()
+    outbound.save(update_fields=['status', 'attempts', 'next_attempt_at'])
+    return outbound
+
+
+def purge_outbox(older_than):
+    """Delete sent or failed emails created before older_than, with their attachment files (documents attached
+    by reference stay in the transaction's library). Returns the count."""
+    emails = OutboundEmail.objects.filter(
+        status__in=[OutboundEmail.STATUS_SENT, OutboundEmail.STATUS_FAILED],
+        created_at__lt=older_than,
+    )
+    count = 0
+    for outbound in emails.prefetch_related('attachments').iterator(chunk_size=200):
+        for attachment in outbound.attachments.all():
+            attachment.file.delete(save=False)
+        outbound.delete()
+        count += 1
+    return count
@@ -0,0 +1,318 @@
+"""
+Two-way reconciliation of a user's CRM opted-in list with their Mailchimp audience, for drift the sync and the
+webhook miss (a dropped webhook, a member edited or unsubscribed by hand in Mailchimp).
+
+The CRM side is held as a set of 64-bit keys (the first half of Mailchimp's subscriber hash, md5 of the
+lowercased email), a few MB for 50k members. The audience is read 1,000 members a page and each page is diffed
+against that set as it arrives, so only differences are kept and no full member list is held. Differences are
+applied in both directions:
+
+  remote unsubscribed or cleaned, CRM opted in    -> opt the CRM records out
+  remote subscribed, CRM record not opted in      -> unsubscribe in Mailchimp if the last sync had it subscribed
+                                                     (the opt-out happened in the CRM), else opt the record in
+  remote subscribed, no CRM record with the email -> create a Lead (referral Mailchimp), as the webhook does
+  CRM opted in, not subscribed in Mailchimp       -> subscribe it (batch endpoint)
+
+Pages are read concurrently by offset, so a member can shift across a page boundary while the audience changes
+and go unseen. Before anything is subscribed, each CRM record the read did not account for is therefore looked
+up on its own (GET /members/{hash}): only members Mailchimp lacks (or has archived or transactional) are pushed.
+A member found unsubscribed or cleaned is opted out in the CRM instead, and a pending (double opt-in) member is
+left to finish confirming.
+"""
+from dataclasses import dataclass, field
+from itertools import islice
+
+import requests
+from django.db import transaction
+from django.db.models.functions import Lower, Trim
+from django.utils import timezone
+
+from .email_marketing import (
+    _batches,
+    _mailchimp_base_url,
+    _mailchimp_subscriber_hash,
+    _record_payload,
+    get_opted_in_records,
+)
+from .models import Client, Contact, Lead, NewsletterSyncState
+from .newsletter_sync import (
+    PROVIDER_MAILCHIMP,
+    SyncPlan,
+    provider_list_id,
+    record_fingerprint,
+    send_opt_outs,
+    send_records,
+)
+from .sync_transport import SyncTransport
+
+RECONCILE_PAGE_SIZE = 1000  # members per GET /lists/{id}/members (Mailchimp's maximum)
+RECONCILE_BATCH_SIZE = 500  # emails per CRM query / update and per push to Mailchimp
+RECONCILE_SAMPLE_SIZE = 20  # example emails kept per kind of change in the report
+REMOTE_OPTED_OUT = {'unsubscribed', 'cleaned'}
+REMOTE_NOT_SUBSCRIBED = {'archived', 'transactional'}  # re-checked members a CRM opt-in subscribes
+MEMBER_FIELDS = 'total_items,members.id,members.email_address,members.status,members.merge_fields'
+
+OPTED_IN_MODELS = (Client, Lead, Contact)
+
+
+def email_key(email):
+    """Compact set key for an email: the first 64 bits of its Mailchimp subscriber hash."""
+    return int(_mailchimp_subscriber_hash(email)[:16], 16)
+
+
+def _member_key(member):
+    return int(member['id'][:16], 16) if member.get('id') else email_key(member['email_address'])
+
+
+@dataclass
+class ReconcileReport:
+    """What a reconciliation found and changed (or, in a dry run, would change). samples: a few emails per change."""
+    dry_run: bool = False
+    remote_members: int = 0
+    remote_subscribed: int = 0
+    crm_opted_in: int = 0
+    in_sync: int = 0
+    subscribed_remote: int = 0  # CRM opted in, pushed to Mailchimp
+    unsubscribed_remote: int = 0  # opted out in the CRM, unsubscribed in Mailchimp
+    opted_out_in_crm: int = 0  # unsubscribed in Mailchimp, opted out in the CRM
+    opted_in_in_crm: int = 0  # subscribed in Mailchimp, existing CRM records opted in
+    leads_created: int = 0  # subscribed in Mailchimp, unknown to the CRM
+    errors: list = field(default_factory=list)
+    error_count: int = 0
+    samples: dict = field(default_factory=dict)
+
+    @property
+    def changes(self):
+        return (
+            self.subscribed_remote + self.unsubscribed_remote + self.opted_out_in_crm
+            + self.opted_in_in_crm + self.leads_created
+        )
+
+    def note(self, change, emails):
+        """Count emails under change and keep a few as examples."""
+        setattr(self, change, getattr(self, change) + len(emails))
+        sample = self.samples.setdefault(change, [])
+        sample.extend(islice(emails, max(0, RECONCILE_SAMPLE_SIZE - len(sample))))
+
+    def add_errors(self, errors):
+        self.error_count += len(errors)
+        self.errors.extend(errors[:max(0, 100 - len(self.errors))])
+
+    def as_dict(self):
+        return {
+            'dry_run': self.dry_run,
+            'remote_members': self.remote_members,
+            'remote_subscribed': self.remote_subscribed,
+            'crm_opted_in': self.crm_opted_in,
+            'in_sync': self.in_sync,
+            'subscribed_remote': self.subscribed_remote,
+            'unsubscribed_remote': self.unsubscribed_remote,
+            'opted_out_in_crm': self.opted_out_in_crm,
+            'opted_in_in_crm': self.opted_in_in_crm,
+            'leads_created': self.leads_created,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'samples': self.samples,
+        }
+
+
+def _by_email(model, user, emails):
+    """model rows of user whose normalized email is in emails."""
+    return model.objects.annotate(norm_email=Lower(Trim('email'))).filter(user=user, norm_email__in=emails)
+
+
+def _crm_emails(user, emails):
+    """The emails (normalized) any Client, Lead or Contact of user has."""
+    found = set()
+    for model in OPTED_IN_MODELS:
+        found.update(_by_email(model, user, emails).values_list('norm_email', flat=True))
+    return found
+
+
+def _set_opt_in(user, emails, opt_in):
+    """Set newsletter_opt_in on every record of user with one of emails (touching updated_at for the change feed)."""
+    now = timezone.now()
+    for model in OPTED_IN_MODELS:
+        _by_email(model, user, emails).filter(newsletter_opt_in=not opt_in).update(
+            newsletter_opt_in=opt_in, updated_at=now,
+        )
+
+
+def _opt_out_in_crm(user, list_id, emails):
+    """Opt out the CRM records with emails and mark them unsubscribed in the audience's sync state."""
+    _set_opt_in(user, emails, False)
+    NewsletterSyncState.objects.filter(
+        user=user, provider=PROVIDER_MAILCHIMP, list_id=list_id, email__in=emails,
+    ).update(subscribed=False, synced_at=timezone.now())
+
+
+def _remote_statuses(transport, url, records):
+    """(record, status, error) per record from GET /members/{hash}: status None if Mailchimp has no such member."""
+    def fetch(record):
+        try:
+            resp = transport.request(
+                'GET', f'{url}/{_mailchimp_subscriber_hash(record.email)}', params={'fields': 'status'},
+            )
+            if resp.status_code == 404:
+                return record, None, None
+            if resp.status_code != 200:
+                return record, None, resp.text[:200] or f'HTTP {resp.status_code}'
+            return record, resp.json().get('status'), None
+        except (requests.RequestException, ValueError) as e:
+            return record, None, str(e)[:200]
+
+    return transport.map(fetch, records)
+
+
+def _remote_pages(transport, url):
+    """Lists of members, a page at a time: the first page for total_items, then the rest concurrently, in order."""
+    def fetch(offset):
+        resp = transport.request(
+            'GET', url, params={'count': RECONCILE_PAGE_SIZE, 'offset': offset, 'fields': MEMBER_FIELDS},
+        )
+        if resp.status_code != 200:
+            raise requests.HTTPError(resp.text[:200] or f'HTTP {resp.status_code}', response=resp)
+        return resp.json()
+
+    first = fetch(0)
+    yield first.get('members') or []
+    for page in transport.map(fetch, range(RECONCILE_PAGE_SIZE, first.get('total_items') or 0, RECONCILE_PAGE_SIZE)):
+        yield page.get('members') or []
+
+
+def _reconcile_page(profile, list_id, report, crm_keys, pending, members, to_unsubscribe):
+    """Diff one page of members against the CRM keys and apply the inbound changes it finds."""
+    user = profile.user
+    opted_out = []
+    remote_only = {}  # email -> (first_name, last_name)
+    for member in members:
+        email = (member.get('email_address') or '').strip().lower()
+        if not email:
+            continue
+        report.remote_members += 1
+        key = _member_key(member)
+        status = member.get('status')
+        if status == 'subscribed':
+            report.remote_subscribed += 1
+            pending.discard(key)
+            if key in crm_keys:
+                report.in_sync += 1
+            else:
+                merge_fields = member.get('merge_fields') or {}
+                remote_only[email] = ((merge_fields.get('FNAME') or '').strip()[:100],
+                                      (merge_fields.get('LNAME') or '').strip()[:100])
+        elif status in REMOTE_OPTED_OUT:
+            pending.discard(key)
+            if key in crm_keys:
+                opted_out.append(email)
+        # pending / transactional / archived: left in `pending`, re-checked before a CRM opt-in is pushed
+
+    opt_in, new_leads = [], []
+    if remote_only:
+        known = _crm_emails(user, list(remote_only))
+        pushed_before = set(
+            NewsletterSyncState.objects.filter(
+                user=user, provider=PROVIDER_MAILCHIMP, list_id=list_id, subscribed=True, email__in=known,
+            ).values_list('email', flat=True)
+        )
+        for email in remote_only:
+            if email not in known:
+                new_leads.append(email)
+            elif email in pushed_before:
+                to_unsubscribe.append(email)  # opted out in the CRM since the last sync
+            else:
+                opt_in.append(email)
+
+    report.note('opted_out_in_crm', opted_out)
+    report.note('opted_in_in_crm', opt_in)
+    report.note('leads_created', new_leads)
+    if report.dry_run:
+        return
+    with transaction.atomic():
+        if opted_out:
+            _opt_out_in_crm(user, list_id, opted_out)
+        if opt_in:
+            _set_opt_in(user, opt_in, True)
+        if new_leads:
+            Lead.objects.bulk_create([
+                Lead(
+                    user=user, email=email, first_name=remote_only[email][0], last_name=remote_only[email][1],
+                    referral='mailchimp', status='new', newsletter_opt_in=True,
+                )
+                for email in new_leads
+            ])
+
+
+def reconcile_mailchimp(profile, dry_run=False, concurrency=None):
+    """
+    Reconcile profile's opted-in records with its Mailchimp audience in both directions (see the module
+    docstring). dry_run: report the differences without changing anything. Returns a ReconcileReport.
+    """
+    report = ReconcileReport(dry_run=dry_run)
+    if not profile.has_mailchimp_connected():
+        report.add_errors([{'email': None, 'error': 'Mailchimp not configured for this user.'}])
+        return report
+    user = profile.user
+    list_id = provider_list_id(profile, PROVIDER_MAILCHIMP)
+    url = f'{_mailchimp_base_url(profile.mailchimp_api_key)}/lists/{list_id}/members'
+
+    crm_keys = {email_key(record.email) for record in get_opted_in_records(user)}
+    report.crm_opted_in = len(crm_keys)
+    pending = set(crm_keys)  # CRM opted-in keys not (yet) seen subscribed or opted out in Mailchimp
+    to_unsubscribe = []
+    try:
+        with SyncTransport(
+            PROVIDER_MAILCHIMP, concurrency=concurrency, auth=('anystring', profile.mailchimp_api_key),
+        ) as transport:
+            for members in _remote_pages(transport, url):
+                _reconcile_page(profile, list_id, report, crm_keys, pending, members, to_unsubscribe)
+    except (requests.RequestException, ValueError, KeyError) as e:
+        # Without the whole audience, CRM records missing from it cannot be told apart from unread ones.
+        report.add_errors([{'email': None, 'error': f'Reading the Mailchimp audience failed: {str(e)[:200]}'}])
+        return report
+
+    plan = SyncPlan(provider=PROVIDER_MAILCHIMP, list_id=list_id)
+    for emails in _batches(to_unsubscribe, RECONCILE_BATCH_SIZE):
+        if dry_run:
+            report.note('unsubscribed_remote', emails)
+            continue
+        unsubscribed, errors = send_opt_outs(profile, plan, emails, concurrency=concurrency)
+        report.add_errors(errors)
+        failed = {e['email'] for e in errors}
+        report.note('unsubscribed_remote', [e for e in emails if e not in failed][:unsubscribed])
+
+    # Second pass over the CRM side: only the records the read did not account for are materialized, and each is
+    # re-checked before it is subscribed, so a member missed by the paged read is never re-subscribed.
+    missing = (record for record in get_opted_in_records(user) if email_key(record.email) in pending)
+    with SyncTransport(
+        PROVIDER_MAILCHIMP, concurrency=concurrency, auth=('anystring', profile.mailchimp_api_key),
+    ) as transport:
+        for candidates in _batches(missing, RECONCILE_BATCH_SIZE):
+            records, opted_out = [], []
+            for record, status, error in _remote_statuses(transport, url, candidates):
+                if error:
+                    report.add_errors([{'email': record.email, 'error': error}])
+                elif status is None or status in REMOTE_NOT_SUBSCRIBED:
+                    records.append(record)
+                elif status in REMOTE_OPTED_OUT:
+                    opted_out.append(record.email)
+                elif status == 'subscribed':
+                    report.in_sync += 1
+                # 'pending': a double opt-in under way; subscribing would skip the confirmation
+            report.note('opted_out_in_crm', opted_out)
+            emails = [record.email for record in records]
+            if dry_run:
+                report.note('subscribed_remote', emails)
+                continue
+            if opted_out:
+                with transaction.atomic():
+                    _opt_out_in_crm(user, list_id, opted_out)
+            if not records:
+                continue
+            payloads = [_record_payload(record) for record in records]
+            plan.fingerprints = {payload['email']: record_fingerprint(payload) for payload in payloads}
+            synced, errors = send_records(profile, plan, records, concurrency=concurrency)
+            report.add_errors(errors)
+            failed = {e['email'] for e in errors}
+            report.note('subscribed_remote', [e for e in emails if e not in failed][:synced])
+    return report
@@ -0,0 +1,72 @@
+"""
+Upload-time processing for email signature images (UserProfile.signature_image).
+The image is inlined into every email the user sends, so it is downscaled to signature display size
+and re-encoded compactly once, when uploaded, instead of shipping a multi-megabyte photo per message.
+Uses Pillow when installed; without it an image is stored as uploaded if it is within the byte cap.
+"""
+import io
+import os
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+SIGNATURE_IMAGE_MAX_WIDTH = 600   # px; wider than most signature blocks render
+SIGNATURE_IMAGE_MAX_HEIGHT = 300  # px
+SIGNATURE_IMAGE_MAX_BYTES = 150 * 1024  # stored (and emailed) size cap
+SIGNATURE_IMAGE_MAX_UPLOAD = 20 * 1024 * 1024  # what we are willing to decode
+SIGNATURE_JPEG_QUALITIES = (85, 75, 65, 50)
+
+
+def _encode(img, fmt, **options):
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, optimize=True, **options)
+    return buf.getvalue()
+
+
+def _encodings(img):
+    """Candidate encodings, smallest-effort first: PNG (palette fallback) for transparent images, else JPEG."""
+    from PIL import Image
+
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        yield 'png', _encode(img, 'PNG')
+        yield 'png', _encode(img.quantize(colors=256, method=Image.Quantize.FASTOCTREE), 'PNG')
+    else:
+        img = img.convert('RGB')
+        for quality in SIGNATURE_JPEG_QUALITIES:
+            yield 'jpg', _encode(img, 'JPEG', quality=quality, progressive=True)
+
+
+def prepare_signature_image(upload):
+    """
+    Return a small re-encoded copy of an uploaded signature image (SimpleUploadedFile) for storage.
+    Raises ValidationError if the file is not an image or cannot be brought under SIGNATURE_IMAGE_MAX_BYTES.
+    """
+    if upload.size > SIGNATURE_IMAGE_MAX_UPLOAD:
+        raise ValidationError(f'Image is too large (max {SIGNATURE_IMAGE_MAX_UPLOAD // (1024 * 1024)} MB).')
+    try:
+        from PIL import Image, ImageOps, UnidentifiedImageError
+    except ImportError:
+        if upload.size > SIGNATURE_IMAGE_MAX_BYTES:
+            raise ValidationError(
+                f'Signature image must be under {SIGNATURE_IMAGE_MAX_BYTES // 1024} KB. Resize it and upload again.'
+            )
+        return upload
+
+    upload.seek(0)
+    try:
+        img = Image.open(upload)
+        img.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValidationError('Upload a valid image (PNG, JPEG, GIF or WebP).')
+    img = ImageOps.exif_transpose(img)  # phone photos carry rotation in EXIF, which is dropped on re-encode
+    img.thumbnail((SIGNATURE_IMAGE_MAX_WIDTH, SIGNATURE_IMAGE_MAX_HEIGHT), Image.Resampling.LANCZOS)
+
+    base = os.path.splitext(os.path.basename(upload.name))[0] or 'signature'
+    for ext, data in _encodings(img):
+        if len(data) <= SIGNATURE_IMAGE_MAX_BYTES:
+            content_type = 'image/png' if ext == 'png' else 'image/jpeg'
+            return SimpleUploadedFile(f'{base}.{ext}', data, content_type=content_type)
+    raise ValidationError(
+        f'Could not make this image smaller than {SIGNATURE_IMAGE_MAX_BYTES // 1024} KB; try a simpler image.'
+    )
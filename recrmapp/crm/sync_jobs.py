@@ -0,0 +1,228 @@
+"""
+Background newsletter syncs: queue a SyncJob from the sync page and run it from the process_sync_jobs command,
+a batch at a time. Records and opt-outs are sent in email order; after each batch the job saves its counters,
+its cursor (the last email handled) and the batch's per-email errors. A job whose worker died or timed out is
+claimed again and continues after its cursor instead of starting over.
+
+Every save is fenced on the checkpoint_at the worker last wrote: once another worker has claimed the job (which
+moves checkpoint_at), the old worker's next save matches nothing and it stops instead of sending the same
+records again.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .email_marketing import (
+    CONSTANT_CONTACT_IMPORT_CHUNK_SIZE,
+    CONSTANT_CONTACT_IMPORT_THRESHOLD,
+    _batches,
+    _record_payload,
+    get_opted_in_records,
+)
+from .models import SyncJob, SyncJobError, UserProfile
+from .newsletter_sync import (
+    PROVIDER_CONSTANT_CONTACT,
+    PROVIDER_LABELS,
+    plan_sync,
+    provider_connected,
+    provider_list_id,
+    send_opt_outs,
+    send_records,
+)
+
+# Records (or opt-outs) sent between checkpoints: one Mailchimp batch request.
+SYNC_JOB_BATCH_SIZE = 500
+# Constant Contact records, when the job is large enough to import them: one import activity per checkpoint.
+SYNC_JOB_IMPORT_BATCH_SIZE = CONSTANT_CONTACT_IMPORT_CHUNK_SIZE
+
+# A job still "running" with no checkpoint for this long belongs to a dead worker and is picked up again.
+SYNC_JOB_STALE_AFTER = timedelta(minutes=10)
+
+
+def request_sync_job(user, provider, full=False):
+    """Return (job, reused): the user's queued or running job for provider, or a newly queued one."""
+    job = (
+        SyncJob.objects.filter(
+            user=user, provider=provider, status__in=[SyncJob.STATUS_PENDING, SyncJob.STATUS_RUNNING],
+        )
+        .order_by('-created_at')
+        .first()
+    )
+    if job is not None:
+        return job, True
+    return SyncJob.objects.create(user=user, provider=provider, full=full), False
+
+
+def resume_sync_job(job):
+    """Queue a failed job again; it continues from its last checkpoint. Returns False if the job had not failed."""
+    updated = SyncJob.objects.filter(pk=job.pk, status=SyncJob.STATUS_FAILED).update(
+        status=SyncJob.STATUS_PENDING, error='', finished_at=None,
+    )
+    return bool(updated)
+
+
+def claim_next_sync_job():
+    """Mark the oldest queued (or stale running) job as running and return it; None if there is nothing to do."""
+    now = timezone.now()
+    stale = now - SYNC_JOB_STALE_AFTER
+    with transaction.atomic():
+        job = (
+            SyncJob.objects.select_for_update(skip_locked=True)
+            .filter(status=SyncJob.STATUS_PENDING)
+            .order_by('created_at')
+            .first()
+        ) or (
+            SyncJob.objects.select_for_update(skip_locked=True)
+            .filter(status=SyncJob.STATUS_RUNNING, checkpoint_at__lt=stale)
+            .order_by('checkpoint_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = SyncJob.STATUS_RUNNING
+        job.started_at = job.started_at or now
+        job.checkpoint_at = now
+        job.save(update_fields=['status', 'started_at', 'checkpoint_at'])
+    return job
+
+
+def _record_email(record):
+    return _record_payload(record)['email']
+
+
+def _save_owned(job, **fields):
+    """
+    Save fields (and a fresh checkpoint_at) if this worker still owns the running job, i.e. nobody has claimed
+    it since our last save. Returns False, changing nothing, if another worker has taken it over.
+    """
+    fields['checkpoint_at'] = timezone.now()
+    owned = SyncJob.objects.filter(
+        pk=job.pk, status=SyncJob.STATUS_RUNNING, checkpoint_at=job.checkpoint_at,
+    ).update(**fields)
+    if not owned:
+        return False
+    for name, value in fields.items():
+        setattr(job, name, value)
+    return True
+
+
+def _checkpoint(job, cursor, handled, errors, synced=0, unsubscribed=0):
+    """Save a finished batch: counters, cursor and the batch's errors, together. Returns False if the job was lost."""
+    with transaction.atomic():
+        if not _save_owned(
+            job,
+            cursor=cursor,
+            processed=job.processed + handled,
+            synced=job.synced + synced,
+            unsubscribed=job.unsubscribed + unsubscribed,
+            error_count=job.error_count + len(errors),
+        ):
+            return False
+        SyncJobError.objects.bulk_create([
+            SyncJobError(job=job, email=e.get('email') or '', error=e.get('error') or 'Unknown error')
+            for e in errors
+        ])
+    return True
+
+
+def _fail(job, error):
+    if not _save_owned(job, status=SyncJob.STATUS_FAILED, error=error, finished_at=timezone.now()):
+        return _lost(job)
+    return job
+
+
+def _lost(job):
+    """Another worker claimed the job; leave it to that worker and return its current state."""
+    job.refresh_from_db()
+    return job
+
+
+def _records_mode(provider, count, batch_size, import_batch_size):
+    """
+    (bulk, batch size) for sending count records. For Constant Contact the mode is chosen once from the job's
+    record count, not per batch, and an import-sized job sends one full import activity per checkpoint.
+    """
+    if provider != PROVIDER_CONSTANT_CONTACT:
+        return None, batch_size
+    bulk = count >= CONSTANT_CONTACT_IMPORT_THRESHOLD
+    return bulk, import_batch_size if bulk else batch_size
+
+
+def _batch_error(errors):
+    """The error that stopped a whole batch (no email: configuration, authentication), or None."""
+    for e in errors:
+        if not e.get('email'):
+            return e.get('error') or 'Unknown error'
+    return None
+
+
+def run_sync_job(job, concurrency=None, batch_size=SYNC_JOB_BATCH_SIZE, import_batch_size=SYNC_JOB_IMPORT_BATCH_SIZE):
+    """
+    Run (or resume) job, as returned by claim_next_sync_job, to the end, checkpointing after every batch, and
+    mark it done or failed. Sync states are written before each checkpoint, so a crash between the two re-sends
+    at most one batch. Stops early, leaving the job running, if another worker claims it meanwhile.
+    """
+    profile, _ = UserProfile.objects.get_or_create(user=job.user, defaults={})
+    if not provider_connected(profile, job.provider):
+        return _fail(job, f'{PROVIDER_LABELS[job.provider]} is not configured in the profile.')
+    try:
+        plan = plan_sync(
+            job.user, job.provider, provider_list_id(profile, job.provider),
+            get_opted_in_records(job.user), full=job.full,
+        )
+        if job.total is None:
+            # First run: size the job. On a resume, what was already delivered now plans as unchanged.
+            total = len(plan.records) + len(plan.opt_outs)
+            if not _save_owned(job, total=total, unchanged=0 if job.full else plan.unchanged_count):
+                return _lost(job)
+
+        if job.phase == SyncJob.PHASE_RECORDS:
+            records = sorted((r for r in plan.records if _record_email(r) > job.cursor), key=_record_email)
+            bulk, records_batch_size = _records_mode(
+                job.provider, len(records), batch_size, import_batch_size,
+            )
+            for batch in _batches(records, records_batch_size):
+                synced, errors = send_records(profile, plan, batch, concurrency=concurrency, bulk=bulk)
+                error = _batch_error(errors)
+                if error is not None and not synced:
+                    return _fail(job, error)
+                if not _checkpoint(job, _record_email(batch[-1]), len(batch), errors, synced=synced):
+                    return _lost(job)
+            if not _save_owned(job, phase=SyncJob.PHASE_OPT_OUTS, cursor=''):
+                return _lost(job)
+
+        opt_outs = sorted(email for email in plan.opt_outs if email > job.cursor)
+        for batch in _batches(opt_outs, batch_size):
+            unsubscribed, errors = send_opt_outs(profile, plan, batch, concurrency=concurrency)
+            error = _batch_error(errors)
+            if error is not None and not unsubscribed:
+                return _fail(job, error)
+            if not _checkpoint(job, batch[-1], len(batch), errors, unsubscribed=unsubscribed):
+                return _lost(job)
+    except Exception as e:
+        return _fail(job, str(e))
+    if not _save_owned(job, status=SyncJob.STATUS_DONE, error='', finished_at=timezone.now()):
+        return _lost(job)
+    return job
+
+
+def sync_job_progress(job):
+    """The job's progress as a JSON-serializable dict (for the progress endpoint)."""
+    return {
+        'id': job.pk,
+        'provider': job.provider,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'phase': job.phase,
+        'phase_display': job.get_phase_display(),
+        'total': job.total,
+        'processed': job.processed,
+        'percent': job.percent,
+        'synced': job.synced,
+        'unsubscribed': job.unsubscribed,
+        'unchanged': job.unchanged,
+        'error_count': job.error_count,
+        'error': job.error,
+        'finished': not job.is_active,
+    }
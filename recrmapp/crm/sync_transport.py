@@ -0,0 +1,162 @@
+"""
+HTTP transport shared by the newsletter syncs (Mailchimp, Constant Contact).
+One pooled requests.Session per sync, up to `concurrency` requests in flight, a token bucket holding each
+provider to its documented rate, and retries with exponential backoff on 429/5xx and connection errors
+(a 429's Retry-After pauses every worker, not just the one that got it). map() returns results in input order.
+"""
+import email.utils
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Requests per second and simultaneous connections each provider allows.
+# Mailchimp: 10 simultaneous connections per user. Constant Contact v3: 4 requests per second.
+PROVIDER_LIMITS = {
+    'mailchimp': {'rate': 10.0, 'max_concurrency': 10},
+    'constant_contact': {'rate': 4.0, 'max_concurrency': 4},
+}
+DEFAULT_SYNC_CONCURRENCY = 4
+SYNC_REQUEST_TIMEOUT = 30  # seconds per request
+SYNC_MAX_RETRIES = 4
+SYNC_RETRY_BASE = 1.0  # seconds; doubled per retry
+SYNC_RETRY_MAX = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a request may start."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold every caller back for about `seconds` (the provider asked us to slow down)."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+def retry_after_seconds(response):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date); None if absent or unparseable."""
+    value = (response.headers.get('Retry-After') or '').strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+class SyncTransport:
+    """
+    Pooled, rate-limited, retrying HTTP client for one provider sync. Use as a context manager:
+
+        with SyncTransport('mailchimp', auth=auth) as transport:
+            for result in transport.map(send_batch, batches): ...
+    """
+
+    def __init__(self, provider, concurrency=None, rate=None, headers=None, auth=None,
+                 timeout=SYNC_REQUEST_TIMEOUT, max_retries=SYNC_MAX_RETRIES):
+        limits = PROVIDER_LIMITS[provider]
+        if concurrency is None:
+            concurrency = getattr(settings, 'NEWSLETTER_SYNC_CONCURRENCY', DEFAULT_SYNC_CONCURRENCY)
+        self.provider = provider
+        self.concurrency = max(1, min(int(concurrency), limits['max_concurrency']))
+        self.bucket = TokenBucket(rate or limits['rate'])
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+        self.session.auth = auth
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f'{provider}-sync')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
+
+    def _backoff(self, attempt):
+        return min(SYNC_RETRY_BASE * (2 ** attempt), SYNC_RETRY_MAX) * random.uniform(1.0, 1.25)
+
+    def request(self, method, url, **kwargs):
+        """
+        One request through the rate limiter, retried on 429/5xx and connection errors. Returns the last
+        Response (which may still be an error status); raises requests.RequestException once retries run out.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning('%s sync: %s %s failed; retrying in %.1fs', self.provider, method, url, delay)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                delay = retry_after_seconds(response) if response.status_code == 429 else None
+                if delay is not None:
+                    self.bucket.pause(delay)
+                else:
+                    delay = self._backoff(attempt)
+                logger.warning(
+                    '%s sync: HTTP %s from %s; retrying in %.1fs', self.provider, response.status_code, url, delay,
+                )
+            time.sleep(delay)
+            attempt += 1
+
+    def map(self, fn, items):
+        """
+        Yield fn(item) for each item, in input order, running up to `concurrency` calls at once.
+        Only a window of items is submitted ahead, so a long generator of items is never materialized.
+        """
+        window = deque()
+        for item in items:
+            window.append(self.executor.submit(fn, item))
+            if len(window) >= self.concurrency * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
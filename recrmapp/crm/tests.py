@@ -1,3 +1,184 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from crm import email_marketing, reconciliation
+from crm.email_marketing import _constant_contact_import_errors, sync_to_constant_contact, sync_to_mailchimp
+from crm.mock_providers import MockProviderServer
+from crm.models import Client, UserProfile
+
+
+def _records(n, prefix='contact'):
+    return [
+        {'email': f'{prefix}{i}@example.com', 'first_name': 'Pat', 'last_name': f'Lee{i}', 'city': 'Vallejo'}
+        for i in range(n)
+    ]
+
+
+def _profile():
+    """An unsaved profile with placeholder credentials for both providers."""
+    return UserProfile(
+        mailchimp_api_key='test-us1',
+        mailchimp_audience_id='audience',
+        constant_contact_api_key='key',
+        constant_contact_access_token='token',
+        constant_contact_list_id='list',
+    )
+
+
+class NewsletterSyncTestCase(SimpleTestCase):
+    """Runs the real sync code against MockProviderServer; emails in reject_emails are refused by the mock."""
+    reject_emails = ('contact1@example.com', 'contact3@example.com')
+
+    def setUp(self):
+        self.server = MockProviderServer(reject_emails=self.reject_emails, import_seconds=0)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        settings = override_settings(
+            MAILCHIMP_API_URL=self.server.mailchimp_url,
+            CONSTANT_CONTACT_API_URL=self.server.constant_contact_url,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        poll = mock.patch.object(email_marketing, 'CONSTANT_CONTACT_IMPORT_POLL', 0.01)
+        poll.start()
+        self.addCleanup(poll.stop)
+        quiet = mock.patch.object(email_marketing.logger, 'disabled', True)  # a warning per rejected email
+        quiet.start()
+        self.addCleanup(quiet.stop)
+
+    def assertRejected(self, errors):
+        self.assertEqual([e['email'] for e in errors], list(self.reject_emails))
+        for error in errors:
+            self.assertIn(error['email'], error['error'])
+
+
+class MailchimpSyncTests(NewsletterSyncTestCase):
+
+    def test_batch_subscribe_counts_synced_and_maps_errors_to_emails(self):
+        synced, errors = sync_to_mailchimp(_profile(), _records(5))
+        self.assertEqual(synced, 3)
+        self.assertRejected(errors)
+        self.assertEqual(len(self.server.mailchimp_members), 3)
+        self.assertEqual(self.server.requests['mailchimp', 'POST', 'batch'], 1)
+
+    def test_not_configured(self):
+        synced, errors = sync_to_mailchimp(UserProfile(), _records(2))
+        self.assertEqual(synced, 0)
+        self.assertIsNone(errors[0]['email'])
+        self.assertFalse(self.server.requests)
+
+
+class ConstantContactSyncTests(NewsletterSyncTestCase):
+
+    def test_sign_up_form_posts_one_request_per_contact(self):
+        synced, errors = sync_to_constant_contact(_profile(), _records(5), bulk=False)
+        self.assertEqual(synced, 3)
+        self.assertRejected(errors)
+        self.assertEqual(self.server.requests['constant_contact', 'POST', 'sign_up_form'], 5)
+        self.assertFalse(self.server.requests['constant_contact', 'POST', 'contacts_json_import'])
+
+    def test_import_activity_counts_synced_and_maps_errors_to_emails(self):
+        synced, errors = sync_to_constant_contact(_profile(), _records(150), bulk=True)
+        self.assertEqual(synced, 148)
+        self.assertRejected(errors)
+        self.assertEqual(len(self.server.constant_contact_contacts), 148)
+        self.assertEqual(self.server.requests['constant_contact', 'POST', 'contacts_json_import'], 1)
+        self.assertFalse(self.server.requests['constant_contact', 'POST', 'sign_up_form'])
+
+    def test_import_is_split_into_activities_of_chunk_size(self):
+        with mock.patch.object(email_marketing, 'CONSTANT_CONTACT_IMPORT_CHUNK_SIZE', 40):
+            synced, errors = sync_to_constant_contact(_profile(), _records(100), bulk=True)
+        self.assertEqual(synced, 98)
+        self.assertRejected(errors)
+        self.assertEqual(self.server.requests['constant_contact', 'POST', 'contacts_json_import'], 3)
+
+    @mock.patch.object(email_marketing, 'CONSTANT_CONTACT_IMPORT_THRESHOLD', 6)
+    def test_mode_follows_import_threshold(self):
+        sync_to_constant_contact(_profile(), _records(5, prefix='small'))
+        self.assertEqual(self.server.requests['constant_contact', 'POST', 'sign_up_form'], 5)
+        self.server.reset()
+        sync_to_constant_contact(_profile(), _records(6, prefix='large'))
+        self.assertEqual(self.server.requests['constant_contact', 'POST', 'contacts_json_import'], 1)
+        self.assertFalse(self.server.requests['constant_contact', 'POST', 'sign_up_form'])
+
+
+class ConstantContactImportErrorTests(SimpleTestCase):
+    emails = ['a@example.com', 'b@example.com', 'c@example.com']
+
+    def test_errors_without_an_email_are_mapped_by_line_number(self):
+        activity = {'activity_id': 'x', 'activity_errors': [
+            {'message': 'Line 3: Phone number is invalid.'},
+            {'message': 'Line 1: Email address is invalid.'},
+        ]}
+        errors = _constant_contact_import_errors(activity, self.emails)
+        self.assertEqual(errors, [
+            {'email': 'a@example.com', 'error': 'Line 1: Email address is invalid.'},
+            {'email': 'c@example.com', 'error': 'Line 3: Phone number is invalid.'},
+        ])
+
+    def test_quoted_email_wins_over_line_number(self):
+        activity = {'activity_errors': [{'message': 'Line 1: Email address B@example.com is invalid.'}]}
+        errors = _constant_contact_import_errors(activity, self.emails)
+        self.assertEqual([e['email'] for e in errors], ['b@example.com'])
+
+    def test_unmatched_messages_are_dropped(self):
+        activity = {'activity_errors': [{'message': 'Line 9: out of range.'}, 'Something else went wrong.']}
+        with self.assertLogs('crm.email_marketing', 'WARNING'):
+            self.assertEqual(_constant_contact_import_errors(activity, self.emails), [])
+
+
+class ReconcileMailchimpTests(TestCase):
+    """Two-way reconciliation against MockProviderServer's audience."""
+
+    def setUp(self):
+        self.server = MockProviderServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        settings = override_settings(MAILCHIMP_API_URL=self.server.mailchimp_url)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = get_user_model().objects.create(username='agent')
+        self.profile = UserProfile.objects.create(
+            user=self.user, mailchimp_api_key='test-us1', mailchimp_audience_id='audience',
+        )
+
+    def add_member(self, email, status):
+        self.server.mailchimp_members[email] = {
+            'id': email_marketing._mailchimp_subscriber_hash(email), 'email_address': email, 'status': status,
+            'merge_fields': {},
+        }
+
+    def add_client(self, email):
+        Client.objects.create(user=self.user, first_name='Pat', last_name='Lee', email=email, newsletter_opt_in=True)
+
+    def test_members_missed_by_the_paged_read_are_rechecked_before_subscribing(self):
+        for email, status in [
+            ('in-sync@example.com', 'subscribed'),
+            ('unsubscribed@example.com', 'unsubscribed'),
+            ('pending@example.com', 'pending'),
+            ('archived@example.com', 'archived'),
+        ]:
+            self.add_member(email, status)
+            self.add_client(email)
+        self.add_client('new@example.com')
+        read_pages = reconciliation._remote_pages
+
+        def shifted_pages(transport, url):
+            # The unsubscribed member moved across a page boundary while the audience was being read.
+            for members in read_pages(transport, url):
+                yield [m for m in members if m['email_address'] != 'unsubscribed@example.com']
+
+        with mock.patch.object(reconciliation, '_remote_pages', shifted_pages):
+            report = reconciliation.reconcile_mailchimp(self.profile)
+
+        self.assertEqual(report.errors, [])
+        self.assertEqual(sorted(report.samples['subscribed_remote']), ['archived@example.com', 'new@example.com'])
+        self.assertEqual(report.samples['opted_out_in_crm'], ['unsubscribed@example.com'])
+        members = self.server.mailchimp_members
+        self.assertEqual(members['unsubscribed@example.com']['status'], 'unsubscribed')
+        self.assertEqual(members['pending@example.com']['status'], 'pending')
+        self.assertEqual(members['new@example.com']['status'], 'subscribed')
+        self.assertFalse(Client.objects.get(email='unsubscribed@example.com').newsletter_opt_in)
+        self.assertTrue(Client.objects.get(email='pending@example.com').newsletter_opt_in)
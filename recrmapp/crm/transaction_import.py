@@ -0,0 +1,242 @@
+"""
+Bulk transaction import from an Excel workbook.
+Sheets: Transactions (required), Parties, Milestones, Tasks; child rows link to their transaction
+by File Number. Properties and clients are resolved with one lookup query each, and every chunk of
+transactions is written with one bulk_create per model, however many parties/milestones/tasks it has.
+"""
+from django.db import DatabaseError, transaction
+
+from .import_export import (
+    MAX_IMPORT_FILE_SIZE,
+    _admin_choices,
+    _compile_coercer,
+    _compile_header_map,
+    _get_reader_for_sheet,
+    _iter_validated_rows,
+    _normalize_header,
+)
+from .models import Client, Property, Transaction, TransactionMilestone, TransactionParty, TransactionTask
+
+# Transactions written per chunk (one bulk_create each for transactions, parties, milestones, tasks).
+TRANSACTION_IMPORT_CHUNK_SIZE = 200
+
+# Sheet name -> (model, [(field_name, header_label), ...]). 'transaction', 'property' and 'client'
+# hold references (file number, property MLS number/title/address, client email or name) resolved on import.
+TRANSACTION_IMPORT_SHEETS = {
+    'Transactions': (Transaction, [
+        ('file_number', 'File Number'),
+        ('property', 'Property'),
+        ('status', 'Status'),
+        ('representation', 'Representation'),
+        ('commission_percentage', 'Commission %'),
+        ('final_sales_price', 'Final Sales Price'),
+        ('listing_date', 'Listing Date'),
+        ('lockbox_code', 'Lockbox Code'),
+        ('showing_instructions', 'Showing Instructions'),
+    ]),
+    'Parties': (TransactionParty, [
+        ('transaction', 'File Number'),
+        ('role', 'Role'),
+        ('client', 'Client'),
+        ('display_name', 'Name'),
+        ('email', 'Email'),
+        ('phone', 'Phone'),
+    ]),
+    'Milestones': (TransactionMilestone, [
+        ('transaction', 'File Number'),
+        ('kind', 'Kind'),
+        ('label', 'Label'),
+        ('date', 'Date'),
+        ('status', 'Status'),
+        ('is_critical', 'Critical'),
+        ('order', 'Order'),
+    ]),
+    'Tasks': (TransactionTask, [
+        ('transaction', 'File Number'),
+        ('description', 'Description'),
+        ('due_date', 'Due Date'),
+        ('completed', 'Completed'),
+        ('order', 'Order'),
+    ]),
+}
+
+# Per sheet: fields that must be present (label used in the error message).
+TRANSACTION_IMPORT_REQUIRED = {
+    'Transactions': [('file_number', 'File number'), ('property', 'Property')],
+    'Parties': [('transaction', 'File number'), ('role', 'Role')],
+    'Milestones': [('transaction', 'File number'), ('date', 'Date')],
+    'Tasks': [('transaction', 'File number'), ('description', 'Description')],
+}
+
+
+def _key(s):
+    return ' '.join(str(s or '').lower().split())
+
+
+def _check_sheet_required(kwargs, sheet):
+    missing = [label for field_name, label in TRANSACTION_IMPORT_REQUIRED[sheet] if not kwargs.get(field_name)]
+    if missing:
+        return ', '.join(missing) + ' required.'
+    return None
+
+
+def _sorted_errors(errors):
+    """Errors in workbook order: by sheet, then row."""
+    sheet_order = list(TRANSACTION_IMPORT_SHEETS)
+    return sorted(errors, key=lambda err: (sheet_order.index(err['sheet']) if err['sheet'] in sheet_order else -1, err['row']))
+
+
+def _read_sheet(wb, sheet, errors):
+    """Validate one sheet (matched case-insensitively). Returns [(row_num, kwargs)]; invalid rows go to errors."""
+    ws = next((wb[name] for name in wb.sheetnames if _normalize_header(name) == sheet.lower()), None)
+    if ws is None:
+        return []
+    model_class, columns = TRANSACTION_IMPORT_SHEETS[sheet]
+    headers, row_iter = _get_reader_for_sheet(ws)
+    admin_choices = _admin_choices(model_class)
+    plan = [
+        (field_name, header, _compile_coercer(field_name, model_class, admin_choices))
+        for field_name, header in _compile_header_map(headers, columns)
+    ]
+    rows = []
+    for row_num, kwargs, error in _iter_validated_rows(row_iter, plan, sheet, check_required=_check_sheet_required):
+        if error:
+            errors.append({'sheet': sheet, 'row': row_num, 'message': error})
+        else:
+            rows.append((row_num, kwargs))
+    return rows
+
+
+def _property_lookup(user):
+    """One query: map MLS number, title and address (normalized) -> property pk. MLS number wins over title/address."""
+    by_mls, by_title, by_address = {}, {}, {}
+    qs = Property.objects.filter(user=user).order_by().values_list('pk', 'mls_number', 'title', 'address')
+    for pk, mls_number, title, address in qs.iterator():
+        if mls_number:
+            by_mls.setdefault(_key(mls_number), pk)
+        by_title.setdefault(_key(title), pk)
+        by_address.setdefault(_key(address), pk)
+    return {**by_address, **by_title, **by_mls}
+
+
+def _client_lookup(user):
+    """One query: map client email and "first last" (normalized) -> client pk."""
+    lookup = {}
+    qs = Client.objects.filter(user=user).order_by().values_list('pk', 'email', 'first_name', 'last_name')
+    for pk, email, first_name, last_name in qs.iterator():
+        lookup.setdefault(_key(f'{first_name} {last_name}'), pk)
+        if email:
+            lookup.setdefault(_key(email), pk)
+    return lookup
+
+
+def import_transactions(uploaded_file, user=None, dry_run=False):
+    """
+    Import transactions with their parties, milestones and tasks from an .xlsx workbook.
+    Transactions reference a Property (MLS number, title or address); party rows may reference a
+    Client (email or "First Last"). File numbers must be new for this user.
+    dry_run: validate and resolve everything without writing.
+    Returns: dict with keys: created ({'transactions', 'parties', 'milestones', 'tasks'} counts; what would be
+    created with dry_run), dry_run (bool), errors (list of {sheet, row, message}).
+    """
+    created = {'transactions': 0, 'parties': 0, 'milestones': 0, 'tasks': 0}
+    if user is None:
+        return {'created': created, 'dry_run': dry_run, 'errors': [{'sheet': '', 'row': 0, 'message': 'User required for import.'}]}
+    if getattr(uploaded_file, 'size', 0) and uploaded_file.size > MAX_IMPORT_FILE_SIZE:
+        message = f'File too large. Maximum size is {MAX_IMPORT_FILE_SIZE // (1024 * 1024)} MB.'
+        return {'created': created, 'dry_run': dry_run, 'errors': [{'sheet': '', 'row': 0, 'message': message}]}
+    try:
+        from openpyxl import load_workbook
+        wb = load_workbook(filename=uploaded_file, read_only=True, data_only=True)
+    except ImportError:
+        return {'created': created, 'dry_run': dry_run, 'errors': [{'sheet': '', 'row': 0, 'message': 'Excel import requires openpyxl.'}]}
+    except Exception as e:
+        return {'created': created, 'dry_run': dry_run, 'errors': [{'sheet': '', 'row': 0, 'message': str(e)}]}
+    if not any(_normalize_header(name) == 'transactions' for name in wb.sheetnames):
+        return {'created': created, 'dry_run': dry_run, 'errors': [{'sheet': '', 'row': 0, 'message': 'Workbook has no "Transactions" sheet.'}]}
+
+    errors = []
+    sheets = {sheet: _read_sheet(wb, sheet, errors) for sheet in TRANSACTION_IMPORT_SHEETS}
+
+    # Resolve references with one query per model.
+    properties = _property_lookup(user)
+    clients = _client_lookup(user)
+    existing = {
+        _key(fn) for fn in Transaction.objects.filter(property__user=user).exclude(file_number='')
+        .values_list('file_number', flat=True).iterator()
+    }
+
+    transactions = {}  # file number key -> (row_num, kwargs), in sheet order
+    for row_num, kwargs in sheets['Transactions']:
+        fn = _key(kwargs['file_number'])
+        property_ref = kwargs.pop('property')
+        if fn in existing:
+            errors.append({'sheet': 'Transactions', 'row': row_num, 'message': f'File number "{kwargs["file_number"]}" already exists.'})
+        elif fn in transactions:
+            errors.append({'sheet': 'Transactions', 'row': row_num, 'message': f'Duplicate file number "{kwargs["file_number"]}".'})
+        elif _key(property_ref) not in properties:
+            errors.append({'sheet': 'Transactions', 'row': row_num, 'message': f'Property "{property_ref}" not found.'})
+        else:
+            kwargs['property_id'] = properties[_key(property_ref)]
+            transactions[fn] = (row_num, kwargs)
+
+    children = {fn: {'Parties': [], 'Milestones': [], 'Tasks': []} for fn in transactions}
+    for sheet in ('Parties', 'Milestones', 'Tasks'):
+        for row_num, kwargs in sheets[sheet]:
+            file_number = kwargs.pop('transaction')
+            fn = _key(file_number)
+            if fn not in transactions:
+                errors.append({'sheet': sheet, 'row': row_num, 'message': f'No imported transaction with file number "{file_number}".'})
+                continue
+            client_ref = kwargs.pop('client', None)
+            if client_ref:
+                if _key(client_ref) not in clients:
+                    errors.append({'sheet': sheet, 'row': row_num, 'message': f'Client "{client_ref}" not found.'})
+                    continue
+                kwargs['client_id'] = clients[_key(client_ref)]
+            children[fn][sheet].append(kwargs)
+
+    fns = list(transactions)
+    if dry_run:
+        created['transactions'] = len(fns)
+        created['parties'] = sum(len(c['Parties']) for c in children.values())
+        created['milestones'] = sum(len(c['Milestones']) for c in children.values())
+        created['tasks'] = sum(len(c['Tasks']) for c in children.values())
+        return {'created': created, 'dry_run': True, 'errors': _sorted_errors(errors)}
+    for start in range(0, len(fns), TRANSACTION_IMPORT_CHUNK_SIZE):
+        chunk = fns[start:start + TRANSACTION_IMPORT_CHUNK_SIZE]
+        try:
+            with transaction.atomic():
+                objs = Transaction.objects.bulk_create([Transaction(**transactions[fn][1]) for fn in chunk])
+                if any(obj.pk is None for obj in objs):  # backend cannot return ids from bulk inserts
+                    pks = dict(
+                        Transaction.objects.filter(property__user=user, file_number__in=[o.file_number for o in objs])
+                        .values_list('file_number', 'pk')
+                    )
+                    for obj in objs:
+                        obj.pk = pks[obj.file_number]
+                parties = [
+                    TransactionParty(transaction=obj, **kwargs)
+                    for fn, obj in zip(chunk, objs) for kwargs in children[fn]['Parties']
+                ]
+                milestones = [
+                    TransactionMilestone(transaction=obj, **kwargs)
+                    for fn, obj in zip(chunk, objs) for kwargs in children[fn]['Milestones']
+                ]
+                tasks = [
+                    TransactionTask(transaction=obj, **kwargs)
+                    for fn, obj in zip(chunk, objs) for kwargs in children[fn]['Tasks']
+                ]
+                TransactionParty.objects.bulk_create(parties)
+                TransactionMilestone.objects.bulk_create(milestones)
+                TransactionTask.objects.bulk_create(tasks)
+        except DatabaseError as e:
+            for fn in chunk:
+                errors.append({'sheet': 'Transactions', 'row': transactions[fn][0], 'message': str(e)})
+            continue
+        created['transactions'] += len(objs)
+        created['parties'] += len(parties)
+        created['milestones'] += len(milestones)
+        created['tasks'] += len(tasks)
+
+    return {'created': created, 'dry_run': False, 'errors': _sorted_errors(errors)}
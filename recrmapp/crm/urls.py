@@ -9,11 +9,16 @@ urlpatterns = [
     path('profile/', views.profile_edit, name='profile'),
     path('profile/sync/', views.email_marketing_sync, name='email_marketing_sync'),
     path('profile/sync/preview/', views.email_marketing_sync_preview, name='email_marketing_sync_preview'),
+    path('profile/sync/jobs/<int:pk>/', views.sync_job_detail, name='sync_job_detail'),
+    path('profile/sync/jobs/<int:pk>/progress/', views.sync_job_progress, name='sync_job_progress'),
+    path('profile/sync/jobs/<int:pk>/resume/', views.sync_job_resume, name='sync_job_resume'),
+    path('import/<str:model_key>/errors/', views.import_errors_download, name='import_errors_download'),
     # Clients
     path('clients/', views.ClientListView.as_view(), name='client_list'),
     path('clients/export/', views.export_clients, name='client_export'),
     path('clients/import/', views.import_clients, name='client_import'),
     path('clients/bulk-delete/', views.bulk_delete_clients, name='client_bulk_delete'),
+    path('clients/bulk-email/', views.bulk_email_clients, name='client_bulk_email'),
     path('clients/add/', views.ClientCreateView.as_view(), name='client_add'),
     path('clients/<int:pk>/', views.ClientDetailView.as_view(), name='client_detail'),
     path('clients/<int:pk>/edit/', views.ClientUpdateView.as_view(), name='client_edit'),
@@ -25,6 +30,7 @@ urlpatterns = [
     path('contacts/export/', views.export_contacts, name='contact_export'),
     path('contacts/import/', views.import_contacts, name='contact_import'),
     path('contacts/bulk-delete/', views.bulk_delete_contacts, name='contact_bulk_delete'),
+    path('contacts/bulk-email/', views.bulk_email_contacts, name='contact_bulk_email'),
     path('contacts/add/', views.ContactCreateView.as_view(), name='contact_add'),
     path('contacts/<int:pk>/', views.ContactDetailView.as_view(), name='contact_detail'),
     path('contacts/<int:pk>/edit/', views.ContactUpdateView.as_view(), name='contact_edit'),
@@ -48,6 +54,7 @@ urlpatterns = [
     path('leads/export/', views.export_leads, name='lead_export'),
     path('leads/import/', views.import_leads, name='lead_import'),
     path('leads/bulk-delete/', views.bulk_delete_leads, name='lead_bulk_delete'),
+    path('leads/bulk-email/', views.bulk_email_leads, name='lead_bulk_email'),
     path('leads/add/', views.LeadCreateView.as_view(), name='lead_add'),
     path('leads/<int:pk>/', views.LeadDetailView.as_view(), name='lead_detail'),
     path('leads/<int:pk>/edit/', views.LeadUpdateView.as_view(), name='lead_edit'),
@@ -57,12 +64,26 @@ urlpatterns = [
     path('leads/<int:pk>/convert/', views.lead_convert_to_client, name='lead_convert'),
     # Transactions
     path('transactions/', views.TransactionListView.as_view(), name='transaction_list'),
+    path('exports/', views.export_job_list, name='export_job_list'),
+    path('exports/<int:pk>/download/', views.export_job_download, name='export_job_download'),
+    path('email-templates/', views.EmailTemplateListView.as_view(), name='email_template_list'),
+    path('email-templates/new/', views.EmailTemplateCreateView.as_view(), name='email_template_create'),
+    path('email-templates/<int:pk>/edit/', views.EmailTemplateUpdateView.as_view(), name='email_template_edit'),
+    path('email-templates/<int:pk>/delete/', views.EmailTemplateDeleteView.as_view(), name='email_template_delete'),
+    path('email-templates/<int:pk>/send/', views.email_template_send, name='email_template_send'),
+    path('outbox/', views.outbox_list, name='outbox_list'),
+    path('outbox/<int:pk>/retry/', views.outbox_retry, name='outbox_retry'),
+    path('transactions/export/', views.export_transactions, name='transaction_export'),
+    path('transactions/import/', views.import_transactions_view, name='transaction_import'),
     path('transactions/add/', views.TransactionCreateView.as_view(), name='transaction_add'),
     path('transactions/<int:pk>/', views.TransactionDetailView.as_view(), name='transaction_detail'),
     path('transactions/<int:pk>/edit/', views.TransactionUpdateView.as_view(), name='transaction_edit'),
     path('transactions/<int:pk>/delete/', views.TransactionDeleteView.as_view(), name='transaction_delete'),
     path('transactions/<int:pk>/notes/add/', views.transaction_add_note, name='transaction_add_note'),
     path('transactions/<int:pk>/send-email/', views.send_email_to_transaction, name='transaction_send_email'),
+    path('transactions/<int:pk>/documents/upload/', views.transaction_document_upload, name='transaction_document_upload'),
+    path('transactions/<int:pk>/documents/<int:doc_pk>/download/', views.transaction_document_download, name='transaction_document_download'),
+    path('transactions/<int:pk>/documents/<int:doc_pk>/delete/', views.transaction_document_delete, name='transaction_document_delete'),
     path('transactions/<int:pk>/parties/add/', views.transaction_add_party, name='transaction_add_party'),
     path('transactions/<int:pk>/parties/<int:party_pk>/delete/', views.transaction_delete_party, name='transaction_delete_party'),
     path('transactions/<int:pk>/milestones/add/', views.transaction_add_milestone, name='transaction_add_milestone'),
@@ -1,7 +1,4 @@
-import base64
-import html
 import json
-import mimetypes
 import os
 from datetime import date
 from decimal import Decimal
@@ -10,132 +7,92 @@ from django.conf import settings
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Count, Q, Sum
+from django.db.models import Count, Sum
 from django.db.models.functions import TruncMonth
 from django.utils import timezone
 from django.contrib import messages
-from django.core.mail import EmailMessage, EmailMultiAlternatives, send_mail
+from django.core.mail import send_mail
+from django.http import FileResponse, Http404
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView
 from django.urls import reverse, reverse_lazy
 from .models import (
-    AppSettings, ChoiceList, UserProfile,
+    AppSettings, ChoiceList, EmailTemplate, ExportJob, OutboundEmail, UserProfile,
     Client, Contact, Lead, Property, PropertyPhoto,
-    Transaction, TransactionNote, TransactionParty, TransactionMilestone, TransactionTask,
+    Transaction, TransactionDocument, TransactionNote, TransactionParty, TransactionMilestone, TransactionTask,
 )
+from .change_feed import recording_deletions
 from .choice_utils import get_choices_for_list
 from .forms import (
     ClientForm, ClientNoteForm, ContactForm, ContactNoteForm,
     LeadForm, LeadNoteForm, PropertyForm, PropertyNoteForm,
-    SendEmailForm, SendTransactionEmailForm,
+    EmailTemplateForm, EmailTemplateSendForm, SendEmailForm, SendTransactionEmailForm,
     TransactionForm, TransactionNoteForm, TransactionPartyForm, TransactionMilestoneForm, TransactionTaskForm,
-    UserProfileForm, ImportForm,
+    UserProfileForm, ImportForm, TransactionImportForm,
 )
 from .import_export import (
     EXPORT_COLUMNS,
+    EXPORT_FORMATS,
+    MAX_IMPORT_ERROR_REPORT_ROWS,
     MAX_IMPORT_FILE_SIZE,
+    export_columns,
     export_queryset_csv,
+    export_queryset_parquet,
     export_queryset_xlsx,
+    import_errors_csv,
     import_records,
+    save_import_error_report,
+)
+from .documents import add_transaction_document, delete_transaction_document, document_in_use
+from .mail_merge import queue_template_emails, segment_queryset
+from .export_jobs import EXPORT_INLINE_MAX_ROWS, export_queryset, request_export_job
+from .outbox import (
+    OUTBOX_SEND_IN_REQUEST_LIMIT, limit_attachment_uploads, queue_bulk_email, queue_email, retry_outbound_email,
+    send_now, validate_attachments,
+)
+from .list_filters import (
+    filter_clients, filter_contacts, filter_leads, filter_properties, filter_transactions, list_filter_params,
 )
 
 MONTH_NAMES = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
 
-# Email attachments: allowed extensions and size limits
-ALLOWED_ATTACHMENT_EXTENSIONS = {'.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp', '.tiff', '.tif'}
-MAX_ATTACHMENT_SIZE = 10 * 1024 * 1024   # 10 MB per file
-MAX_ATTACHMENTS_TOTAL = 25 * 1024 * 1024  # 25 MB total
-
 # Property photos: images only (prevent executable uploads)
 ALLOWED_PROPERTY_PHOTO_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tiff', '.tif'}
 MAX_PROPERTY_PHOTO_SIZE = 10 * 1024 * 1024  # 10 MB per image
 
-
-def _get_email_signature_html_and_image(user):
-    """Build HTML for the email signature from the user's profile (optional image as base64).
-    Returns (html_string, image_data) where image_data is (bytes, content_type) or None."""
-    if not user or not getattr(user, 'is_authenticated', False):
-        return '', None
-    parts = []
-    image_data = None
-    try:
-        profile = getattr(user, 'profile', None)
-    except UserProfile.DoesNotExist:
-        profile = None
-    if not profile:
-        return '', None
-    if profile.email_signature and profile.email_signature.strip():
-        parts.append(profile.email_signature.strip())
-    if profile.signature_image:
-        try:
-            profile.signature_image.open('rb')
-            try:
-                raw = profile.signature_image.read()
-                content_type = (
-                    mimetypes.guess_type(profile.signature_image.name)[0]
-                    or 'image/png'
-                )
-                image_data = (raw, content_type)
-                b64 = base64.b64encode(raw).decode('ascii')
-                data_url = f'data:{content_type};base64,{b64}'
-                parts.append(
-                    f'<p><img src="{html.escape(data_url)}" alt="Signature" style="max-width:100%; height:auto;"></p>'
-                )
-            finally:
-                profile.signature_image.close()
-        except (ValueError, AttributeError, OSError):
-            pass
-    if not parts:
-        return '', None
-    html_block = '<div class="email-signature" style="margin-top:1.5em; padding-top:1em; border-top:1px solid #eee;">' + ''.join(parts) + '</div>'
-    return html_block, image_data
-
-
-def _send_email_with_attachments(to_list, subject, body, request):
-    """Build and send an EmailMessage with optional attachments. Appends the sending user's profile signature if set.
-    Signature image is embedded as base64 in the HTML so it displays with Resend and other API backends."""
-    user = request.user if request and getattr(request, 'user', None) else None
-    signature_html, signature_image_data = _get_email_signature_html_and_image(user)
-    body_plain = body
-    body_html = '<p>' + html.escape(body).replace('\n', '</p><p>') + '</p>' + signature_html if signature_html else None
-
-    files = list(request.FILES.getlist('attachments')) if request else []
-    total_size = 0
-    for f in files:
-        if f and getattr(f, 'name', None):
-            total_size += getattr(f, 'size', 0)
-    if total_size > MAX_ATTACHMENTS_TOTAL:
-        raise ValueError(f'Total attachments too large (max {MAX_ATTACHMENTS_TOTAL // (1024*1024)} MB).')
-    for f in files:
-        if not f or not getattr(f, 'name', None):
-            continue
-        if getattr(f, 'size', 0) > MAX_ATTACHMENT_SIZE:
-            raise ValueError(f'File "{f.name}" is too large (max {MAX_ATTACHMENT_SIZE // (1024*1024)} MB per file).')
-        ext = os.path.splitext(f.name)[1].lower()
-        if ext not in ALLOWED_ATTACHMENT_EXTENSIONS:
-            raise ValueError(f'File type "{ext}" not allowed. Use PDF or images (e.g. .pdf, .jpg, .png).')
-
-    if body_html:
-        message = EmailMultiAlternatives(
-            subject=subject,
-            body=body_plain,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=to_list,
-        )
-        message.attach_alternative(body_html, 'text/html')
+def _queue_email_with_attachments(to_list, subject, body, request, transaction=None, documents=()):
+    """Queue an email (with the request's attachments) in the outbox; it is sent by the process_outbox worker,
+    or right away when settings.EMAIL_SEND_IN_REQUEST is on. Returns the OutboundEmail; raises ValueError.
+    Attachments are not read here: uploads were checked while parsed (limit_attachment_uploads) and are
+    copied to storage in chunks (or moved, when Django spooled them to a temporary file).
+    With a transaction, uploads go into its document library and everything is attached by reference."""
+    upload_error = getattr(request, 'attachment_upload_error', None)
+    if upload_error:
+        raise ValueError(upload_error)
+    files = request.FILES.getlist('attachments')
+    if transaction is not None:
+        documents = list(documents)
+        for f in validate_attachments(files):
+            document, _ = add_transaction_document(transaction, f)
+            if document not in documents:
+                documents.append(document)
+        files = []
+    outbound = queue_email(request.user, to_list, subject, body, files, documents=documents)
+    if getattr(settings, 'EMAIL_SEND_IN_REQUEST', False):
+        outbound = (send_now([outbound]) or [outbound])[0]
+    return outbound
+
+
+def _email_queued_message(request, outbound, recipients):
+    """Flash the outcome of _queue_email_with_attachments for the detail page."""
+    if outbound.status == OutboundEmail.STATUS_SENT:
+        messages.success(request, f'Email sent to {recipients}.')
+    elif outbound.status == OutboundEmail.STATUS_PENDING and outbound.attempts:
+        messages.warning(request, f'Email to {recipients} could not be sent yet; it will be retried (see Outbox).')
+    elif outbound.status == OutboundEmail.STATUS_FAILED:
+        messages.error(request, f'Email to {recipients} failed: {outbound.last_error}')
     else:
-        message = EmailMessage(
-            subject=subject,
-            body=body_plain,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=to_list,
-        )
-    for f in files:
-        if not f or not getattr(f, 'name', None):
-            continue
-        f.seek(0)
-        message.attach(f.name, f.read(), f.content_type or 'application/octet-stream')
-    message.send(fail_silently=False)
+        messages.success(request, f'Email to {recipients} queued for sending.')
 
 
 def _parse_chart_filter(get_params, prefix):
@@ -473,8 +430,9 @@ def contact_add_note(request, pk):
 
 
 @login_required
+@limit_attachment_uploads
 def send_email_to_contact(request, pk):
-    """Send an email to the contact's email address (with optional attachments). Redirects back to contact detail."""
+    """Queue an email to the contact's email address (with optional attachments). Redirects back to contact detail."""
     contact = get_object_or_404(Contact, pk=pk, user=request.user)
     if not contact.email or not contact.email.strip():
         messages.warning(request, 'This contact has no email address.')
@@ -484,13 +442,15 @@ def send_email_to_contact(request, pk):
     form = SendEmailForm(request.POST)
     if form.is_valid():
         try:
-            _send_email_with_attachments(
+            outbound = _queue_email_with_attachments(
                 [contact.email.strip()],
                 form.cleaned_data['subject'],
                 form.cleaned_data['body'],
                 request,
             )
-            messages.success(request, f'Email sent to {contact.email}.')
+            _email_queued_message(request, outbound, contact.email)
+        except ValueError as e:
+            messages.error(request, str(e))
         except Exception as e:
             if settings.DEBUG:
                 messages.error(request, str(e))
@@ -500,8 +460,9 @@ def send_email_to_contact(request, pk):
 
 
 @login_required
+@limit_attachment_uploads
 def send_email_to_client(request, pk):
-    """Send an email to the client's email address (with optional attachments). Redirects back to client detail."""
+    """Queue an email to the client's email address (with optional attachments). Redirects back to client detail."""
     client = get_object_or_404(Client, pk=pk, user=request.user)
     if not client.email or not client.email.strip():
         messages.warning(request, 'This client has no email address.')
@@ -511,13 +472,15 @@ def send_email_to_client(request, pk):
     form = SendEmailForm(request.POST)
     if form.is_valid():
         try:
-            _send_email_with_attachments(
+            outbound = _queue_email_with_attachments(
                 [client.email.strip()],
                 form.cleaned_data['subject'],
                 form.cleaned_data['body'],
                 request,
             )
-            messages.success(request, f'Email sent to {client.email}.')
+            _email_queued_message(request, outbound, client.email)
+        except ValueError as e:
+            messages.error(request, str(e))
         except Exception as e:
             if settings.DEBUG:
                 messages.error(request, str(e))
@@ -527,8 +490,9 @@ def send_email_to_client(request, pk):
 
 
 @login_required
+@limit_attachment_uploads
 def send_email_to_lead(request, pk):
-    """Send an email to the lead's email address (with optional attachments). Redirects back to lead detail."""
+    """Queue an email to the lead's email address (with optional attachments). Redirects back to lead detail."""
     lead = get_object_or_404(Lead, pk=pk, user=request.user)
     if not lead.email or not lead.email.strip():
         messages.warning(request, 'This lead has no email address.')
@@ -538,13 +502,15 @@ def send_email_to_lead(request, pk):
     form = SendEmailForm(request.POST)
     if form.is_valid():
         try:
-            _send_email_with_attachments(
+            outbound = _queue_email_with_attachments(
                 [lead.email.strip()],
                 form.cleaned_data['subject'],
                 form.cleaned_data['body'],
                 request,
             )
-            messages.success(request, f'Email sent to {lead.email}.')
+            _email_queued_message(request, outbound, lead.email)
+        except ValueError as e:
+            messages.error(request, str(e))
         except Exception as e:
             if settings.DEBUG:
                 messages.error(request, str(e))
@@ -590,21 +556,7 @@ class ClientListView(LoginRequiredMixin, ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        qs = super().get_queryset().filter(user=self.request.user)
-        q = self.request.GET.get('q', '').strip()
-        if q:
-            qs = qs.filter(
-                Q(first_name__icontains=q) | Q(last_name__icontains=q)
-                | Q(email__icontains=q) | Q(phone__icontains=q)
-                | Q(city__icontains=q) | Q(address__icontains=q)
-            )
-        client_type = self.request.GET.get('client_type', '')
-        if client_type:
-            qs = qs.filter(client_type=client_type)
-        status = self.request.GET.get('status', '')
-        if status:
-            qs = qs.filter(status=status)
-        return qs
+        return filter_clients(super().get_queryset().filter(user=self.request.user), self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -670,18 +622,7 @@ class ContactListView(LoginRequiredMixin, ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        qs = super().get_queryset().filter(user=self.request.user)
-        q = self.request.GET.get('q', '').strip()
-        if q:
-            qs = qs.filter(
-                Q(first_name__icontains=q) | Q(last_name__icontains=q)
-                | Q(email__icontains=q) | Q(phone__icontains=q)
-                | Q(company__icontains=q) | Q(city__icontains=q)
-            )
-        contact_type = self.request.GET.get('contact_type', '')
-        if contact_type:
-            qs = qs.filter(contact_type=contact_type)
-        return qs
+        return filter_contacts(super().get_queryset().filter(user=self.request.user), self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -745,21 +686,7 @@ class PropertyListView(LoginRequiredMixin, ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        qs = super().get_queryset().filter(user=self.request.user)
-        q = self.request.GET.get('q', '').strip()
-        if q:
-            qs = qs.filter(
-                Q(title__icontains=q) | Q(address__icontains=q)
-                | Q(city__icontains=q) | Q(state__icontains=q)
-                | Q(zip_code__icontains=q) | Q(mls_number__icontains=q)
-            )
-        property_type = self.request.GET.get('property_type', '')
-        if property_type:
-            qs = qs.filter(property_type=property_type)
-        status = self.request.GET.get('status', '')
-        if status:
-            qs = qs.filter(status=status)
-        return qs
+        return filter_properties(super().get_queryset().filter(user=self.request.user), self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -842,23 +769,7 @@ class LeadListView(LoginRequiredMixin, ListView):
     paginate_by = 20
 
     def get_queryset(self):
-        qs = super().get_queryset().filter(user=self.request.user)
-        if not self.request.GET.get('show_all'):
-            qs = qs.filter(converted_to_client__isnull=True)
-        q = self.request.GET.get('q', '').strip()
-        if q:
-            qs = qs.filter(
-                Q(first_name__icontains=q) | Q(last_name__icontains=q)
-                | Q(email__icontains=q) | Q(phone__icontains=q)
-                | Q(city__icontains=q)
-            )
-        status = self.request.GET.get('status', '')
-        if status:
-            qs = qs.filter(status=status)
-        referral = self.request.GET.get('referral', '')
-        if referral:
-            qs = qs.filter(referral=referral)
-        return qs
+        return filter_leads(super().get_queryset().filter(user=self.request.user), self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -929,22 +840,7 @@ class TransactionListView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         qs = super().get_queryset().filter(property__user=self.request.user).select_related('property')
-        q = self.request.GET.get('q', '').strip()
-        if q:
-            qs = qs.filter(
-                Q(file_number__icontains=q)
-                | Q(property__title__icontains=q)
-                | Q(property__address__icontains=q)
-                | Q(property__city__icontains=q)
-                | Q(property__mls_number__icontains=q)
-            )
-        status = self.request.GET.get('status', '')
-        if status:
-            qs = qs.filter(status=status)
-        representation = self.request.GET.get('representation', '')
-        if representation:
-            qs = qs.filter(representation=representation)
-        return qs
+        return filter_transactions(qs, self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -974,6 +870,7 @@ class TransactionDetailView(LoginRequiredMixin, DetailView):
         context['milestone_form'] = TransactionMilestoneForm()
         context['task_form'] = TransactionTaskForm()
         context['transaction_email_form'] = SendTransactionEmailForm(transaction=context['transaction'])
+        context['transaction_documents'] = context['transaction'].documents.all()
         return context
 
 
@@ -1041,8 +938,9 @@ def transaction_add_note(request, pk):
 
 
 @login_required
+@limit_attachment_uploads
 def send_email_to_transaction(request, pk):
-    """Send an email to one or more transaction parties and/or additional addresses (with optional attachments)."""
+    """Queue an email to one or more transaction parties and/or additional addresses (with optional attachments)."""
     transaction = get_object_or_404(Transaction, pk=pk, property__user=request.user)
     if request.method != 'POST':
         return redirect('crm:transaction_detail', pk=pk)
@@ -1050,16 +948,20 @@ def send_email_to_transaction(request, pk):
     if form.is_valid():
         to_emails = form.cleaned_data['to_emails']
         try:
-            _send_email_with_attachments(
+            outbound = _queue_email_with_attachments(
                 to_emails,
                 form.cleaned_data['subject'],
                 form.cleaned_data['body'],
                 request,
+                transaction=transaction,
+                documents=form.cleaned_data['documents'],
             )
             if len(to_emails) == 1:
-                messages.success(request, f'Email sent to {to_emails[0]}.')
+                _email_queued_message(request, outbound, to_emails[0])
             else:
-                messages.success(request, f'Email sent to {len(to_emails)} recipients: {", ".join(to_emails)}.')
+                _email_queued_message(request, outbound, f'{len(to_emails)} recipients: {", ".join(to_emails)}')
+        except ValueError as e:
+            messages.error(request, str(e))
         except Exception as e:
             if settings.DEBUG:
                 messages.error(request, str(e))
@@ -1072,6 +974,59 @@ def send_email_to_transaction(request, pk):
     return redirect('crm:transaction_detail', pk=pk)
 
 
+@login_required
+@limit_attachment_uploads
+def transaction_document_upload(request, pk):
+    """Add uploaded files to a transaction's document library (POST only). Identical files are stored once."""
+    transaction = get_object_or_404(Transaction, pk=pk, property__user=request.user)
+    if request.method != 'POST':
+        return redirect('crm:transaction_detail', pk=pk)
+    upload_error = getattr(request, 'attachment_upload_error', None)
+    try:
+        if upload_error:
+            raise ValueError(upload_error)
+        files = validate_attachments(request.FILES.getlist('documents'))
+        if not files:
+            raise ValueError('Choose one or more files to upload.')
+        added = sum(1 for f in files if add_transaction_document(transaction, f)[1])
+    except ValueError as e:
+        messages.error(request, str(e))
+    else:
+        skipped = len(files) - added
+        message = f'Added {added} document{"s" if added != 1 else ""}.'
+        if skipped:
+            message += f' {skipped} already in the library.'
+        messages.success(request, message)
+    return redirect(reverse('crm:transaction_detail', kwargs={'pk': pk}) + '#documents')
+
+
+@login_required
+def transaction_document_download(request, pk, doc_pk):
+    """Download a document from a transaction's library."""
+    transaction = get_object_or_404(Transaction, pk=pk, property__user=request.user)
+    document = get_object_or_404(TransactionDocument, pk=doc_pk, transaction=transaction)
+    try:
+        f = document.file.open('rb')
+    except FileNotFoundError:
+        raise Http404('Document file is missing.')
+    return FileResponse(f, as_attachment=True, filename=document.filename, content_type=document.content_type)
+
+
+@login_required
+def transaction_document_delete(request, pk, doc_pk):
+    """Remove a document from a transaction's library (POST only). Refused while a queued email attaches it."""
+    if request.method != 'POST':
+        return redirect('crm:transaction_detail', pk=pk)
+    transaction = get_object_or_404(Transaction, pk=pk, property__user=request.user)
+    document = get_object_or_404(TransactionDocument, pk=doc_pk, transaction=transaction)
+    if document_in_use(document):
+        messages.error(request, f'"{document.filename}" is attached to an email waiting to be sent (see Outbox).')
+    else:
+        delete_transaction_document(document)
+        messages.success(request, f'Removed "{document.filename}".')
+    return redirect(reverse('crm:transaction_detail', kwargs={'pk': pk}) + '#documents')
+
+
 @login_required
 def transaction_add_party(request, pk):
     """Add a party to a transaction. Redirects back to transaction detail."""
@@ -1158,48 +1113,201 @@ def transaction_delete_task(request, pk, task_pk):
 
 # --- Import/Export (CSV, Excel) ---
 
-def _export_response(request, model_key, queryset, list_url_name):
-    """Return export file or redirect if not GET with format."""
+def _export_response(request, model_key, list_url_name):
+    """Return export file of the rows the list currently shows, queue a background export, or redirect if not GET with format."""
     if request.method != 'GET':
         return redirect(list_url_name)
     fmt = (request.GET.get('format') or '').lower()
-    if fmt not in ('csv', 'xlsx'):
+    if fmt not in EXPORT_FORMATS:
         return redirect(list_url_name)
-    columns = EXPORT_COLUMNS.get(model_key, [])
+    columns = export_columns(model_key)
     if not columns:
         return redirect(list_url_name)
+    filters = list_filter_params(model_key, request.GET)
+    queryset = export_queryset(model_key, request.user, filters)
+    # Large exports (or on request) are written by the process_export_jobs worker, not inside the request.
+    if request.GET.get('background') or queryset[:EXPORT_INLINE_MAX_ROWS + 1].count() > EXPORT_INLINE_MAX_ROWS:
+        job, reused = request_export_job(request.user, model_key, fmt, filters)
+        if not reused:
+            messages.success(request, 'Export queued. It will be listed here for download when ready.')
+        elif job.status == ExportJob.STATUS_DONE:
+            messages.info(request, 'Nothing has changed since your last export; download it below.')
+        else:
+            messages.info(request, 'This export is already queued.')
+        return redirect('crm:export_job_list')
     filename = f'{model_key}s'
     if fmt == 'csv':
         return export_queryset_csv(queryset, columns, filename)
+    if fmt == 'parquet':
+        return export_queryset_parquet(queryset, columns, filename)
     return export_queryset_xlsx(queryset, columns, filename)
 
 
 @login_required
 def export_leads(request):
-    queryset = Lead.objects.filter(user=request.user).order_by('last_name', 'first_name')
-    return _export_response(request, 'lead', queryset, 'crm:lead_list')
+    return _export_response(request, 'lead', 'crm:lead_list')
 
 
 @login_required
 def export_clients(request):
-    queryset = Client.objects.filter(user=request.user).order_by('last_name', 'first_name')
-    return _export_response(request, 'client', queryset, 'crm:client_list')
+    return _export_response(request, 'client', 'crm:client_list')
 
 
 @login_required
 def export_contacts(request):
-    queryset = Contact.objects.filter(user=request.user).order_by('last_name', 'first_name')
-    return _export_response(request, 'contact', queryset, 'crm:contact_list')
+    return _export_response(request, 'contact', 'crm:contact_list')
 
 
 @login_required
 def export_properties(request):
-    queryset = Property.objects.filter(user=request.user).order_by('-created_at')
-    return _export_response(request, 'property', queryset, 'crm:property_list')
+    return _export_response(request, 'property', 'crm:property_list')
+
+
+@login_required
+def export_transactions(request):
+    return _export_response(request, 'transaction', 'crm:transaction_list')
+
+
+@login_required
+def export_job_list(request):
+    """The user's background exports, newest first, with download links."""
+    jobs = ExportJob.objects.filter(user=request.user)[:50]
+    return render(request, 'crm/export_job_list.html', {'jobs': jobs})
+
+
+@login_required
+def export_job_download(request, pk):
+    """Stream a finished export from default storage (owner only)."""
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user, status=ExportJob.STATUS_DONE)
+    if not job.file:
+        raise Http404
+    try:
+        f = job.file.open('rb')
+    except (FileNotFoundError, OSError):
+        raise Http404
+    return FileResponse(f, as_attachment=True, filename=job.filename)
+
+
+@login_required
+def outbox_list(request):
+    """The user's recent emails with delivery status; failed ones can be retried."""
+    emails = OutboundEmail.objects.filter(user=request.user).prefetch_related('attachments')[:100]
+    return render(request, 'crm/outbox_list.html', {'emails': emails})
+
+
+@login_required
+def outbox_retry(request, pk):
+    """POST: queue a failed email again."""
+    if request.method != 'POST':
+        return redirect('crm:outbox_list')
+    outbound = get_object_or_404(OutboundEmail, pk=pk, user=request.user, status=OutboundEmail.STATUS_FAILED)
+    retry_outbound_email(outbound)
+    messages.success(request, f'Email "{outbound.subject}" queued again.')
+    return redirect('crm:outbox_list')
+
+
+# --- Email templates (mail merge) ---
+
+class EmailTemplateListView(LoginRequiredMixin, ListView):
+    model = EmailTemplate
+    context_object_name = 'templates'
+    template_name = 'crm/email_template_list.html'
+
+    def get_queryset(self):
+        return EmailTemplate.objects.filter(user=self.request.user)
+
+
+class EmailTemplateCreateView(LoginRequiredMixin, CreateView):
+    model = EmailTemplate
+    form_class = EmailTemplateForm
+    template_name = 'crm/email_template_form.html'
+    success_url = reverse_lazy('crm:email_template_list')
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+    def form_valid(self, form):
+        form.instance.user = self.request.user
+        return super().form_valid(form)
+
+
+class EmailTemplateUpdateView(LoginRequiredMixin, UpdateView):
+    model = EmailTemplate
+    form_class = EmailTemplateForm
+    context_object_name = 'email_template'
+    template_name = 'crm/email_template_form.html'
+    success_url = reverse_lazy('crm:email_template_list')
+
+    def get_queryset(self):
+        return EmailTemplate.objects.filter(user=self.request.user)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
+
+class EmailTemplateDeleteView(LoginRequiredMixin, DeleteView):
+    model = EmailTemplate
+    context_object_name = 'email_template'
+    template_name = 'crm/email_template_confirm_delete.html'
+    success_url = reverse_lazy('crm:email_template_list')
+
+    def get_queryset(self):
+        return EmailTemplate.objects.filter(user=self.request.user)
+
+
+@login_required
+def email_template_send(request, pk):
+    """
+    GET (optionally with segment params): choose a segment and see how many it reaches. POST: queue one
+    personalized email per recipient (compiled once, rendered and inserted in batches; see mail_merge).
+    """
+    template = get_object_or_404(EmailTemplate, pk=pk, user=request.user)
+    form = EmailTemplateSendForm(request.POST if request.method == 'POST' else (request.GET or None))
+    recipient_count = None
+    if form.is_bound and form.is_valid():
+        recipients = segment_queryset(request.user, form.cleaned_data['segment'], form.segment_value)
+        if request.method == 'POST':
+            ids = queue_template_emails(request.user, template, recipients)
+            sent = 0
+            if ids and getattr(settings, 'EMAIL_SEND_IN_REQUEST', False):
+                # Only the first batch goes out in the request; process_outbox delivers the rest.
+                emails = OutboundEmail.objects.filter(pk__in=ids[:OUTBOX_SEND_IN_REQUEST_LIMIT]).order_by('pk')
+                sent = sum(1 for e in send_now(list(emails)) if e.status == OutboundEmail.STATUS_SENT)
+            if not ids:
+                messages.warning(request, 'No recipients with an email address in that segment.')
+            elif sent:
+                messages.success(request, f'{sent} of {len(ids)} emails sent; any others are queued (see Outbox).')
+            else:
+                messages.success(request, f'{len(ids)} email{"s" if len(ids) != 1 else ""} queued for sending (see Outbox).')
+            return redirect('crm:email_template_list')
+        recipient_count = recipients.count()
+    return render(request, 'crm/email_template_send.html', {
+        'email_template': template,
+        'form': form,
+        'recipient_count': recipient_count,
+    })
+
+
+def _import_errors_session_key(model_key):
+    return f'import_errors_{model_key}'
+
+
+def _store_import_errors(request, model_key, errors):
+    """Save a preview's per-row error report to storage; the session keeps only its name, for the download."""
+    key = _import_errors_session_key(model_key)
+    request.session[key] = save_import_error_report(
+        [[err['row'], err['message']] for err in errors[:MAX_IMPORT_ERROR_REPORT_ROWS]],
+        request.user,
+        replace=request.session.get(key),
+    )
 
 
 def _import_view(request, model_key, list_url_name, list_label):
-    """Generic import view: GET form, POST run import and show result."""
+    """Generic import view: GET form, POST run import (or a dry-run preview) and show result."""
     if request.method == 'POST':
         form = ImportForm(request.POST, request.FILES)
         if form.is_valid():
@@ -1208,8 +1316,23 @@ def _import_view(request, model_key, list_url_name, list_label):
                 messages.error(request, f'File too large. Maximum size is {MAX_IMPORT_FILE_SIZE // (1024 * 1024)} MB.')
                 return redirect(list_url_name)
             fmt = form.cleaned_data['format_type']
-            result = import_records(uploaded, model_key, fmt, user=request.user)
-            if result['errors'] and result['created'] == 0:
+            update_existing = form.cleaned_data['update_existing']
+            if request.POST.get('action') == 'preview':
+                report = import_records(
+                    uploaded, model_key, fmt, user=request.user, dry_run=True, update_existing=update_existing,
+                )
+                # Keep the full per-row report for the CSV download; the page only lists the first rows.
+                _store_import_errors(request, model_key, report['errors'])
+                return render(request, 'crm/import_form.html', {
+                    'form': ImportForm(initial={'format_type': fmt, 'update_existing': update_existing}),
+                    'model_key': model_key,
+                    'list_label': list_label,
+                    'list_url_name': list_url_name,
+                    'preview': report,
+                    'preview_errors': report['errors'][:50],
+                })
+            result = import_records(uploaded, model_key, fmt, user=request.user, update_existing=update_existing)
+            if result['errors'] and result['created'] == 0 and result['updated'] == 0:
                 for err in result['errors'][:10]:
                     # Show row number and short message; avoid leaking internal details
                     msg = err.get('message', 'Invalid data')
@@ -1221,6 +1344,8 @@ def _import_view(request, model_key, list_url_name, list_label):
             else:
                 if result['created']:
                     messages.success(request, f"Imported {result['created']} {list_label}.")
+                if result['updated']:
+                    messages.success(request, f"Updated {result['updated']} existing {list_label}.")
                 for err in result['errors'][:5]:
                     msg = err.get('message', 'Invalid data')
                     if len(msg) > 200:
@@ -1239,6 +1364,67 @@ def _import_view(request, model_key, list_url_name, list_label):
     })
 
 
+@login_required
+def import_transactions_view(request):
+    """Import transactions with parties, milestones and tasks from a workbook (or preview it without saving)."""
+    from .transaction_import import TRANSACTION_IMPORT_SHEETS, import_transactions
+
+    context = {'sheets': [(sheet, [label for _, label in columns]) for sheet, (_, columns) in TRANSACTION_IMPORT_SHEETS.items()]}
+    if request.method == 'POST':
+        form = TransactionImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            uploaded = request.FILES['file']
+            if uploaded.size > MAX_IMPORT_FILE_SIZE:
+                messages.error(request, f'File too large. Maximum size is {MAX_IMPORT_FILE_SIZE // (1024 * 1024)} MB.')
+                return redirect('crm:transaction_list')
+            dry_run = request.POST.get('action') == 'preview'
+            result = import_transactions(uploaded, user=request.user, dry_run=dry_run)
+            errors = [
+                {'row': f"{err['sheet']} row {err['row']}" if err['sheet'] else err['row'], 'message': err['message']}
+                for err in result['errors']
+            ]
+            if dry_run:
+                _store_import_errors(request, 'transaction', errors)
+                context.update({
+                    'form': TransactionImportForm(),
+                    'preview': result,
+                    'preview_errors': errors[:50],
+                })
+                return render(request, 'crm/transaction_import_form.html', context)
+            created = result['created']
+            if created['transactions']:
+                messages.success(
+                    request,
+                    f"Imported {created['transactions']} transaction(s) with {created['parties']} parties, "
+                    f"{created['milestones']} milestones and {created['tasks']} tasks.",
+                )
+            elif errors:
+                messages.error(request, 'No transactions were imported.')
+            for err in errors[:5]:
+                msg = err['message']
+                if len(msg) > 200:
+                    msg = msg[:197] + '...'
+                messages.warning(request, f"{err['row']}: {msg}")
+            if len(errors) > 5:
+                messages.warning(request, f"... and {len(errors) - 5} more row errors.")
+            return redirect('crm:transaction_list')
+    else:
+        form = TransactionImportForm()
+    context['form'] = form
+    return render(request, 'crm/transaction_import_form.html', context)
+
+
+@login_required
+def import_errors_download(request, model_key):
+    """Download the per-row error report from the last import preview as CSV."""
+    if model_key not in EXPORT_COLUMNS and model_key != 'transaction':
+        raise Http404
+    report_name = request.session.get(_import_errors_session_key(model_key))
+    if not isinstance(report_name, str):
+        report_name = None  # a report stored in the session before it moved to storage
+    return import_errors_csv(report_name, f'{model_key}-import-errors')
+
+
 @login_required
 def import_leads(request):
     return _import_view(request, 'lead', 'crm:lead_list', 'leads')
@@ -1261,23 +1447,29 @@ def import_properties(request):
 
 # --- Bulk delete ---
 
-def _bulk_delete(request, model_class, list_url_name, label_singular, user_filter=None):
-    """POST with ids: delete selected records and redirect to list. user_filter: dict e.g. {'user': request.user} or {'property__user': request.user}."""
-    if request.method != 'POST':
-        return redirect(list_url_name)
-    raw_ids = request.POST.getlist('ids')
+def _selected_ids(request):
+    """Integer ids from the list page's selected checkboxes (POST ids); invalid values are ignored."""
     ids = []
-    for i in raw_ids:
+    for i in request.POST.getlist('ids'):
         try:
             ids.append(int(i))
         except (ValueError, TypeError):
             continue
+    return ids
+
+
+def _bulk_delete(request, model_class, list_url_name, label_singular, user_filter=None):
+    """POST with ids: delete selected records and redirect to list. user_filter: dict e.g. {'user': request.user} or {'property__user': request.user}."""
+    if request.method != 'POST':
+        return redirect(list_url_name)
+    ids = _selected_ids(request)
     if not ids:
         messages.warning(request, 'No items selected.')
         return redirect(list_url_name)
     qs = model_class.objects.filter(pk__in=ids, **user_filter)
     count = qs.count()
-    qs.delete()
+    with recording_deletions():  # one insert for all the change-feed tombstones
+        qs.delete()
     messages.success(request, f'{count} {label_singular}{"s" if count != 1 else ""} deleted.')
     return redirect(list_url_name)
 
@@ -1302,6 +1494,62 @@ def bulk_delete_properties(request):
     return _bulk_delete(request, Property, 'crm:property_list', 'property', user_filter={'user': request.user})
 
 
+def _bulk_email(request, model_class, list_url_name, list_label):
+    """
+    POST with ids from a list page: show the compose form for the selected records; POST with ids + subject/body:
+    queue one personalized email per record that has an address (delivered in batches by the outbox worker).
+    """
+    if request.method != 'POST':
+        return redirect(list_url_name)
+    ids = _selected_ids(request)
+    if not ids:
+        messages.warning(request, 'No items selected.')
+        return redirect(list_url_name)
+    selected = list(
+        model_class.objects.filter(pk__in=ids, user=request.user).only('id', 'first_name', 'last_name', 'email')
+    )
+    recipients = [r for r in selected if r.email and r.email.strip()]
+    skipped = len(selected) - len(recipients)
+    if 'subject' in request.POST:
+        form = SendEmailForm(request.POST)
+        if form.is_valid() and recipients:
+            emails = queue_bulk_email(request.user, recipients, form.cleaned_data['subject'], form.cleaned_data['body'])
+            sent = 0
+            if getattr(settings, 'EMAIL_SEND_IN_REQUEST', False):
+                sent = sum(1 for e in send_now(emails) if e.status == OutboundEmail.STATUS_SENT)
+            if sent:
+                messages.success(request, f'{sent} of {len(emails)} emails sent; any others are queued (see Outbox).')
+            else:
+                messages.success(request, f'{len(emails)} email{"s" if len(emails) != 1 else ""} queued for sending (see Outbox).')
+            if skipped:
+                messages.warning(request, f'{skipped} selected without an email address skipped.')
+            return redirect(list_url_name)
+    else:
+        form = SendEmailForm()
+    return render(request, 'crm/bulk_email_form.html', {
+        'form': form,
+        'recipients': recipients,
+        'skipped': skipped,
+        'list_url_name': list_url_name,
+        'list_label': list_label,
+    })
+
+
+@login_required
+def bulk_email_leads(request):
+    return _bulk_email(request, Lead, 'crm:lead_list', 'leads')
+
+
+@login_required
+def bulk_email_clients(request):
+    return _bulk_email(request, Client, 'crm:client_list', 'clients')
+
+
+@login_required
+def bulk_email_contacts(request):
+    return _bulk_email(request, Contact, 'crm:contact_list', 'contacts')
+
+
 # --- User profile ---
 
 @login_required
@@ -1319,16 +1567,31 @@ def profile_edit(request):
     return render(request, 'crm/profile_edit.html', {'form': form})
 
 
+SYNC_PREVIEW_PAGE_SIZE = 50
+
+
 @login_required
 def email_marketing_sync_preview(request):
-    """Preview which contacts would be synced; user can then Confirm & Sync from this page."""
+    """Preview which contacts would be synced (paginated), and per connected provider what changed since the
+    last sync; user can then Confirm & Sync from this page."""
     profile, _ = UserProfile.objects.get_or_create(user=request.user, defaults={})
-    from .email_marketing import get_opted_in_records_with_type
-
-    records = get_opted_in_records_with_type(user=request.user)
+    from django.core.paginator import Paginator
+    from .email_marketing import get_opted_in_records
+    from .newsletter_sync import PROVIDER_SYNC, plan_sync, provider_connected, provider_list_id
+
+    records = list(get_opted_in_records(user=request.user))  # compact tuples; the plans need every record
+    plans = [
+        plan_sync(request.user, provider, provider_list_id(profile, provider), records)
+        for provider in PROVIDER_SYNC
+        if provider_connected(profile, provider)
+    ]
+    page_obj = Paginator(records, SYNC_PREVIEW_PAGE_SIZE).get_page(request.GET.get('page'))
+    rows = [(r, [plan.status.get(r.email, 'unchanged') for plan in plans]) for r in page_obj]
     context = {
         'profile': profile,
-        'records': records,
+        'rows': rows,
+        'page_obj': page_obj,
+        'plans': plans,
         'opted_in_count': len(records),
         'has_mailchimp': profile.has_mailchimp_connected(),
         'has_constant_contact': profile.has_constant_contact_connected(),
@@ -1336,58 +1599,86 @@ def email_marketing_sync_preview(request):
     return render(request, 'crm/email_marketing_sync_preview.html', context)
 
 
+SYNC_JOB_ERRORS_PAGE_SIZE = 50
+
+
 @login_required
 def email_marketing_sync(request):
-    """Sync opted-in Clients, Leads, and Contacts to Mailchimp or Constant Contact (using current user's profile)."""
+    """
+    Queue a sync of opted-in Clients, Leads, and Contacts to Mailchimp or Constant Contact (using current user's
+    profile); the process_sync_jobs worker runs it. Only records new or changed since the last sync are sent, and
+    emails no longer opted in are unsubscribed; POST full=1 re-sends everyone.
+    """
     profile, _ = UserProfile.objects.get_or_create(user=request.user, defaults={})
-    from .email_marketing import get_opted_in_records, sync_to_mailchimp, sync_to_constant_contact
+    from .email_marketing import count_opted_in_records
+    from .models import SyncJob
+    from .newsletter_sync import PROVIDER_LABELS, provider_connected
+    from .sync_jobs import request_sync_job
 
-    records = get_opted_in_records(user=request.user)
     if request.method == 'POST':
         provider = (request.POST.get('provider') or '').strip().lower()
-        if provider == 'mailchimp':
-            if not profile.has_mailchimp_connected():
-                messages.error(request, 'Mailchimp is not configured in your profile.')
-            elif not records:
-                messages.warning(request, 'No opted-in contacts to sync. Enable "Newsletter opt-in" on clients, leads, or contacts.')
-            else:
-                synced, errs = sync_to_mailchimp(profile, records)
-                if errs and synced == 0:
-                    messages.error(request, f'Sync failed: {errs[0].get("error", "Unknown error")}')
+        if provider in PROVIDER_LABELS:
+            if not provider_connected(profile, provider):
+                if provider == 'mailchimp':
+                    messages.error(request, 'Mailchimp is not configured in your profile.')
                 else:
-                    messages.success(request, f'Synced {synced} contact(s) to Mailchimp.')
-                    for e in errs[:5]:
-                        messages.warning(request, f'{e.get("email", "?")}: {e.get("error", "")[:80]}')
-                    if len(errs) > 5:
-                        messages.warning(request, f'… and {len(errs) - 5} more error(s).')
-            return redirect('crm:email_marketing_sync')
-        if provider == 'constant_contact':
-            if not profile.has_constant_contact_connected():
-                messages.error(request, 'Constant Contact is not configured in your profile (including List ID).')
-            elif not records:
-                messages.warning(request, 'No opted-in contacts to sync. Enable "Newsletter opt-in" on clients, leads, or contacts.')
+                    messages.error(request, 'Constant Contact is not configured in your profile (including List ID).')
             else:
-                synced, errs = sync_to_constant_contact(profile, records)
-                if errs and synced == 0:
-                    messages.error(request, f'Sync failed: {errs[0].get("error", "Unknown error")}')
+                job, reused = request_sync_job(request.user, provider, full=bool(request.POST.get('full')))
+                if reused:
+                    messages.info(request, f'A {PROVIDER_LABELS[provider]} sync is already in progress.')
                 else:
-                    messages.success(request, f'Synced {synced} contact(s) to Constant Contact.')
-                    for e in errs[:5]:
-                        messages.warning(request, f'{e.get("email", "?")}: {e.get("error", "")[:80]}')
-                    if len(errs) > 5:
-                        messages.warning(request, f'… and {len(errs) - 5} more error(s).')
-            return redirect('crm:email_marketing_sync')
+                    messages.success(request, f'{PROVIDER_LABELS[provider]} sync queued.')
+                return redirect('crm:sync_job_detail', pk=job.pk)
         return redirect('crm:email_marketing_sync')
 
     context = {
         'profile': profile,
-        'opted_in_count': len(records),
+        'opted_in_count': count_opted_in_records(request.user),
         'has_mailchimp': profile.has_mailchimp_connected(),
         'has_constant_contact': profile.has_constant_contact_connected(),
+        'jobs': SyncJob.objects.filter(user=request.user)[:10],
     }
     return render(request, 'crm/email_marketing_sync.html', context)
 
 
+@login_required
+def sync_job_detail(request, pk):
+    """A sync job's progress (refreshed from sync_job_progress while it runs) and its per-email error log."""
+    from django.core.paginator import Paginator
+    from .models import SyncJob
+
+    job = get_object_or_404(SyncJob, pk=pk, user=request.user)
+    page_obj = Paginator(job.errors.all(), SYNC_JOB_ERRORS_PAGE_SIZE).get_page(request.GET.get('page'))
+    return render(request, 'crm/sync_job_detail.html', {'job': job, 'page_obj': page_obj})
+
+
+@login_required
+def sync_job_progress(request, pk):
+    """JSON progress of a sync job (owner only)."""
+    from django.http import JsonResponse
+    from .models import SyncJob
+    from .sync_jobs import sync_job_progress as job_progress
+
+    job = get_object_or_404(SyncJob, pk=pk, user=request.user)
+    return JsonResponse(job_progress(job))
+
+
+@login_required
+def sync_job_resume(request, pk):
+    """POST: queue a failed sync job again; it continues from its last checkpoint."""
+    from .models import SyncJob
+    from .sync_jobs import resume_sync_job
+
+    job = get_object_or_404(SyncJob, pk=pk, user=request.user)
+    if request.method == 'POST':
+        if resume_sync_job(job):
+            messages.success(request, 'Sync queued again; it will continue where it stopped.')
+        else:
+            messages.info(request, 'Only a failed sync can be resumed.')
+    return redirect('crm:sync_job_detail', pk=job.pk)
+
+
 # --- Application admin (separate from Django admin) ---
 
 def app_admin_dashboard(request):
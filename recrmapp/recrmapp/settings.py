@@ -103,6 +103,10 @@ if DATABASE_URL:
     DATABASES = {
         'default': dj_database_url.parse(DATABASE_URL, conn_max_age=600),
     }
+    # Behind a transaction-pooling proxy (pgbouncer, Neon/Supabase poolers) server-side cursors break;
+    # set DATABASE_DISABLE_SERVER_SIDE_CURSORS=True and exports page through rows instead.
+    if os.environ.get('DATABASE_DISABLE_SERVER_SIDE_CURSORS', '').lower() in ('1', 'true', 'yes'):
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
 else:
     DATABASES = {
         'default': {
@@ -219,6 +223,16 @@ else:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
     DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'robert@saylesgrouphomes.com')
 
+# Send the profile signature image as an inline (Content-ID) attachment instead of a base64 data: URL in the
+# HTML. Smaller messages, but the backend must support inline attachments (SMTP does; Anymail's Resend
+# backend may not), so it is off by default.
+EMAIL_SIGNATURE_INLINE_CID = os.environ.get('EMAIL_SIGNATURE_INLINE_CID', '').lower() in ('1', 'true', 'yes')
+
+# Emails written in the app are queued in the outbox and delivered by `manage.py process_outbox`.
+# Where no worker runs (e.g. serverless), set EMAIL_SEND_IN_REQUEST=true to also try the first delivery
+# inside the request; failures stay queued for the worker's retries.
+EMAIL_SEND_IN_REQUEST = os.environ.get('EMAIL_SEND_IN_REQUEST', '').lower() in ('1', 'true', 'yes')
+
 # Security hardening (recommended for production)
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
@@ -232,3 +246,10 @@ CSRF_COOKIE_SAMESITE = 'Lax'
 # Optional: set in .env for production. Mailchimp recommends a secret in the webhook URL.
 MAILCHIMP_WEBHOOK_SECRET = os.environ.get('MAILCHIMP_WEBHOOK_SECRET', '')
 # Mailchimp leads are assigned only by matching the webhook list_id to a user's Profile Audience ID (no global override).
+
+# Outbound newsletter sync: API base URL overrides, for pointing a sync at a local stand-in server.
+# Mailchimp's default is https://<dc>.api.mailchimp.com/3.0 (dc from the API key).
+MAILCHIMP_API_URL = os.environ.get('MAILCHIMP_API_URL', '').rstrip('/')
+CONSTANT_CONTACT_API_URL = os.environ.get('CONSTANT_CONTACT_API_URL', '').rstrip('/')  # default https://api.cc.email/v3
+# Requests in flight at once during a newsletter sync (capped per provider: Mailchimp 10, Constant Contact 4).
+NEWSLETTER_SYNC_CONCURRENCY = int(os.environ.get('NEWSLETTER_SYNC_CONCURRENCY', '4'))
@@ -19,12 +19,14 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from crm.change_feed import change_feed
 from crm.webhooks import mailchimp_webhook
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('django.contrib.auth.urls')),
     path('api/webhooks/mailchimp/', mailchimp_webhook),
+    path('api/changes/<str:model_key>/', change_feed, name='change_feed'),
     path('', include('crm.urls')),
 ]
 if settings.DEBUG: